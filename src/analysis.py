@@ -0,0 +1,302 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import numpy
+
+HOP_MS = 10
+BLOCK_HOPS = 1 << 12
+PHASE_BEATS = 32
+
+
+def _hop_powers(data: numpy.ndarray, hop: int) -> numpy.ndarray:
+    """Mean power of each hop of frames, mixed over all channels.
+
+    The audio is processed in blocks to keep temporary arrays small, and the
+    partial hop at the end is left out.
+
+    Args:
+        data: Decoded audio with shape (frames, channels).
+        hop: Length of a hop in frames.
+    """
+    hops = len(data) // hop
+    powers = numpy.empty(hops, dtype=numpy.float64)
+    scale = 1.0
+
+    if data.dtype.kind == "i":
+        scale = 1.0 / float(-numpy.iinfo(data.dtype).min) ** 2
+
+    for start in range(0, hops, BLOCK_HOPS):
+        end = min(start + BLOCK_HOPS, hops)
+        block = data[start * hop:end * hop].astype(numpy.float32)
+        block = block.reshape(end - start, -1)
+        powers[start:end] = numpy.einsum("ij,ij->i", block, block) / block.shape[1]
+
+    return powers * scale
+
+
+class SilenceDetector:
+    """Finds silent regions of decoded audio.
+
+    Loudness is measured as RMS over a sliding window, computed from the
+    cumulative sum of the power of short hops, so the cost is linear in the
+    length of the audio and independent of the window length.
+
+    Attributes:
+        threshold_db: RMS level in dBFS under which audio counts as silent.
+        min_length_ms: Shortest silence in milliseconds to report.
+        window_ms: Length in milliseconds of the RMS window.
+        preroll_ms: How much before the end of a silence a suggested marker
+            is placed, so the first attack after it isn't cut.
+    """
+
+    def __init__(self,
+                 threshold_db: float = -50.0,
+                 min_length_ms: int = 1000,
+                 window_ms: int = 50,
+                 preroll_ms: int = 50):
+        self.threshold_db = threshold_db
+        self.min_length_ms = min_length_ms
+        self.window_ms = window_ms
+        self.preroll_ms = preroll_ms
+
+    def detect(self, data: numpy.ndarray, samplerate: int) -> numpy.ndarray:
+        """Find silent regions.
+
+        Args:
+            data: Decoded audio with shape (frames, channels).
+            samplerate: Sample rate of the audio.
+
+        Returns an array with shape (regions, 2) of the start and end time of
+        each silent region in milliseconds.
+        """
+        hop = max(samplerate * HOP_MS // 1000, 1)
+        powers = _hop_powers(data, hop)
+
+        if len(powers) == 0:
+            return numpy.empty((0, 2), dtype=numpy.int64)
+
+        window = max(self.window_ms // HOP_MS, 1)
+        cumulative = numpy.concatenate(([0.0], numpy.cumsum(powers)))
+        # Centered moving average, shorter at both ends of the audio.
+        centers = numpy.arange(len(powers))
+        starts = numpy.clip(centers - window // 2, 0, len(powers))
+        ends = numpy.clip(centers + window - window // 2, 0, len(powers))
+        mean_powers = (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+        threshold_power = 10 ** (self.threshold_db / 10)
+        silent = numpy.concatenate(([False], mean_powers < threshold_power, [False]))
+        edges = numpy.flatnonzero(silent[1:] != silent[:-1])
+        regions = edges.reshape(-1, 2) * HOP_MS
+        lengths = regions[:, 1] - regions[:, 0]
+
+        return regions[lengths >= self.min_length_ms].astype(numpy.int64)
+
+    def suggest_markers_ms(self, data: numpy.ndarray, samplerate: int) -> numpy.ndarray:
+        """Suggest marker times where music resumes after a silence.
+
+        Playback stops on a marker, so a marker at the end of a silence lets
+        the soloist play over the gap and the backing track continues from
+        where its music starts again. Silences running to the end of the
+        audio get no marker.
+
+        Args:
+            data: Decoded audio with shape (frames, channels).
+            samplerate: Sample rate of the audio.
+
+        Returns a sorted array of marker times in milliseconds.
+        """
+        regions = self.detect(data, samplerate)
+        analyzed_ms = len(data) // max(samplerate * HOP_MS // 1000, 1) * HOP_MS
+        regions = regions[regions[:, 1] < analyzed_ms]
+
+        return numpy.maximum(regions[:, 1] - self.preroll_ms, regions[:, 0])
+
+
+def _mono(data: numpy.ndarray, factor: int) -> numpy.ndarray:
+    """Mix audio to mono float32 and decimate it by averaging factor frames.
+
+    Averaging works as a crude low-pass filter, which is enough for finding
+    onsets.
+    """
+    frames = len(data) // factor * factor
+    mono = numpy.empty(frames // factor, dtype=numpy.float32)
+    block_frames = factor * (1 << 16)
+
+    for start in range(0, frames, block_frames):
+        block = data[start:min(start + block_frames, frames)].astype(numpy.float32)
+        mono[start // factor:(start + len(block)) // factor] = \
+            block.reshape(-1, factor * data.shape[1]).mean(axis=1)
+
+    if data.dtype.kind == "i":
+        mono /= -numpy.iinfo(data.dtype).min
+
+    return mono
+
+
+class BeatTracker:
+    """Finds the beat grid of decoded audio.
+
+    Onsets are measured as spectral flux: the summed increase of log
+    magnitude spectra between consecutive frames, computed with batched
+    FFTs. The tempo is the strongest period of the autocorrelation of the
+    onset strength, and the grid is placed on the phase with the most onset
+    strength on it. A constant tempo is assumed, which suits backing tracks
+    made with a click.
+
+    Attributes:
+        min_bpm: Slowest tempo to consider.
+        max_bpm: Fastest tempo to consider.
+    """
+    ANALYSIS_RATE = 11025
+    FRAME = 512
+    HOP = 128
+    BATCH_FRAMES = 1024
+
+    def __init__(self, min_bpm: float = 60.0, max_bpm: float = 200.0):
+        self.min_bpm = min_bpm
+        self.max_bpm = max_bpm
+
+    def onset_strength(self, data: numpy.ndarray, samplerate: int):
+        """Spectral flux of the audio.
+
+        Args:
+            data: Decoded audio with shape (frames, channels).
+            samplerate: Sample rate of the audio.
+
+        Returns a pair of the onset strength of each frame and the rate of
+        the frames per second. Frame i is centered on i / rate seconds.
+        """
+        factor = max(samplerate // self.ANALYSIS_RATE, 1)
+        rate = samplerate / factor
+        mono = _mono(data, factor)
+        mono = numpy.concatenate((numpy.zeros(self.FRAME // 2, dtype=numpy.float32),
+                                  mono,
+                                  numpy.zeros(self.FRAME // 2, dtype=numpy.float32)))
+
+        if len(mono) < self.FRAME:
+            return numpy.zeros(0), rate / self.HOP
+
+        frames = numpy.lib.stride_tricks.sliding_window_view(
+            mono, self.FRAME)[::self.HOP]
+        window = numpy.hanning(self.FRAME).astype(numpy.float32)
+        flux = numpy.empty(len(frames))
+        previous = None
+
+        for start in range(0, len(frames), self.BATCH_FRAMES):
+            spectra = numpy.abs(numpy.fft.rfft(
+                frames[start:start + self.BATCH_FRAMES] * window, axis=1))
+            spectra = numpy.log1p(100 * spectra)
+
+            if previous is None:
+                previous = spectra[:1]
+
+            rises = numpy.diff(spectra, axis=0, prepend=previous)
+            flux[start:start + len(spectra)] = numpy.maximum(rises, 0).sum(axis=1)
+            previous = spectra[-1:]
+
+        return flux, rate / self.HOP
+
+    @staticmethod
+    def _fit_grid(onsets: numpy.ndarray, period: float, anchor: float, half: int):
+        """Refine a beat grid by fitting a line through the onset peaks.
+
+        The strongest onset within a quarter of a period of each beat up to
+        half beats from the anchor is located with sub-frame accuracy, and the
+        period and anchor are fitted to them weighted by onset strength.
+
+        Returns the fitted pair of period and anchor in onset frames.
+        """
+        reach = max(int(period / 4), 1)
+        beats = numpy.arange(-half, half)
+        centers = numpy.rint(anchor + beats * period).astype(numpy.int64)
+        indices = centers[:, None] + numpy.arange(-reach, reach + 1)
+        inside = (indices[:, 0] >= 1) & (indices[:, -1] < len(onsets) - 1)
+        beats = beats[inside]
+        indices = indices[inside]
+
+        if len(beats) < 2:
+            return period, anchor
+
+        peaks = indices[numpy.arange(len(indices)),
+                        numpy.argmax(onsets[indices], axis=1)]
+        left, center, right = onsets[peaks - 1], onsets[peaks], onsets[peaks + 1]
+        curvature = left - 2 * center + right
+        offsets = numpy.divide(0.5 * (left - right), curvature,
+                               out=numpy.zeros(len(peaks)), where=curvature < 0)
+        weights = numpy.maximum(center - onsets.min(), 0)
+
+        if not weights.any():
+            return period, anchor
+
+        fitted_period, fitted_anchor = numpy.polyfit(beats, peaks + offsets, 1,
+                                                     w=numpy.sqrt(weights))
+
+        return fitted_period, fitted_anchor
+
+    def detect(self, data: numpy.ndarray, samplerate: int) -> tuple[float, numpy.ndarray]:
+        """Find the tempo and beat grid.
+
+        Args:
+            data: Decoded audio with shape (frames, channels).
+            samplerate: Sample rate of the audio.
+
+        Returns a pair of the tempo in beats per minute and a sorted array of
+        beat times in milliseconds covering the whole audio. The tempo is 0.0
+        and the array empty if the audio is too short or has no onsets.
+        """
+        onsets, rate = self.onset_strength(data, samplerate)
+        min_lag = int(numpy.ceil(60 * rate / self.max_bpm))
+        max_lag = int(60 * rate / self.min_bpm) + 1
+
+        # Silence or a constant level has no beats to find.
+        if len(onsets) < 2 * max_lag or onsets.max() == onsets.min():
+            return 0.0, numpy.empty(0, dtype=numpy.int64)
+
+        onsets = onsets - onsets.mean()
+        size = 1 << int(numpy.ceil(numpy.log2(2 * len(onsets))))
+        spectrum = numpy.fft.rfft(onsets, size)
+        autocorrelation = numpy.fft.irfft(spectrum * numpy.conj(spectrum), size)
+        autocorrelation = autocorrelation[:max_lag + 1] / len(onsets)
+
+        lags = numpy.arange(min_lag, max_lag)
+        # Prefer tempos near 120 BPM to choose between multiples of the beat.
+        bpms = 60 * rate / lags
+        prior = numpy.exp(-0.5 * numpy.log2(bpms / 120) ** 2)
+        best = lags[numpy.argmax(autocorrelation[lags] * prior)]
+
+        # Parabolic interpolation for a period between whole frames. The
+        # weighting by the prior may choose a lag which is not a peak of the
+        # autocorrelation itself, and then it is used as it is.
+        left, center, right = autocorrelation[best - 1:best + 2]
+        curvature = left - 2 * center + right
+        offset = 0.0
+
+        if center >= max(left, right) and curvature < 0:
+            offset = min(max(0.5 * (left - right) / curvature, -0.5), 0.5)
+
+        period = best + offset
+
+        # An error of a fraction of a frame in the period adds up over a long
+        # track, so the phase is chosen over a few beats in the middle, and
+        # the grid is refitted over a span growing from there to the ends.
+        beat_count = int((len(onsets) - 1) / period)
+        half = min(PHASE_BEATS // 2, beat_count // 2)
+        anchors = (beat_count // 2) * period + numpy.arange(int(numpy.ceil(period)))
+        indices = numpy.rint(anchors[:, None] + numpy.arange(-half, half)
+                             * period).astype(numpy.int64)
+        scores = onsets[numpy.clip(indices, 0, len(onsets) - 1)].sum(axis=1)
+        anchor = anchors[numpy.argmax(scores)]
+
+        while True:
+            period, anchor = self._fit_grid(onsets, period, anchor, half)
+
+            if half > beat_count:
+                break
+
+            half *= 4
+
+        length_ms = len(data) * 1000 / samplerate
+        first_ms = anchor % period * 1000 / rate
+        period_ms = period * 1000 / rate
+        beat_count = int((length_ms - first_ms) / period_ms) + 1
+        beats_ms = first_ms + numpy.arange(beat_count) * period_ms
+
+        return 60 * rate / period, numpy.rint(beats_ms).astype(numpy.int64)
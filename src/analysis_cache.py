@@ -0,0 +1,134 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import json
+import os
+import numpy
+
+SIDECAR_SIGNATURE = b'\xbb\x5d\xc6\x89\x7e\x06\x41\x4e'
+
+SIDECAR_FORMAT_VERSION = 1
+
+SIDECAR_EXTENSION = ".skanalysis"
+
+ARRAY_ALIGNMENT = 64
+
+
+class AnalysisCache:
+    """Sidecar file storing analysis arrays of a project's audio file.
+
+    The file holds named one-dimensional arrays, such as waveform peaks,
+    together with the path, size and modification time of the audio file
+    they were computed from. Arrays are loaded memory-mapped, and a file
+    whose audio has changed since is treated as missing.
+
+    The file starts with a signature, a format version (u16) and the length
+    of a JSON header (u32). The header has the audio file key, metadata and
+    the dtype, length and offset of each array. The arrays follow, each
+    aligned to ARRAY_ALIGNMENT bytes.
+    """
+
+    @staticmethod
+    def sidecar_path(project_path: str) -> str:
+        """Path of the sidecar file of a project.
+
+        Args:
+            project_path: Path of the project file.
+        """
+        return project_path + SIDECAR_EXTENSION
+
+    @staticmethod
+    def _audio_key(audio_path: str) -> dict:
+        stat = os.stat(audio_path)
+        return {
+            "audio_path": os.path.abspath(audio_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns
+        }
+
+    @staticmethod
+    def save(path: str, audio_path: str, arrays: dict, metadata: dict = None):
+        """Write analysis arrays to a sidecar file.
+
+        Args:
+            path: Path of the sidecar file.
+            audio_path: Audio file the arrays were computed from.
+            arrays: Dictionary of array names to one-dimensional arrays.
+            metadata: Dictionary of JSON serializable values to store.
+        """
+        header = AnalysisCache._audio_key(audio_path)
+        header["metadata"] = metadata or {}
+        header["arrays"] = {}
+
+        offset = 0
+
+        for name, array in arrays.items():
+            header["arrays"][name] = {
+                "dtype": array.dtype.str,
+                "length": len(array),
+                "offset": offset
+            }
+            offset += -(-array.nbytes // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+
+        header_bytes = json.dumps(header).encode("utf-8")
+        data_start = len(SIDECAR_SIGNATURE) + 2 + 4 + len(header_bytes)
+        data_start = -(-data_start // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+
+        temporary_path = f"{path}.tmp"
+
+        with open(temporary_path, "wb") as f:
+            f.write(SIDECAR_SIGNATURE)
+            f.write(SIDECAR_FORMAT_VERSION.to_bytes(2, "big"))
+            f.write(len(header_bytes).to_bytes(4, "big"))
+            f.write(header_bytes)
+
+            for name, array in arrays.items():
+                f.seek(data_start + header["arrays"][name]["offset"])
+                f.write(numpy.ascontiguousarray(array).tobytes())
+
+        os.replace(temporary_path, path)
+
+    @staticmethod
+    def load(path: str, audio_path: str) -> tuple[dict, dict] | None:
+        """Load analysis arrays from a sidecar file.
+
+        Args:
+            path: Path of the sidecar file.
+            audio_path: Audio file the arrays should have been computed from.
+
+        Returns a pair of the metadata dictionary and a dictionary of array
+        names to memory-mapped arrays, or None if the file is missing,
+        unreadable, of an unsupported version or stale.
+        """
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(SIDECAR_SIGNATURE)) != SIDECAR_SIGNATURE:
+                    return None
+
+                if int.from_bytes(f.read(2), "big") != SIDECAR_FORMAT_VERSION:
+                    return None
+
+                header_length = int.from_bytes(f.read(4), "big")
+                header = json.loads(f.read(header_length).decode("utf-8"))
+
+            key = AnalysisCache._audio_key(audio_path)
+
+            if any(header.get(name) != value for name, value in key.items()):
+                return None
+
+            data_start = len(SIDECAR_SIGNATURE) + 2 + 4 + header_length
+            data_start = -(-data_start // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+            arrays = {}
+
+            for name, entry in header["arrays"].items():
+                if entry["length"] == 0:
+                    arrays[name] = numpy.empty(0, dtype=entry["dtype"])
+                    continue
+
+                arrays[name] = numpy.memmap(path,
+                                            dtype=entry["dtype"],
+                                            mode="r",
+                                            offset=data_start + entry["offset"],
+                                            shape=(entry["length"],))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+        return header["metadata"], arrays
@@ -0,0 +1,179 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import glob
+import hashlib
+import os
+from collections import OrderedDict
+import numpy
+from audio_source import MemorySource
+
+DEFAULT_CACHE_BYTES = 1 << 30
+
+
+class AudioCache:
+    """LRU cache of decoded audio.
+
+    Entries are keyed by the absolute path, modification time and size of
+    the audio file and the sample type, so a changed file is never served
+    from the cache. Entries are kept in memory within a byte budget, and
+    optionally also written to a directory as .npy files, which are opened
+    memory-mapped on later cache misses.
+
+    Attributes:
+        max_bytes: Byte budget of the in-memory cache.
+        directory: Directory of the on-disk cache, or None if disabled.
+        max_disk_bytes: Byte budget of the on-disk cache.
+        used_bytes: Bytes currently used by the in-memory cache.
+        hits: Amount of lookups served from memory.
+        disk_hits: Amount of lookups served from disk.
+        misses: Amount of lookups not found in the cache.
+    """
+
+    def __init__(self,
+                 max_bytes: int = DEFAULT_CACHE_BYTES,
+                 directory: str = None,
+                 max_disk_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+
+        self.used_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict[tuple, MemorySource] = OrderedDict()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _key(path: str, dtype: str) -> tuple:
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, dtype)
+
+    def _disk_prefix(self, key: tuple) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def get(self, path: str, dtype: str) -> MemorySource | None:
+        """Find decoded audio of a file.
+
+        Args:
+            path: Path of the audio file.
+            dtype: Sample type of the decoded audio.
+
+        Returns None if the file is not in the cache, or can't be read, leaving
+        decoding to report the error.
+        """
+        try:
+            key = self._key(path, dtype)
+        except OSError:
+            self.misses += 1
+            return None
+
+        source = self._entries.get(key)
+
+        if source is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return source
+
+        source = self._get_from_disk(key)
+
+        if source is not None:
+            self.disk_hits += 1
+            self._add(key, source)
+            return source
+
+        self.misses += 1
+        return None
+
+    def put(self, path: str, source: MemorySource):
+        """Add decoded audio of a file to the cache.
+
+        Args:
+            path: Path of the audio file.
+            source: Decoded audio of the file.
+        """
+        # The file may have been removed since it was decoded.
+        try:
+            key = self._key(path, source.dtype)
+        except OSError:
+            return
+
+        if key in self._entries:
+            return
+
+        self._add(key, source)
+
+        if self.directory is not None:
+            self._put_to_disk(key, source)
+
+    def clear(self):
+        """Remove all entries from the in-memory cache."""
+        self._entries.clear()
+        self.used_bytes = 0
+
+    def _add(self, key: tuple, source: MemorySource):
+        if source.nbytes > self.max_bytes:
+            return
+
+        self._entries[key] = source
+        self.used_bytes += source.nbytes
+
+        while self.used_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.used_bytes -= evicted.nbytes
+
+    def _get_from_disk(self, key: tuple) -> MemorySource | None:
+        if self.directory is None:
+            return None
+
+        matches = glob.glob(f"{self._disk_prefix(key)}_*.npy")
+
+        if len(matches) == 0:
+            return None
+
+        path = matches[0]
+        samplerate = int(path[path.rindex("_") + 1:-len(".npy")])
+
+        try:
+            data = numpy.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+        os.utime(path)
+
+        return MemorySource(data, samplerate)
+
+    def _put_to_disk(self, key: tuple, source: MemorySource):
+        path = f"{self._disk_prefix(key)}_{source.samplerate}.npy"
+        temporary_path = f"{path}.tmp"
+
+        try:
+            with open(temporary_path, "wb") as f:
+                numpy.save(f, source.data)
+
+            os.replace(temporary_path, path)
+        except OSError:
+            return
+
+        self._evict_disk()
+
+    def _evict_disk(self):
+        """Remove least recently used files until within max_disk_bytes."""
+        files = []
+
+        for path in glob.glob(os.path.join(self.directory, "*.npy")):
+            stat = os.stat(path)
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        files.sort()
+        used = sum(size for _, size, _ in files)
+
+        for _, size, path in files:
+            if used <= self.max_disk_bytes:
+                break
+
+            os.remove(path)
+            used -= size
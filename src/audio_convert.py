@@ -0,0 +1,311 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from math import gcd
+import numpy
+from numpy.lib.stride_tricks import sliding_window_view
+
+RESAMPLER_TAPS = 32
+RESAMPLER_CUTOFF = 0.95
+RESAMPLER_KAISER_BETA = 8.0
+
+# Gain of a channel folded into two others, keeping its power.
+FOLD_GAIN = numpy.sqrt(0.5)
+
+
+def mix_matrix(channels: int, out_channels: int) -> numpy.ndarray:
+    """Matrix mixing audio to another amount of channels.
+
+    Mono is played on the first two channels. 5.1 (L, R, C, LFE, Ls, Rs) and
+    quadraphonic (L, R, Ls, Rs) audio are mixed to stereo with the ITU
+    coefficients, without LFE. Otherwise the shared channels are kept as is
+    and extra channels are folded into the output channels in turn. Mixes
+    that could clip are scaled down.
+
+    Args:
+        channels: Amount of channels in the audio.
+        out_channels: Amount of channels to mix to.
+
+    Returns a float32 array with shape (channels, out_channels), so a block
+    is mixed with block @ matrix.
+    """
+    if out_channels == 1 and channels > 1:
+        return (mix_matrix(channels, 2) @ numpy.full((2, 1), 0.5)).astype(numpy.float32)
+
+    matrix = numpy.zeros((channels, out_channels))
+
+    if channels == 1:
+        matrix[0, :2] = 1.0
+    elif channels == 6 and out_channels == 2:
+        matrix[[0, 1], [0, 1]] = 1.0
+        matrix[2] = FOLD_GAIN
+        matrix[[4, 5], [0, 1]] = FOLD_GAIN
+    elif channels == 4 and out_channels == 2:
+        matrix[[0, 1], [0, 1]] = 1.0
+        matrix[[2, 3], [0, 1]] = FOLD_GAIN
+    else:
+        shared = min(channels, out_channels)
+        matrix[range(shared), range(shared)] = 1.0
+
+        for channel in range(shared, channels):
+            matrix[channel, channel % out_channels] = FOLD_GAIN
+
+    gain = numpy.abs(matrix).sum(axis=0).max(initial=0.0)
+
+    if gain > 1.0:
+        matrix /= gain
+
+    return matrix.astype(numpy.float32)
+
+
+class Resampler:
+    """Polyphase resampler converting audio between two sample rates.
+
+    The rates are taken as a ratio up / down of coprime integers. A windowed
+    sinc low-pass filter of up * taps coefficients is split into up phases of
+    taps coefficients, and each output frame is the dot product of one phase
+    with the taps latest input frames. Output frames sharing a phase are
+    evenly spaced, so each phase is applied to all of its frames at once as a
+    matrix product over a strided view of the input.
+
+    Input can be given in blocks of any size, and the output doesn't depend
+    on how the input is split. Frames are counted from the start of the
+    audio, so conversion can be restarted from any output frame with reset,
+    such as after a seek. The filter delay is compensated, so output frame n
+    is aligned with input time n * down / up.
+
+    Attributes:
+        up: Interpolation factor.
+        down: Decimation factor.
+        channels: Amount of channels in the audio.
+        taps: Filter coefficients per phase.
+    """
+
+    def __init__(self, samplerate: int, out_samplerate: int, channels: int,
+                 taps: int = RESAMPLER_TAPS):
+        """Design the filter.
+
+        Args:
+            samplerate: Sample rate of the input.
+            out_samplerate: Sample rate of the output.
+            channels: Amount of channels in the audio.
+            taps: Filter coefficients per phase. More taps give a steeper
+                filter at a higher cost.
+        """
+        divisor = gcd(samplerate, out_samplerate)
+        self.up = out_samplerate // divisor
+        self.down = samplerate // divisor
+        self.channels = channels
+        self.taps = taps
+
+        # The filter is centered on a whole frame of the upsampled input, so
+        # its delay can be compensated exactly.
+        length = taps * self.up
+        self._delay = length // 2
+        cutoff = RESAMPLER_CUTOFF * 0.5 / max(self.up, self.down)
+        prototype = 2 * cutoff * self.up * numpy.sinc(
+            2 * cutoff * (numpy.arange(length) - self._delay))
+        prototype *= numpy.kaiser(2 * self._delay + 1, RESAMPLER_KAISER_BETA)[:length]
+
+        # Phase p holds coefficients p, p + up, p + 2 * up and so on, reversed
+        # to line up with windows of the input in time order.
+        self._phases = numpy.ascontiguousarray(
+            prototype.reshape(taps, self.up).T[:, ::-1], dtype=numpy.float32)
+
+        self._buffer: numpy.ndarray = None
+        self._buffer_start = 0
+        self._end = 0
+        self._produced = 0
+        self.reset(0)
+
+    def output_frames(self, frames: int) -> int:
+        """Amount of output frames for frames input frames."""
+        return -(-frames * self.up // self.down)
+
+    def reset(self, frame: int) -> int:
+        """Restart conversion from an output frame, dropping buffered input.
+
+        Args:
+            frame: Output frame the next output starts from.
+
+        Returns the input frame the next input block must start from.
+        """
+        first = self._first_input(frame)
+        self._buffer = numpy.zeros((max(-first, 0), self.channels), dtype=numpy.float32)
+        self._buffer_start = first
+        self._end = max(first, 0)
+        self._produced = frame
+
+        return self._end
+
+    def _first_input(self, frame: int) -> int:
+        """First input frame output frame depends on."""
+        return (frame * self.down + self._delay) // self.up - self.taps + 1
+
+    def process(self, block: numpy.ndarray) -> numpy.ndarray:
+        """Convert the next block of input.
+
+        Output frames depending on input not given yet are held back until
+        the next call or flush.
+
+        Args:
+            block: Input with shape (frames, channels).
+
+        Returns float32 output with shape (frames, channels).
+        """
+        self._buffer = numpy.concatenate(
+            (self._buffer, numpy.asarray(block, dtype=numpy.float32)))
+        self._end += len(block)
+
+        # Frames whose last input frame is already buffered.
+        available = -((self._delay - self._end * self.up) // self.down)
+
+        return self._convert(available)
+
+    def flush(self) -> numpy.ndarray:
+        """Convert the rest of the output after the last input block.
+
+        Ends the input, so reset must be called before processing more.
+
+        Returns float32 output with shape (frames, channels), which is empty
+        once the output is complete.
+        """
+        padding = numpy.zeros((self.taps, self.channels), dtype=numpy.float32)
+        self._buffer = numpy.concatenate((self._buffer, padding))
+
+        return self._convert(self.output_frames(self._end))
+
+    def _convert(self, end: int) -> numpy.ndarray:
+        """Compute the output frames up to end and drop input no longer needed."""
+        start = self._produced
+        count = max(end - start, 0)
+        out = numpy.empty((count, self.channels), dtype=numpy.float32)
+        windows = sliding_window_view(self._buffer, self.taps, axis=0)
+
+        for offset in range(min(self.up, count)):
+            position = (start + offset) * self.down + self._delay
+            first = position // self.up - self.taps + 1 - self._buffer_start
+            frames = len(range(offset, count, self.up))
+            selected = windows[first:first + (frames - 1) * self.down + 1:self.down]
+            out[offset::self.up] = selected @ self._phases[position % self.up]
+
+        self._produced = start + count
+        keep = self._first_input(self._produced) - self._buffer_start
+        dropped = min(max(keep, 0), len(self._buffer))
+        self._buffer = self._buffer[dropped:]
+        self._buffer_start += dropped
+
+        return out
+
+
+def to_float(block: numpy.ndarray) -> numpy.ndarray:
+    """Audio as float32, scaling int16 samples to -1.0 to 1.0."""
+    if block.dtype == numpy.int16:
+        return block.astype(numpy.float32) / 32768
+
+    return block.astype(numpy.float32, copy=False)
+
+
+def from_float(block: numpy.ndarray, dtype: str) -> numpy.ndarray:
+    """float32 audio as dtype, clipping int16 samples to their range."""
+    if dtype == "int16":
+        return numpy.clip(numpy.rint(block * 32768), -32768, 32767).astype(numpy.int16)
+
+    return block.astype(dtype, copy=False)
+
+
+class FormatConverter:
+    """Converts audio blocks to another sample rate and amount of channels.
+
+    Channels are mixed before resampling when reducing them and after when
+    adding them, so the resampler runs on the fewer channels.
+
+    Attributes:
+        samplerate: Sample rate of the input.
+        channels: Amount of channels of the input.
+        out_samplerate: Sample rate of the output.
+        out_channels: Amount of channels of the output.
+        dtype: Sample type of the output, one of SAMPLE_DTYPES.
+    """
+
+    def __init__(self,
+                 samplerate: int,
+                 channels: int,
+                 out_samplerate: int,
+                 out_channels: int,
+                 dtype: str):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.out_samplerate = out_samplerate
+        self.out_channels = out_channels
+        self.dtype = dtype
+
+        self._matrix = None
+
+        if channels != out_channels:
+            self._matrix = mix_matrix(channels, out_channels)
+
+        self._resampler = None
+
+        if samplerate != out_samplerate:
+            self._resampler = Resampler(samplerate, out_samplerate,
+                                        min(channels, out_channels))
+
+        self._mix_first = out_channels < channels
+
+    def output_frames(self, frames: int) -> int:
+        """Amount of output frames for frames input frames."""
+        if self._resampler is None:
+            return frames
+
+        return self._resampler.output_frames(frames)
+
+    def reset(self, frame: int) -> int:
+        """Restart conversion from an output frame.
+
+        Args:
+            frame: Output frame the next output starts from.
+
+        Returns the input frame the next input block must start from.
+        """
+        if self._resampler is None:
+            return frame
+
+        return self._resampler.reset(frame)
+
+    def process(self, block: numpy.ndarray) -> numpy.ndarray:
+        """Convert the next block of input.
+
+        Args:
+            block: Input with shape (frames, channels).
+
+        Returns output with shape (frames, out_channels) in dtype.
+        """
+        block = to_float(block)
+
+        if self._mix_first:
+            block = self._mix(block)
+
+        if self._resampler is not None:
+            block = self._resampler.process(block)
+
+        if not self._mix_first:
+            block = self._mix(block)
+
+        return from_float(block, self.dtype)
+
+    def flush(self) -> numpy.ndarray:
+        """Convert the rest of the output after the last input block."""
+        if self._resampler is None:
+            return numpy.empty((0, self.out_channels), dtype=self.dtype)
+
+        block = self._resampler.flush()
+
+        if not self._mix_first:
+            block = self._mix(block)
+
+        return from_float(block, self.dtype)
+
+    def _mix(self, block: numpy.ndarray) -> numpy.ndarray:
+        if self._matrix is None:
+            return block
+
+        return block @ self._matrix
@@ -0,0 +1,439 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from time import perf_counter_ns
+from types import SimpleNamespace
+import numpy
+import soundfile as sf
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):
+    # sounddevice raises OSError when the PortAudio library is missing.
+    sd = None
+
+CLOCKED_BLOCKSIZE = 512
+CLOCKED_CHANNELS = 2
+
+if sd is not None:
+    CallbackStop = sd.CallbackStop
+else:
+    class CallbackStop(Exception):
+        """Raised in a stream callback to stop the stream after the block."""
+
+
+class OutputUnavailableError(Exception):
+    pass
+
+
+class AudioOutput:
+    """Base class for where AudioPlayer sends its audio.
+
+    Streams opened by an output work like sounddevice.OutputStream: the
+    callback is called as callback(outdata, frames, time_info, status) for
+    each block and can raise CallbackStop to stop the stream after the
+    block, and finished_callback is called when the stream stops. Streams
+    have the methods start, stop, abort and close and the attributes active,
+    time, latency, blocksize and dtype.
+
+    Attributes:
+        name: Name of the output shown to the user.
+    """
+    name = ""
+
+    def negotiate_format(self,
+                         samplerate: int,
+                         channels: int,
+                         device: int | str = None) -> tuple[int, int]:
+        """Sample rate and channels to open a stream for audio in a format.
+
+        By default audio is played as is on two channels.
+
+        Args:
+            samplerate: Sample rate of the audio.
+            channels: Amount of channels in the audio.
+            device: Output device index or name, or None for the default.
+
+        Returns the sample rate and amount of channels of the stream.
+        """
+        # pylint: disable=unused-argument
+        return samplerate, 2
+
+    def open_stream(self,
+                    samplerate: int,
+                    channels: int,
+                    dtype: str,
+                    callback,
+                    finished_callback,
+                    device: int | str = None,
+                    blocksize: int = 0,
+                    latency: str | float = "high"):
+        """Open a stream, which isn't started yet.
+
+        Args:
+            samplerate: Sample rate of the stream.
+            channels: Amount of channels.
+            dtype: Sample type of the blocks.
+            callback: Function filling each block.
+            finished_callback: Function called when the stream stops.
+            device: Output device index or name, or None for the default.
+            blocksize: Frames per callback, or 0 for the default.
+            latency: Latency class ("low" or "high") or latency in seconds.
+
+        Raises OutputUnavailableError if the output can't be used.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release resources of the output."""
+
+
+class SoundDeviceOutput(AudioOutput):
+    """Output to an audio device through sounddevice and PortAudio."""
+    name = "Sound device"
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Whether sounddevice and PortAudio are installed."""
+        return sd is not None
+
+    @staticmethod
+    def get_devices() -> list[tuple[int, str]]:
+        """Index and name of each available output device."""
+        if sd is None:
+            return []
+
+        return [(device["index"], device["name"])
+                for device in sd.query_devices()
+                if device["max_output_channels"] > 0]
+
+    def negotiate_format(self,
+                         samplerate: int,
+                         channels: int,
+                         device: int | str = None) -> tuple[int, int]:
+        """Native format of the device closest to the format of the audio.
+
+        Mono is played on two channels, and audio with more channels than
+        the device has is mixed down. The sample rate of the audio is kept if
+        the device supports it, and otherwise the default sample rate of the
+        device is used, so the system mixer doesn't need to resample.
+        """
+        if sd is None:
+            return super().negotiate_format(samplerate, channels, device)
+
+        try:
+            info = sd.query_devices(device, "output")
+        except (sd.PortAudioError, ValueError):
+            return super().negotiate_format(samplerate, channels, device)
+
+        channels = max(1, min(max(channels, 2), info["max_output_channels"]))
+
+        try:
+            sd.check_output_settings(device=device, channels=channels, samplerate=samplerate)
+        except (sd.PortAudioError, ValueError):
+            samplerate = int(info["default_samplerate"])
+
+        return samplerate, channels
+
+    def open_stream(self,
+                    samplerate: int,
+                    channels: int,
+                    dtype: str,
+                    callback,
+                    finished_callback,
+                    device: int | str = None,
+                    blocksize: int = 0,
+                    latency: str | float = "high"):
+        if sd is None:
+            raise OutputUnavailableError("PortAudio is not installed")
+
+        try:
+            return sd.OutputStream(samplerate=samplerate,
+                                   channels=channels,
+                                   dtype=dtype,
+                                   device=device,
+                                   blocksize=blocksize,
+                                   latency=latency,
+                                   callback=callback,
+                                   finished_callback=finished_callback)
+        except (sd.PortAudioError, ValueError) as e:
+            # Raised for devices which are unplugged or in use, and for
+            # settings the device doesn't support.
+            raise OutputUnavailableError(str(e)) from e
+
+
+class ClockedStream:
+    """Stream of a ClockedOutput, run when the clock of the output advances.
+
+    Attributes:
+        samplerate: Sample rate of the stream.
+        channels: Amount of channels.
+        dtype: Sample type of the blocks.
+        blocksize: Frames per callback.
+        latency: Always 0.0, as blocks are output as soon as they are filled.
+        active: Whether the callback is called as the clock advances.
+    """
+    latency = 0.0
+
+    def __init__(self,
+                 output: "ClockedOutput",
+                 samplerate: int,
+                 channels: int,
+                 dtype: str,
+                 blocksize: int,
+                 callback,
+                 finished_callback):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.dtype = dtype
+        self.blocksize = blocksize
+        self.active = False
+        self._output = output
+        self._callback = callback
+        self._finished_callback = finished_callback
+
+    @property
+    def time(self) -> float:
+        """Time of the clock of the output in seconds."""
+        return self._output.time
+
+    def start(self):
+        """Start calling the callback as the clock advances."""
+        self.active = True
+
+    def stop(self):
+        """Stop the stream."""
+        self._finish()
+
+    def abort(self):
+        """Stop the stream."""
+        self._finish()
+
+    def close(self):
+        """Stop the stream."""
+        self._finish()
+
+    def _finish(self):
+        if self.active:
+            self.active = False
+
+            if self._finished_callback is not None:
+                self._finished_callback()
+
+    def process(self, outdata: numpy.ndarray):
+        """Fill one block with the callback, stopping if it raises CallbackStop.
+
+        Args:
+            outdata: Block to fill, with shape (frames, channels).
+        """
+        now = self._output.time
+        time_info = SimpleNamespace(currentTime=now, outputBufferDacTime=now)
+
+        try:
+            self._callback(outdata, len(outdata), time_info, 0)
+        except CallbackStop:
+            self._finish()
+
+
+class ClockedOutput(AudioOutput):
+    """Output running its stream on a synthetic clock instead of a device.
+
+    Nothing happens by itself: run and run_until advance the clock a block
+    at a time, calling the callback of the open stream as fast as the CPU
+    allows. While the stream isn't active, the clock advances over silence,
+    so output audio keeps the timing of pauses. Subclasses decide what
+    happens to the audio by overriding write.
+
+    Attributes:
+        blocksize: Frames per callback of streams not asking for a size.
+        samplerate: Sample rate audio is converted to, or None to use the
+            sample rate of the audio.
+        channels: Amount of channels audio is converted to.
+        frames: Frames the clock has advanced in total.
+    """
+
+    def __init__(self,
+                 blocksize: int = CLOCKED_BLOCKSIZE,
+                 samplerate: int = None,
+                 channels: int = CLOCKED_CHANNELS):
+        self.blocksize = blocksize
+        self.samplerate = samplerate
+        self.channels = channels
+        self.frames = 0
+        self._time_s = 0.0
+        self._stream: ClockedStream = None
+        self._block: numpy.ndarray = None
+
+    @property
+    def time(self) -> float:
+        """Time of the clock in seconds."""
+        return self._time_s
+
+    def negotiate_format(self,
+                         samplerate: int,
+                         channels: int,
+                         device: int | str = None) -> tuple[int, int]:
+        return self.samplerate or samplerate, self.channels
+
+    def open_stream(self,
+                    samplerate: int,
+                    channels: int,
+                    dtype: str,
+                    callback,
+                    finished_callback,
+                    device: int | str = None,
+                    blocksize: int = 0,
+                    latency: str | float = "high"):
+        self._stream = ClockedStream(self, samplerate, channels, dtype,
+                                     blocksize or self.blocksize,
+                                     callback, finished_callback)
+
+        return self._stream
+
+    def run(self, seconds: float) -> int:
+        """Advance the clock by at least seconds, in whole blocks.
+
+        Args:
+            seconds: Time to advance in seconds.
+
+        Returns the amount of frames the clock advanced.
+        """
+        return self.run_until(self._time_s + seconds)
+
+    def run_until(self, time_s: float) -> int:
+        """Advance the clock in whole blocks until it reaches time_s.
+
+        The clock doesn't advance without an open stream, as the sample rate
+        is then unknown.
+
+        Args:
+            time_s: Clock time in seconds to advance to.
+
+        Returns the amount of frames the clock advanced.
+        """
+        advanced = 0
+
+        while self._stream is not None and self._time_s < time_s:
+            # A finished callback may open a new stream during the loop.
+            stream = self._stream
+            block = self._block
+
+            if block is None or block.shape != (stream.blocksize, stream.channels) \
+                    or block.dtype != stream.dtype:
+                block = numpy.empty((stream.blocksize, stream.channels), dtype=stream.dtype)
+                self._block = block
+
+            if stream.active:
+                stream.process(block)
+            else:
+                block[:] = 0
+
+            self.write(block, stream.samplerate)
+            self.frames += len(block)
+            self._time_s += len(block) / stream.samplerate
+            advanced += len(block)
+
+        return advanced
+
+    def write(self, block: numpy.ndarray, samplerate: int):
+        """Handle a block of output audio.
+
+        Args:
+            block: Audio with shape (frames, channels). Reused for the next
+                block, so it must be copied to be kept.
+            samplerate: Sample rate of the audio.
+        """
+
+
+class NullOutput(ClockedOutput):
+    """Clocked output discarding the audio, for running playback headless."""
+    name = "Null"
+
+
+class FileOutput(ClockedOutput):
+    """Clocked output writing the audio to a sound file, such as WAV or FLAC.
+
+    The file is created when the first stream is opened, in the format of
+    its file extension, and all streams must have the same sample rate and
+    channels. Once the file is created, audio is negotiated to its format.
+
+    Attributes:
+        path: Path of the file to write.
+        subtype: Sample format of the file, such as "PCM_16", or None for
+            the default of the file format.
+    """
+    name = "File"
+
+    def __init__(self,
+                 path: str,
+                 subtype: str = None,
+                 blocksize: int = CLOCKED_BLOCKSIZE,
+                 samplerate: int = None,
+                 channels: int = CLOCKED_CHANNELS):
+        super().__init__(blocksize, samplerate, channels)
+        self.path = path
+        self.subtype = subtype
+        self._file: sf.SoundFile = None
+
+    def negotiate_format(self,
+                         samplerate: int,
+                         channels: int,
+                         device: int | str = None) -> tuple[int, int]:
+        if self._file is not None:
+            return self._file.samplerate, self._file.channels
+
+        return super().negotiate_format(samplerate, channels, device)
+
+    def open_stream(self,
+                    samplerate: int,
+                    channels: int,
+                    dtype: str,
+                    callback,
+                    finished_callback,
+                    device: int | str = None,
+                    blocksize: int = 0,
+                    latency: str | float = "high"):
+        if self._file is None:
+            try:
+                self._file = sf.SoundFile(self.path, "w", samplerate, channels,
+                                          subtype=self.subtype)
+            except (sf.LibsndfileError, TypeError, ValueError) as e:
+                raise OutputUnavailableError(str(e)) from e
+        elif (samplerate, channels) != (self._file.samplerate, self._file.channels):
+            raise OutputUnavailableError(
+                f"{self.path} is written at {self._file.samplerate} Hz with "
+                f"{self._file.channels} channels")
+
+        return super().open_stream(samplerate, channels, dtype, callback,
+                                   finished_callback, device, blocksize, latency)
+
+    def write(self, block: numpy.ndarray, samplerate: int):
+        self._file.write(block)
+
+    def close(self):
+        """Finish writing the file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def render_performance(player, output: ClockedOutput, resume_times_s, length_s: float):
+    """Play a performance with resumes at scripted times on a clocked output.
+
+    Playback starts from the current position at the current clock time, and
+    each resume continues from the next marker like a trigger would. Runs as
+    fast as the CPU allows, so with a FileOutput it renders the performance
+    to a file in a fraction of its length.
+
+    Args:
+        player: AudioPlayer parking at stops, with a file loaded and output
+            set to output.
+        output: Clocked output of the player.
+        resume_times_s: Clock times in seconds to resume playback at.
+        length_s: Clock time in seconds to stop rendering at.
+    """
+    player.play()
+
+    for resume_s in sorted(resume_times_s):
+        output.run_until(resume_s)
+        player.resume_at_next_stop(perf_counter_ns(), player.resume_latency)
+
+    output.run_until(length_s)
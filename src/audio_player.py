@@ -1,123 +1,872 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import threading
+from time import perf_counter_ns
 import numpy
-from PySide6.QtCore import QObject, Signal
-import sounddevice as sd
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
 import soundfile as sf
+from audio_output import AudioOutput, OutputUnavailableError, SoundDeviceOutput
+from audio_source import AudioSource, MemorySource, StreamingSource, DEFAULT_SAMPLE_DTYPE
+from audio_cache import AudioCache
+from interval_index import IntervalIndex
+from time_stretch import TimeStretcher, check_tempo
+from crossfade import Crossfade
+from playback import Playback, LatencyLog
+
+POLL_INTERVAL_MS = 50
+
+LATENCY_CLASSES = ("low", "high")
 
 
 class AudioPlayer(QObject):
     """Class to play audio files.
 
+    Files are either decoded fully into memory or, in streaming mode, decoded
+    from disk during playback.
+
+    Audio is played in the sample rate and channels the output negotiates
+    for it, such as the native format of the device. Decoded files are
+    converted once when loaded, in the worker thread when loading in the
+    background, and streamed files are converted in blocks by the reader
+    thread. Mono files are played on all channels without converting.
+
+    Attributes:
+        streaming: Whether files are streamed from disk instead of decoded
+            into memory on load.
+        dtype: Sample type ("float32" or "int16") audio is decoded to and
+            played back as.
+        cache: Cache of decoded audio, or None if decoded audio isn't cached.
+        callback_stats: Duration and xrun statistics of audio callbacks.
+        device: Output device index or name, or None for the default device.
+        blocksize: Frames per callback, or 0 to let the device decide.
+        latency: Latency class ("low" or "high") or latency in seconds.
+        park_at_stops: Whether the stream is kept running with silence when
+            playback stops or pauses, so playback resumes on the next
+            callback instead of after starting a stream.
+        output: Where the audio is sent, such as a sound device or a file.
+        stream_opens: Amount of output streams opened. The stream is kept
+            open over pauses, stops and loading files, so it stays at one
+            unless the output settings or the sample rate or type change.
+        resume_latency: Latencies from the action starting playback with
+            play or play_from_ms until its first frame reaches the output.
+
     Signals:
         played: When playback is started.
         paused: When playback is paused.
         file_loaded(str path, int length_s): When a file is succesfully loaded.
+        load_progress(float fraction): When background decoding progresses.
+        load_failed(str path, str error): When background decoding fails.
         time_changed:(int new_time_s) When the current second of playback changes.
+            Emitted from the thread of the player while playing, as the
+            playback position is polled every POLL_INTERVAL_MS.
+        seeked(int time_ms): When the playback position is set.
+
+    Playback stops on stop points set with set_stop_times_ms. The audio
+    thread finds them itself, so stops are sample exact and don't depend on
+    the event loop.
+
+    Playback can be slowed down or sped up without changing pitch with
+    set_tempo. Positions and stop points stay in frames of the source, and
+    the time-stretcher maps its output to them, so stops remain sample exact.
+
+    A region set with set_loop_ms is played over and over. The audio thread
+    jumps from its end back to its start itself, hiding the seam with a short
+    crossfade, and stop points inside the region are passed while looping.
+    After the given amount of passes playback stops at the end of the loop.
+    Each pass can be played faster than the previous one. Wraps are seamless
+    for audio in memory, but when streaming, the reader thread seeks back to
+    the start, so a short silence may be heard.
+
+    Pausing and stopping only park the callback on silence. Unless parking at
+    stops, the thread of the player then stops the stream, which is started
+    again when playback continues, but never closed until the output settings
+    or the sample format change.
+
+    Finer positions than seconds aren't signaled, as a signal per audio
+    buffer would flood the event loop. Instead get_position_samples and
+    get_position_ms can be read at any rate, for example on a timer synced
+    to screen refreshes.
     """
     played = Signal()
     paused = Signal()
     file_loaded = Signal(str, int)
+    load_progress = Signal(float)
+    load_failed = Signal(str, str)
     time_changed = Signal(int)
+    seeked = Signal(int)
+
+    # Delivers results of background decoding to the thread of the player.
+    _decoded = Signal(object, str, object)
 
-    def __init__(self):
+    # Tells the thread of the player about a resume from another thread.
+    _resumed = Signal()
+
+    def __init__(self,
+                 streaming: bool = False,
+                 dtype: str = DEFAULT_SAMPLE_DTYPE,
+                 cache: AudioCache = None,
+                 park_at_stops: bool = False,
+                 output: AudioOutput = None):
         super().__init__()
+        self.output = output if output is not None else SoundDeviceOutput()
+        self.streaming = streaming
+        self.dtype = dtype
+        self.cache = cache
+        self.park_at_stops = park_at_stops
+
+        # State shared with the audio thread, and the callback playing it.
+        self._playback = Playback()
+        self._path: str = None
+        # Decoded audio in the format of the file, kept for converting it
+        # again when the output changes. None when streaming.
+        self._decoded_source: MemorySource = None
         self._data: numpy.ndarray = None
+        self._file_format: tuple[int, int] = None
+        # Sample rate and channels of playback.
         self._samplerate: int = None
-
-        self._stream: sd.OutputStream = None
-        self._sample = 0
-        self._stopped = False
-        self._stop_sample: int = None
+        self._channels: int = None
+        self._loading: threading.Event = None
+        self._decoded.connect(self._loading_done)
+        self._resumed.connect(self._resumed_elsewhere)
+
+        self._stream = None
+        self._stream_format: tuple[int, int, str] = None
+        self.stream_opens = 0
+        # Sorted read-only stop times. Edits replace the arrays instead of
+        # changing them, so the audio thread always sees a consistent array.
+        self._stop_times_ms = numpy.empty(0, dtype=numpy.int64)
+        self._magnets = IntervalIndex()
+        # Start and end of the loop in milliseconds, the amount of passes
+        # (0 for looping until cleared) and the tempo added per pass.
+        self._loop_ms: tuple[int, int, int, float] = None
+        # Whether playback was parked when last polled.
+        self._last_parked = True
+        self.callback_stats = self._playback.stats
+        self.resume_latency = LatencyLog()
+
+        self.device: int | str = None
+        self.blocksize = 0
+        self.latency: str | float = "high"
 
         self._last_time_seconds = 0
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(POLL_INTERVAL_MS)
+        self._poll_timer.timeout.connect(self._poll)
 
     def get_time_s(self) -> int:
         """Current playback time in seconds."""
-        return self._sample // self._samplerate
+        return self._playback.sample // self._samplerate
 
     def get_time_ms(self) -> int:
         """Current playback time in milliseconds."""
-        return self._sample * 1000 // self._samplerate
+        return self._playback.sample * 1000 // self._samplerate
+
+    def get_position_samples(self) -> int:
+        """Sample currently heard from the output.
+
+        While playing, the position is interpolated from the stream clock
+        and the time the latest buffer reaches the output, so it is ahead
+        of neither what is heard nor what has been read from the source.
+        Otherwise it is the sample playback continues from.
+        """
+        sample = self._playback.sample
+        anchor = self._playback.output_anchor
+
+        if anchor is None or self._stream is None or not self._stream.active:
+            return sample
+
+        anchor_sample, output_time, tempo = anchor
+        elapsed = self._stream.time - output_time
+        heard = anchor_sample + int(elapsed * self._samplerate * tempo)
+
+        return max(0, min(heard, sample))
+
+    def get_position_ms(self) -> int:
+        """Time in milliseconds currently heard from the output.
+
+        See get_position_samples.
+        """
+        if self._samplerate is None:
+            return 0
+
+        return self.get_position_samples() * 1000 // self._samplerate
+
+    def get_samplerate(self) -> int | None:
+        """Sample rate of the loaded file, or None if no file is loaded."""
+        if self._file_format is None:
+            return None
+
+        return self._file_format[0]
+
+    def get_decoded_audio(self) -> numpy.ndarray | None:
+        """Decoded audio of the loaded file with shape (frames, channels).
+
+        The audio is in the sample rate of the file, before any conversion
+        for the output. Returns None if no file is loaded or the file is
+        streamed.
+        """
+        return self._data
+
+    def get_output_format(self) -> tuple[int, int] | None:
+        """Sample rate and channels of playback, or None if no file is loaded."""
+        if self._playback.source is None:
+            return None
+
+        return self._samplerate, self._channels
+
+    def get_memory_bytes(self) -> int:
+        """Memory in bytes used for decoded audio of the loaded file."""
+        if self._playback.source is None:
+            return 0
+
+        if self._decoded_source is None or self._decoded_source is self._playback.source:
+            return self._playback.source.nbytes
 
-    def stop_at_time_ms(self, time_ms: int):
-        """Set a stop point for playback.
+        return self._playback.source.nbytes + self._decoded_source.nbytes
+
+    def get_load_times_ms(self) -> tuple[float, float]:
+        """Time in milliseconds spent decoding and converting the loaded file.
+
+        Conversion is timed separately from decoding. For streamed files
+        both grow during playback.
+        """
+        if self._playback.source is None:
+            return 0.0, 0.0
+
+        return self._playback.source.decode_ns / 1e6, self._playback.source.convert_ns / 1e6
+
+    @staticmethod
+    def get_output_devices() -> list[tuple[int, str]]:
+        """Index and name of each available output device."""
+        return SoundDeviceOutput.get_devices()
+
+    def configure_stream(self,
+                         device: int | str = None,
+                         blocksize: int = 0,
+                         latency: str | float = "high",
+                         background: bool = False):
+        """Set output stream parameters.
+
+        The stream of a loaded file is reopened with the new parameters, which
+        pauses playback. If the new device plays the file in another format,
+        the file is converted again. A file decoded into memory is then
+        loaded again from its decoded audio, emitting file_loaded, and
+        playback continues from the same time.
 
         Args:
-            time_ms: Time in milliseconds on which playback should stop.
+            device: Output device index or name, or None for the default.
+            blocksize: Frames per callback, or 0 to let the device decide.
+            latency: Latency class ("low" or "high") or latency in seconds.
+            background: Convert a file decoded into memory in a worker
+                thread like load_file. The file is unloaded until then.
+
+        Raises OutputUnavailableError if the stream can't be reopened. The
+        file is then unloaded.
+        """
+        self.device = device
+        self.blocksize = blocksize
+        self.latency = latency
+
+        if self._stream is None:
+            return
+
+        self._halt()
+
+        if self._playback.source is not None:
+            self._poll()
+
+        self._stream.close()
+        self._stream = None
+        self._stream_format = None
+
+        if self._playback.source is None:
+            return
+
+        time_ms = self.get_time_ms()
+        source = self._playback.source
+        samplerate, channels, _ = self._output_format(*self._file_format)
+
+        try:
+            if samplerate == source.samplerate and source.channels in (1, channels):
+                self._use_source(source)
+                self._goto(self._ms_to_sample(time_ms))
+            elif self._decoded_source is None:
+                # The reader thread of a new streaming source converts it.
+                source.close()
+                self._use_source(self._open_streaming(self._path))
+                self._goto(self._ms_to_sample(time_ms))
+            else:
+                path = self._path
+                decoded = self._decoded_source
+                self._unload()
+                self._load_decoded(path, decoded, background, time_ms)
+        except OutputUnavailableError:
+            self.load_file("")
+            raise
+
+    def get_output_latency_ms(self) -> float:
+        """Output latency in milliseconds reported by the open stream.
+
+        Returns 0.0 if no file is loaded.
         """
-        self._stop_sample = self._samplerate * time_ms // 1000
+        if self._playback.source is None:
+            return 0.0
+
+        return self._stream.latency * 1000
 
-    def _finished_callback(self):
-        """Reinitializes stream so playback can continue."""
-        if self._stopped:
-            self._init_stream()
-            self._stopped = False
+    def set_tempo(self, tempo: float):
+        """Set the playback speed without changing pitch.
 
-        self.paused.emit()
+        Takes effect on the next audio block, also during playback.
 
-    def _get_sample_boundary(self):
-        """Return nearest sample on which playback should be stopped.
+        Args:
+            tempo: Speed relative to the original, from MIN_TEMPO to
+                MAX_TEMPO, such as 0.8 for 80 %.
 
-        Playback should be stopped on a stop point or end of file.
+        Raises ValueError if the tempo is out of range.
         """
-        if self._stop_sample is not None and self._sample < self._stop_sample:
-            return self._stop_sample
+        check_tempo(tempo)
+        self._playback.tempo = float(tempo)
+
+    def get_tempo(self) -> float:
+        """Playback speed relative to the original."""
+        return self._playback.tempo
 
-        return len(self._data)
+    def set_loop_ms(self, start_ms: int, end_ms: int, passes: int = 0, speed_up: float = 0.0):
+        """Loop playback between two points, such as two markers.
 
-    def _init_stream(self):
-        """Initializes an audio stream based on data from the loaded file.
+        The loop takes effect on the next audio block, also during playback,
+        and is kept over loading other files. Setting a loop, or seeking,
+        restarts counting its passes.
 
-        File needs decoded into self._data and this needs to be called before playing.
+        Args:
+            start_ms: Start of the loop in milliseconds.
+            end_ms: End of the loop in milliseconds.
+            passes: Amount of times the loop is played before playback stops
+                at its end, or 0 to loop until the loop is cleared.
+            speed_up: Tempo added on each pass, such as 0.05 for 5 % faster
+                every pass. The tempo is kept between MIN_TEMPO and
+                MAX_TEMPO.
+
+        Raises ValueError if the loop is empty or passes is negative.
         """
-        def callback(outdata: numpy.ndarray,
-                     frames: int,
-                     _time,
-                     _status):
-            chunksize = min(self._get_sample_boundary() - self._sample, frames)
-            outdata[:chunksize] = self._data[self._sample:self._sample + chunksize]
+        if not 0 <= start_ms < end_ms:
+            raise ValueError(f"Loop from {start_ms} ms to {end_ms} ms is empty")
 
-            self._sample += chunksize
+        if passes < 0:
+            raise ValueError(f"Amount of passes {passes} is negative")
 
-            current_time = self.get_time_s()
+        self._loop_ms = (int(start_ms), int(end_ms), int(passes), float(speed_up))
+        self._update_loop_samples()
 
-            if current_time != self._last_time_seconds:
-                self._last_time_seconds = current_time
-                self.time_changed.emit(current_time)
+    def clear_loop(self):
+        """Stop looping, letting playback continue past the end of the loop."""
+        self._loop_ms = None
+        self._update_loop_samples()
+
+    def get_loop_ms(self) -> tuple[int, int] | None:
+        """Start and end of the loop in milliseconds, or None without a loop."""
+        if self._loop_ms is None:
+            return None
+
+        return self._loop_ms[:2]
+
+    def get_loop_passes(self) -> int:
+        """Amount of passes of the loop completed since it was set or seeked into."""
+        return self._playback.loop_passes
+
+    def _update_loop_samples(self):
+        """Convert the loop to samples of the loaded file."""
+        loop_samples = None
+
+        if self._loop_ms is not None and self._samplerate is not None:
+            start_ms, end_ms, passes, speed_up = self._loop_ms
+            loop_samples = (self._ms_to_sample(start_ms), self._ms_to_sample(end_ms),
+                            passes, speed_up)
+
+        # A single reference assignment, so the audio thread sees a whole
+        # loop, and a new tuple restarts counting passes.
+        self._playback.loop_samples = loop_samples
+
+    def set_stop_times_ms(self, times_ms):
+        """Set the points where playback stops.
+
+        Playback stops on the first stop point after the sample it was
+        started or continued from, so continuing from a stop point plays on
+        to the next one. The points are kept over loading other files.
+
+        Args:
+            times_ms: Sorted sequence of stop times in milliseconds, such as
+                the marker times of a project.
+        """
+        times_ms = numpy.array(times_ms, dtype=numpy.int64)
+        times_ms.flags.writeable = False
+        self._stop_times_ms = times_ms
+        self._update_stop_samples()
+
+    def get_stop_samples(self) -> numpy.ndarray:
+        """Read-only sorted array of the stop points in samples."""
+        return self._playback.stop_samples
+
+    def _update_stop_samples(self):
+        """Convert the stop times to samples of the loaded file."""
+        if self._samplerate is None:
+            stop_samples = numpy.empty(0, dtype=numpy.int64)
+        else:
+            stop_samples = -(-self._stop_times_ms * self._samplerate // 1000)
 
-            if chunksize < frames:
-                outdata[chunksize:] = 0
-                self._stopped = True
-                raise sd.CallbackStop()
+        stop_samples.flags.writeable = False
+        # A single reference assignment, so the audio thread sees either the
+        # old or the new array.
+        self._playback.stop_samples = stop_samples
 
-        self._stream = sd.OutputStream(
+    def set_magnets(self, magnets: IntervalIndex):
+        """Set the capture ranges of magnetic markers for resuming playback.
+
+        Args:
+            magnets: Index of capture ranges in milliseconds with marker times
+                in milliseconds as values, such as from
+                Project.get_magnet_index. It must not be changed afterwards.
+        """
+        self._magnets = magnets
+
+    def _resume_target(self, sample: int) -> int:
+        """Sample a jump from sample resumes playback from.
+
+        A stop point on sample is resumed from as is. Otherwise the nearest
+        magnetic marker whose capture range covers the position captures the
+        jump, and without one the jump goes to the next stop point. Returns
+        sample itself if there is no next stop point.
+        """
+        stops = self._playback.stop_samples
+        index = int(stops.searchsorted(sample))
+
+        if index < len(stops) and stops[index] == sample:
+            return sample
+
+        time_ms = sample * 1000 // self._samplerate
+        covering = self._magnets.covering(time_ms)
+
+        if len(covering) > 0:
+            nearest_ms = min(covering, key=lambda marker_ms: abs(marker_ms - time_ms))
+            return self._ms_to_sample(nearest_ms)
+
+        if index < len(stops):
+            return int(stops[index])
+
+        return sample
+
+    def _ms_to_sample(self, time_ms: int) -> int:
+        """First sample at or after time_ms.
+
+        Rounding up makes get_time_ms on the returned sample give back
+        time_ms, so a position set to a marker reads as on the marker.
+        """
+        return -(-self._samplerate * time_ms // 1000)
+
+    @Slot()
+    def _poll(self):
+        """Follow playback position published by the audio thread."""
+        current_time = self.get_time_s()
+
+        if current_time != self._last_time_seconds:
+            self._last_time_seconds = current_time
+            self.time_changed.emit(current_time)
+
+        # Playback parked before a resume request was taken is about to
+        # continue.
+        parked = self._playback.pending_request() is None and self._playback.parked
+
+        if parked and not self._last_parked:
+            self._last_parked = True
+
+            if not self.park_at_stops and self._stream.active:
+                self._stream.stop()
+
+            self._stage_resume()
+            self.paused.emit()
+
+        # A file whose stream couldn't be opened is unloaded without one.
+        if self._stream is None or not self._stream.active or parked:
+            self._poll_timer.stop()
+
+    def _is_playing(self) -> bool:
+        """Return whether playback is playing or about to, after pending requests."""
+        request = self._playback.pending_request()
+
+        if request is not None:
+            return request[0] is not None
+
+        return self._stream.active and not self._playback.parked
+
+    def _stage_resume(self):
+        """Prefetch frames from where a jump would resume playback.
+
+        Jumps resume from the next stop point at or after the current sample,
+        which is the current sample when parked on a stop point, unless a
+        magnetic marker captures them.
+        """
+        target = self._resume_target(self._playback.sample)
+        self._playback.source.prefetch(min(target, self._playback.source.frames))
+
+    def _halt(self):
+        """Stop the stream at once and park playback, keeping the stream open.
+
+        Resume requests not yet taken by the audio thread are dropped. Call
+        _poll afterwards to signal the pause.
+        """
+        if self._stream is not None and self._stream.active:
+            self._stream.abort()
+
+        # Parked after the abort, as the audio thread may have taken a resume
+        # request during its last block.
+        self._playback.park()
+
+    def _open_stream(self):
+        """Open an output stream in the format of the loaded file.
+
+        The callback plays from whichever source is loaded, so the stream
+        can be reused for files of the same format. A stream already open is
+        closed. When parking at stops, the stream is started right away.
+
+        Raises OutputUnavailableError if the stream can't be opened. No
+        stream is open then.
+        """
+        # The old stream is closed first, as devices may not allow opening
+        # another stream while it's open.
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+            self._stream_format = None
+
+        self._stream = self.output.open_stream(
             samplerate=self._samplerate,
-            channels=2,
-            callback=callback,
-            finished_callback=self._finished_callback
+            channels=self._channels,
+            dtype=self._playback.source.dtype,
+            device=self.device,
+            blocksize=self.blocksize,
+            latency=self.latency,
+            callback=self._playback.callback,
+            finished_callback=None
         )
+        self._stream_format = (self._samplerate, self._channels, self._playback.source.dtype)
+        self.stream_opens += 1
 
-    def load_file(self, path: str):
-        """Load and decode file into memory.
+        if self.park_at_stops:
+            self._stream.start()
+
+    def _unload(self):
+        """Stop playback and release the loaded file, keeping the stream open."""
+        if self._playback.source is not None:
+            self._halt()
+            self._poll()
+            self._playback.source.close()
+
+        if self._decoded_source is not None and self._decoded_source is not self._playback.source:
+            self._decoded_source.close()
+
+        self._poll_timer.stop()
+        self._playback.source = None
+        self._path = None
+        self._decoded_source = None
+        self._data = None
+        self._file_format = None
+        self._samplerate = None
+        self._channels = None
+        self._playback.sample = 0
+        self._playback.output_anchor = None
+
+    def load_file(self, path: str, background: bool = False):
+        """Load file for playback.
+
+        The file is decoded into memory, or opened for streaming if streaming
+        is enabled. A loading still in progress is cancelled.
 
         Args:
             path: File to load.
+            background: Decode the file in a worker thread. Loading progress is
+                reported with load_progress and file_loaded is emitted when
+                decoding is done.
+
+        Raises OutputUnavailableError if no stream can be opened for the
+        file. When decoding in the background, load_failed is emitted
+        instead.
         """
-        if self._stream is not None:
-            self._stream.abort()
+        self.cancel_loading()
+        self._unload()
 
         if path == "":
-            self._data = None
-            self._samplerate = None
-            self._stream = None
-            self._sample = 0
             self.file_loaded.emit(path, 0)
+            return
+
+        if self.streaming:
+            self._set_source(path, self._open_streaming(path))
+            return
+
+        if self.cache is not None:
+            cached = self.cache.get(path, self.dtype)
+
+            if cached is not None:
+                self._load_decoded(path, cached, background)
+                return
+
+        # Opening the file only reads its header, so unreadable files raise
+        # here instead of in the worker thread.
+        sound_file = sf.SoundFile(path)
+
+        output_format = self._output_format(sound_file.samplerate, sound_file.channels)
+
+        if background:
+            self._loading = threading.Event()
+            threading.Thread(target=self._decode,
+                             args=(path, sound_file, output_format, self._loading),
+                             daemon=True).start()
         else:
-            self._data, self._samplerate = sf.read(path, always_2d=True)
-            self._init_stream()
-            length = len(self._data) // self._samplerate
-            self.file_loaded.emit(path, length)
-            self._goto(0)
+            with sound_file:
+                source = MemorySource.from_sound_file(sound_file, self.dtype)
+
+            self._decoding_done(path, source, self._convert(source, output_format))
+
+    def cancel_loading(self):
+        """Cancel a background loading in progress."""
+        if self._loading is not None:
+            self._loading.set()
+            self._loading = None
+
+    def is_loading(self) -> bool:
+        """Whether a file is being loaded in the background."""
+        return self._loading is not None
+
+    def _load_decoded(self,
+                      path: str,
+                      decoded: MemorySource,
+                      background: bool,
+                      time_ms: int = 0):
+        """Take decoded audio into use, converting it for the output.
+
+        Args:
+            path: Path of the decoded file.
+            decoded: Decoded audio of the file.
+            background: Convert the audio in a worker thread if it needs
+                converting, emitting file_loaded when done.
+            time_ms: Time in milliseconds to continue playback from.
+        """
+        output_format = self._output_format(decoded.samplerate, decoded.channels)
+
+        if background and output_format[2]:
+            self._loading = threading.Event()
+            threading.Thread(target=self._convert_decoded,
+                             args=(path, decoded, output_format, time_ms, self._loading),
+                             daemon=True).start()
+        else:
+            self._set_source(path, self._convert(decoded, output_format), decoded, time_ms)
+
+    def _decode(self,
+                path: str,
+                sound_file: sf.SoundFile,
+                output_format: tuple[int, int, bool],
+                cancelled: threading.Event):
+        """Decode a file and convert it for the output in a worker thread.
+
+        Args:
+            path: Path of the file.
+            sound_file: Opened file to decode.
+            output_format: Format to convert to, from _output_format.
+            cancelled: Event set when this loading is cancelled.
+        """
+        last_percent = -1
+
+        def progress(fraction: float):
+            nonlocal last_percent
+            percent = int(fraction * 100)
+
+            if percent != last_percent and not cancelled.is_set():
+                last_percent = percent
+                self.load_progress.emit(fraction)
+
+        try:
+            with sound_file:
+                source = MemorySource.from_sound_file(sound_file,
+                                                      self.dtype,
+                                                      progress,
+                                                      cancelled)
+        except (sf.LibsndfileError, RuntimeError) as e:
+            self._decoded.emit(cancelled, path, e)
+            return
+
+        if source is None:
+            return
+
+        self._convert_decoded(path, source, output_format, 0, cancelled)
+
+    def _convert_decoded(self,
+                         path: str,
+                         decoded: MemorySource,
+                         output_format: tuple[int, int, bool],
+                         time_ms: int,
+                         cancelled: threading.Event):
+        """Convert decoded audio for the output in a worker thread.
+
+        Args:
+            path: Path of the decoded file.
+            decoded: Decoded audio of the file.
+            output_format: Format to convert to, from _output_format.
+            time_ms: Time in milliseconds to continue playback from.
+            cancelled: Event set when this loading is cancelled.
+        """
+        converted = self._convert(decoded, output_format, cancelled)
+
+        if converted is not None:
+            self._decoded.emit(cancelled, path, (decoded, converted, time_ms))
+
+    @Slot(object, str, object)
+    def _loading_done(self, loading: threading.Event, path: str, result):
+        """Take a file decoded in the background into use.
+
+        Args:
+            loading: Event of the loading which finished.
+            path: Path of the file.
+            result: Decoded MemorySource, the MemorySource converted for
+                the output and the time in milliseconds to continue playback
+                from, or the exception decoding raised.
+        """
+        if loading is not self._loading or loading.is_set():
+            return
+
+        self._loading = None
+
+        if isinstance(result, Exception):
+            self.load_failed.emit(path, str(result))
+            return
+
+        try:
+            self._decoding_done(path, *result)
+        except OutputUnavailableError as e:
+            self.load_failed.emit(path, str(e))
+
+    def _decoding_done(self,
+                       path: str,
+                       decoded: MemorySource,
+                       source: MemorySource,
+                       time_ms: int = 0):
+        """Cache a decoded file and take it into use.
+
+        Args:
+            path: Path of the decoded file.
+            decoded: Decoded audio of the file.
+            source: Decoded audio converted for the output.
+            time_ms: Time in milliseconds to continue playback from.
+        """
+        if self.cache is not None:
+            self.cache.put(path, decoded)
+
+        self._set_source(path, source, decoded, time_ms)
+
+    def _output_format(self, samplerate: int, channels: int) -> tuple[int, int, bool]:
+        """Format the output plays audio of a format in.
+
+        Args:
+            samplerate: Sample rate of the audio.
+            channels: Amount of channels in the audio.
+
+        Returns the sample rate and amount of channels of the stream, and
+        whether the audio must be converted to them.
+        """
+        out_samplerate, out_channels = self.output.negotiate_format(
+            samplerate, channels, self.device)
+        # Reads broadcast mono audio to all channels of the stream.
+        convert = out_samplerate != samplerate or channels not in (1, out_channels)
+
+        return out_samplerate, out_channels, convert
+
+    def _convert(self,
+                 decoded: MemorySource,
+                 output_format: tuple[int, int, bool] = None,
+                 cancelled: threading.Event = None) -> MemorySource:
+        """Decoded audio converted for the output, or as is if it needs no conversion.
+
+        Args:
+            decoded: Decoded audio in the format of its file.
+            output_format: Format from _output_format, or None to negotiate it.
+            cancelled: Optional event which stops converting when set.
+
+        Returns None if converting was cancelled.
+        """
+        if output_format is None:
+            output_format = self._output_format(decoded.samplerate, decoded.channels)
+
+        samplerate, channels, convert = output_format
+
+        if not convert:
+            return decoded
+
+        return decoded.converted(samplerate, channels, cancelled)
+
+    def _open_streaming(self, path: str) -> StreamingSource:
+        """Open a file for streaming, converted for the output by the reader thread."""
+        info = sf.info(path)
+        samplerate, channels, convert = self._output_format(info.samplerate, info.channels)
+
+        if not convert:
+            return StreamingSource(path, dtype=self.dtype)
+
+        return StreamingSource(path, dtype=self.dtype, samplerate=samplerate, channels=channels)
+
+    def _use_source(self, source: AudioSource):
+        """Play from a source, opening a stream if the format changes.
+
+        Args:
+            source: Source in a format negotiated with the output.
+        """
+        self._playback.source = source
+        self._samplerate = source.samplerate
+        self._channels = self._output_format(*self._file_format)[1]
+        self._playback.stretcher = TimeStretcher(source.samplerate, source.channels, source.dtype)
+        self._playback.crossfade = Crossfade(source.samplerate, self._channels, source.dtype)
+        self._update_stop_samples()
+        self._update_loop_samples()
+
+        stream_format = (self._samplerate, self._channels, source.dtype)
+
+        if self._stream is None or self._stream_format != stream_format:
+            self._open_stream()
+        elif self.park_at_stops and not self._stream.active:
+            self._stream.start()
+
+    def _set_source(self,
+                    path: str,
+                    source: AudioSource,
+                    decoded: MemorySource = None,
+                    time_ms: int = 0):
+        """Take a loaded source into use for playback.
+
+        Args:
+            path: Path of the loaded file.
+            source: Source to play from, in a format negotiated with the
+                output.
+            decoded: Decoded audio in the format of the file, or None when
+                streaming.
+            time_ms: Time in milliseconds to continue playback from.
+        """
+        self._path = path
+        self._decoded_source = decoded
+
+        if decoded is None:
+            self._data = None
+            info = sf.info(path)
+            self._file_format = (info.samplerate, info.channels)
+        else:
+            self._data = decoded.data
+            self._file_format = (decoded.samplerate, decoded.channels)
+
+        try:
+            self._use_source(source)
+        except OutputUnavailableError:
+            self._unload()
+            raise
+
+        length = source.frames // self._samplerate
+        self.file_loaded.emit(path, length)
+        self._goto(self._ms_to_sample(time_ms))
 
     def _goto(self, sample: int):
         """Set playback next sample.
@@ -127,9 +876,24 @@ class AudioPlayer(QObject):
         Args:
             sample: Sample to set.
         """
-        if self._stream is not None:
-            self._sample = sample
-            self.time_changed.emit(self.get_time_s())
+        if self._playback.source is not None:
+            self._playback.source.seek(sample)
+            self._playback.sample = sample
+            self._playback.output_anchor = None
+            self._last_time_seconds = self.get_time_s()
+            self.time_changed.emit(self._last_time_seconds)
+            self.seeked.emit(self.get_time_ms())
+
+            if self._playback.parked:
+                self._stage_resume()
+
+    def goto_ms(self, time_ms: int):
+        """Set playback.
+
+        Args:
+            time_ms: Time in milliseconds to set playback to.
+        """
+        self._goto(self._ms_to_sample(time_ms))
 
     def goto_s(self, time_s: int):
         """Set playback.
@@ -146,20 +910,91 @@ class AudioPlayer(QObject):
         Args:
             time_ms: Time in milliseconds to jump to.
         """
-        sample = self._samplerate * time_ms // 1000
-        self._goto(sample)
-        self.play()
+        trigger_ns = perf_counter_ns()
+        self._goto(self._ms_to_sample(time_ms))
+        self.play(trigger_ns)
+
+    def play(self, trigger_ns: int = None):
+        """Start playback from current time.
 
-    def play(self):
-        """Start playback from current time."""
-        if self._stream is not None and self._stream.active is False:
-            if self._sample == len(self._data):
-                self._sample = 0
+        Args:
+            trigger_ns: perf_counter_ns time of the action starting playback,
+                for measuring resume_latency. Defaults to now.
+        """
+        if trigger_ns is None:
+            trigger_ns = perf_counter_ns()
+
+        if self._playback.source is None or self._is_playing():
+            return
+
+        if self._playback.sample == self._playback.source.frames:
+            self._goto(0)
+
+        self._playback.request = (self._playback.sample, trigger_ns, self.resume_latency)
+        self._last_parked = False
 
+        if not self._stream.active:
             self._stream.start()
-            self.played.emit()
+
+        self._poll_timer.start()
+        self.played.emit()
+
+    def resume_at_next_stop(self, trigger_ns: int, latency_log: LatencyLog) -> bool:
+        """Resume playback from the next stop point at or after the position.
+
+        Like jumping to the next marker, but safe to call from any thread and
+        doesn't wait for the event loop: the audio thread takes the request
+        on its next block. Only works when parking at stops, as the stream is
+        then already running.
+
+        If the position is within the capture range of magnetic markers set
+        with set_magnets, playback resumes from the nearest of them instead,
+        even if it's behind the position.
+
+        Args:
+            trigger_ns: perf_counter_ns time of the action resuming playback.
+            latency_log: Log to record the latency until the first resumed
+                frame reaches the output to.
+
+        Returns whether playback was resumed.
+        """
+        stream = self._stream
+        source = self._playback.source
+
+        if not self.park_at_stops or source is None or not stream.active:
+            return False
+
+        sample = self._resume_target(self._playback.sample)
+
+        if sample >= source.frames:
+            sample = 0 if self._playback.sample >= source.frames else self._playback.sample
+
+        self._playback.request = (sample, trigger_ns, latency_log)
+        self._last_parked = False
+        self._resumed.emit()
+
+        return True
+
+    @Slot()
+    def _resumed_elsewhere(self):
+        """Follow playback resumed from another thread."""
+        self._poll_timer.start()
+        self.played.emit()
 
     def pause(self):
-        """Pause playback."""
-        if self._stream is not None and self._stream.active is True:
-            self._stream.stop()
+        """Pause playback.
+
+        When parking at stops, the stream keeps running with silence, and the
+        audio thread parks on its next block in order with resume requests,
+        so a resume not yet taken doesn't override the pause. Otherwise the
+        stream is stopped at once.
+        """
+        if self._playback.source is None or not self._is_playing():
+            return
+
+        if self.park_at_stops:
+            self._playback.request = (None, perf_counter_ns(), None)
+            self._poll_timer.start()
+        else:
+            self._halt()
+            self._poll()
@@ -0,0 +1,407 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import threading
+from time import perf_counter_ns
+import numpy
+import soundfile as sf
+from audio_convert import FormatConverter
+
+STREAMING_BUFFER_FRAMES = 1 << 17
+STREAMING_READ_FRAMES = 1 << 13
+
+DECODE_BLOCK_FRAMES = 1 << 16
+
+PREFETCH_FRAMES = 1 << 16
+
+SAMPLE_DTYPES = ("float32", "int16")
+DEFAULT_SAMPLE_DTYPE = "float32"
+
+
+def _check_dtype(dtype: str):
+    if dtype not in SAMPLE_DTYPES:
+        raise ValueError(f"Unsupported sample type '{dtype}'")
+
+
+class AudioSource:
+    """Base class for sources of decoded audio frames.
+
+    read_into is called from the audio thread, everything else from the
+    thread controlling playback.
+
+    Attributes:
+        samplerate: Sample rate of the audio.
+        channels: Amount of channels in the audio.
+        frames: Length of the audio in frames.
+        dtype: Sample type of the frames given by read_into.
+        decode_ns: Time spent decoding the audio in nanoseconds.
+        convert_ns: Time spent converting the audio from the sample rate and
+            channels of its file in nanoseconds.
+    """
+
+    def __init__(self, samplerate: int, channels: int, frames: int, dtype: str):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.frames = frames
+        self.dtype = dtype
+        self.decode_ns = 0
+        self.convert_ns = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Amount of memory in bytes used for holding decoded audio."""
+        raise NotImplementedError
+
+    def read_into(self, out: numpy.ndarray, sample: int) -> int:
+        """Copy frames starting from sample into out.
+
+        Args:
+            out: Array to copy the frames to.
+            sample: First frame to copy.
+
+        Returns the amount of frames copied, which can be less than len(out)
+        if the frames are not available yet.
+        """
+        raise NotImplementedError
+
+    def seek(self, sample: int):
+        """Hint that the next read will start from sample.
+
+        Args:
+            sample: Frame where reading will continue from.
+        """
+
+    def prefetch(self, sample: int):
+        """Prepare frames from sample so that reading them doesn't wait.
+
+        Called when playback is likely to be resumed from sample, while
+        reading may still continue from elsewhere. Does nothing by default.
+
+        Args:
+            sample: Frame playback may be resumed from.
+        """
+
+    def close(self):
+        """Release resources held by the source."""
+
+
+class MemorySource(AudioSource):
+    """Audio source for audio fully decoded into memory.
+
+    Attributes:
+        data: Decoded audio with shape (frames, channels).
+    """
+
+    def __init__(self, data: numpy.ndarray, samplerate: int):
+        super().__init__(samplerate, data.shape[1], len(data), data.dtype.name)
+        self.data = data
+
+    @classmethod
+    def from_file(cls, path: str, dtype: str = DEFAULT_SAMPLE_DTYPE) -> "MemorySource":
+        """Decode a whole file into memory.
+
+        Args:
+            path: File to decode.
+            dtype: Sample type to decode to, one of SAMPLE_DTYPES.
+        """
+        with sf.SoundFile(path) as sound_file:
+            return cls.from_sound_file(sound_file, dtype)
+
+    @classmethod
+    def from_sound_file(cls,
+                        sound_file: sf.SoundFile,
+                        dtype: str = DEFAULT_SAMPLE_DTYPE,
+                        progress=None,
+                        cancelled: threading.Event = None) -> "MemorySource":
+        """Decode an opened file into memory block by block.
+
+        Args:
+            sound_file: Opened file to decode.
+            dtype: Sample type to decode to, one of SAMPLE_DTYPES.
+            progress: Optional function called with the decoded fraction
+                (0.0 to 1.0) after each block.
+            cancelled: Optional event which stops decoding when set.
+
+        Returns None if decoding was cancelled.
+        """
+        _check_dtype(dtype)
+        start_ns = perf_counter_ns()
+        frames = sound_file.frames
+        data = numpy.empty((frames, sound_file.channels), dtype=dtype)
+        decoded = 0
+
+        while decoded < frames:
+            if cancelled is not None and cancelled.is_set():
+                return None
+
+            block = sound_file.read(out=data[decoded:decoded + DECODE_BLOCK_FRAMES])
+
+            if len(block) == 0:
+                data = data[:decoded]
+                break
+
+            decoded += len(block)
+
+            if progress is not None:
+                progress(decoded / frames)
+
+        source = cls(data, sound_file.samplerate)
+        source.decode_ns = perf_counter_ns() - start_ns
+
+        return source
+
+    def converted(self,
+                  samplerate: int,
+                  channels: int,
+                  cancelled: threading.Event = None) -> "MemorySource":
+        """Convert the audio to another sample rate and amount of channels.
+
+        Args:
+            samplerate: Sample rate to convert to.
+            channels: Amount of channels to convert to.
+            cancelled: Optional event which stops converting when set.
+
+        Returns a new source with the same decode_ns, or None if converting
+        was cancelled.
+        """
+        start_ns = perf_counter_ns()
+        converter = FormatConverter(self.samplerate, self.channels,
+                                    samplerate, channels, self.dtype)
+        data = numpy.empty((converter.output_frames(self.frames), channels), dtype=self.dtype)
+        converted = 0
+
+        for start in range(0, self.frames, DECODE_BLOCK_FRAMES):
+            if cancelled is not None and cancelled.is_set():
+                return None
+
+            block = converter.process(self.data[start:start + DECODE_BLOCK_FRAMES])
+            data[converted:converted + len(block)] = block
+            converted += len(block)
+
+        block = converter.flush()
+        data[converted:converted + len(block)] = block
+
+        source = MemorySource(data, samplerate)
+        source.decode_ns = self.decode_ns
+        source.convert_ns = perf_counter_ns() - start_ns
+
+        return source
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def read_into(self, out: numpy.ndarray, sample: int) -> int:
+        amount = max(min(len(out), self.frames - sample), 0)
+        out[:amount] = self.data[sample:sample + amount]
+        return amount
+
+    def prefetch(self, sample: int):
+        # Reading the frames pages in memory-mapped data, such as audio from
+        # the on-disk cache, so the audio thread doesn't wait on the disk.
+        self.data[sample:sample + PREFETCH_FRAMES].max(initial=0)
+
+
+class StreamingSource(AudioSource):
+    """Audio source decoding a file from disk while it is played.
+
+    A reader thread keeps a bounded ring buffer filled ahead of the current
+    read position, so memory use doesn't depend on the length of the file.
+    Reading from a frame outside of the buffered range makes the reader
+    thread seek there and refill the buffer.
+
+    The audio can be converted to another sample rate and amount of channels
+    by the reader thread as it is decoded, so frames and the ring buffer are
+    in the converted format.
+    """
+
+    def __init__(self,
+                 path: str,
+                 buffer_frames: int = STREAMING_BUFFER_FRAMES,
+                 dtype: str = DEFAULT_SAMPLE_DTYPE,
+                 samplerate: int = None,
+                 channels: int = None):
+        """Open a file for streaming.
+
+        Args:
+            path: File to stream.
+            buffer_frames: Size of the ring buffer in frames.
+            dtype: Sample type to decode to, one of SAMPLE_DTYPES.
+            samplerate: Sample rate to convert to, or None to keep the
+                sample rate of the file.
+            channels: Amount of channels to convert to, or None to keep the
+                channels of the file.
+        """
+        _check_dtype(dtype)
+        self._file = sf.SoundFile(path)
+        samplerate = samplerate or self._file.samplerate
+        channels = channels or self._file.channels
+        self._converter: FormatConverter = None
+        frames = self._file.frames
+
+        if (samplerate, channels) != (self._file.samplerate, self._file.channels):
+            self._converter = FormatConverter(self._file.samplerate, self._file.channels,
+                                              samplerate, channels, dtype)
+            frames = self._converter.output_frames(frames)
+
+        super().__init__(samplerate, channels, frames, dtype)
+
+        # Converted frames not yet copied to the ring buffer.
+        self._pending = numpy.empty((0, channels), dtype=dtype)
+        self._buffer = numpy.zeros((buffer_frames, self.channels), dtype=dtype)
+        self._condition = threading.Condition()
+        self._read_pos = 0
+        self._write_pos = 0
+        self._seek_request: int = None
+        # Frame to seek the file to before decoding more, taken by the
+        # reader thread from seek requests.
+        self._file_seek: int = None
+        self._generation = 0
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._fill_buffer, daemon=True)
+        self._thread.start()
+
+    @property
+    def nbytes(self) -> int:
+        return self._buffer.nbytes
+
+    def _free_space(self) -> int:
+        return len(self._buffer) - (self._write_pos - self._read_pos)
+
+    def _wait_for_work(self):
+        """Wait until there is a seek request or space to fill.
+
+        Called with self._condition held. Returns the frame and amount to read
+        next and the frame to seek the file to first, or None if there is no
+        seek, or returns None if the source was closed.
+        """
+        while True:
+            if self._closed:
+                return None
+
+            if self._seek_request is not None:
+                self._read_pos = self._write_pos = self._seek_request
+                self._seek_request = None
+                self._generation += 1
+                self._file_seek = self._read_pos
+
+            amount = min(self._free_space(),
+                         STREAMING_READ_FRAMES,
+                         self.frames - self._write_pos)
+
+            if amount > 0:
+                file_seek = self._file_seek
+                self._file_seek = None
+                return self._write_pos, amount, file_seek
+
+            self._condition.wait()
+
+    def _fill_buffer(self):
+        """Reader thread reading frames from the file into the ring buffer."""
+        while True:
+            with self._condition:
+                work = self._wait_for_work()
+
+                if work is None:
+                    return
+
+                start, amount, file_seek = work
+                generation = self._generation
+
+            # Only this thread touches the file, the converter and the free
+            # part of the ring buffer, so seeking, decoding and copying can be
+            # done without the lock, which the audio thread takes to read.
+            if file_seek is not None:
+                self._seek_file(file_seek)
+
+            block = self._decode(amount)
+            self._copy_to_buffer(block, start)
+
+            with self._condition:
+                if generation == self._generation:
+                    self._write_pos += len(block)
+                    self._condition.notify_all()
+
+    def _seek_file(self, sample: int):
+        """Continue decoding from a frame of the source."""
+        if self._converter is None:
+            self._file.seek(sample)
+            return
+
+        self._pending = self._pending[:0]
+        self._file.seek(self._converter.reset(sample))
+
+    def _decode(self, amount: int) -> numpy.ndarray:
+        """Decode up to amount frames from the current position.
+
+        Converted frames beyond amount are kept for the next call.
+        """
+        if self._converter is None:
+            start_ns = perf_counter_ns()
+            block = self._file.read(amount, dtype=self.dtype, always_2d=True)
+            self.decode_ns += perf_counter_ns() - start_ns
+            return block
+
+        while len(self._pending) < amount:
+            start_ns = perf_counter_ns()
+            block = self._file.read(STREAMING_READ_FRAMES, dtype="float32", always_2d=True)
+            convert_start_ns = perf_counter_ns()
+            self.decode_ns += convert_start_ns - start_ns
+
+            if len(block) > 0:
+                converted = self._converter.process(block)
+            else:
+                converted = self._converter.flush()
+
+            self._pending = numpy.concatenate((self._pending, converted))
+            self.convert_ns += perf_counter_ns() - convert_start_ns
+
+            if len(block) == 0:
+                break
+
+        block = self._pending[:amount]
+        self._pending = self._pending[amount:]
+
+        return block
+
+    def _copy_to_buffer(self, block: numpy.ndarray, start: int):
+        position = start % len(self._buffer)
+        first = min(len(block), len(self._buffer) - position)
+        self._buffer[position:position + first] = block[:first]
+        self._buffer[:len(block) - first] = block[first:]
+
+    def _copy_from_buffer(self, out: numpy.ndarray, start: int):
+        position = start % len(self._buffer)
+        first = min(len(out), len(self._buffer) - position)
+        out[:first] = self._buffer[position:position + first]
+        out[first:] = self._buffer[:len(out) - first]
+
+    def read_into(self, out: numpy.ndarray, sample: int) -> int:
+        with self._condition:
+            if not self._read_pos <= sample <= self._write_pos:
+                if self._seek_request != sample:
+                    self._seek_request = sample
+                    self._condition.notify_all()
+
+                return 0
+
+            self._read_pos = sample
+            amount = min(len(out), self._write_pos - sample)
+            self._copy_from_buffer(out[:amount], sample)
+            self._read_pos += amount
+            self._condition.notify_all()
+
+            return amount
+
+    def seek(self, sample: int):
+        with self._condition:
+            if not self._read_pos <= sample < self._write_pos:
+                self._seek_request = sample
+                self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        self._thread.join()
+        self._file.close()
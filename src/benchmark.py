@@ -0,0 +1,90 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Measure the CPU time of audio callbacks against the buffer period.
+
+Plays a file headless through NullOutput, as fast as the callbacks run, and
+reports how long the callbacks took compared to the time a block lasts.
+The longest callback also includes any time the process was not scheduled,
+so the percentile is the steadier measure.
+"""
+import argparse
+from PySide6.QtCore import QCoreApplication
+from audio_output import NullOutput
+from audio_player import AudioPlayer
+
+DEFAULT_FILE = "src/tests/test_data/test.wav"
+
+
+def benchmark(path: str,
+              blocksize: int,
+              tempo: float,
+              passes: int,
+              loop_ms: tuple[int, int] = None) -> dict:
+    """Play a file passes times and collect callback statistics.
+
+    Args:
+        path: Path of the audio file to play.
+        blocksize: Frames per callback.
+        tempo: Playback tempo.
+        passes: How many times the file is played through.
+        loop_ms: Start and end in milliseconds of a loop to play instead of
+            the whole file, or None.
+
+    Returns a dict with the buffer period and callback durations in
+    microseconds.
+    """
+    output = NullOutput(blocksize=blocksize)
+    audio = AudioPlayer(output=output)
+    audio.load_file(path)
+    audio.set_tempo(tempo)
+    samplerate, _ = audio.get_output_format()
+    length_s = len(audio.get_decoded_audio()) / audio.get_samplerate() / tempo
+    start_ms = 0
+
+    if loop_ms is not None:
+        start_ms, end_ms = loop_ms
+        audio.set_loop_ms(start_ms, end_ms, passes)
+        length_s = (end_ms - start_ms) / 1000 / tempo * passes
+        passes = 1
+    audio.callback_stats.reset()
+
+    for _ in range(passes):
+        audio.goto_ms(start_ms)
+        audio.play()
+        output.run(length_s + 0.1)
+
+    stats = audio.callback_stats
+
+    return {
+        "period_us": blocksize / samplerate * 1e6,
+        "callbacks": stats.callbacks,
+        "mean_us": stats.mean_duration_us,
+        "p99_us": stats.percentile_us(99),
+        "max_us": stats.max_duration_us,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", nargs="?", default=DEFAULT_FILE)
+    parser.add_argument("--blocksize", type=int, default=128)
+    parser.add_argument("--tempo", type=float, default=0.8)
+    parser.add_argument("--passes", type=int, default=5)
+    parser.add_argument("--loop-ms", type=int, nargs=2, metavar=("START", "END"))
+    args = parser.parse_args()
+    # The player's timers need an application.
+    _app = QCoreApplication([])
+
+    result = benchmark(args.path, args.blocksize, args.tempo, args.passes,
+                       args.loop_ms)
+    period_us = result["period_us"]
+
+    print(f"{result['callbacks']} callbacks of {args.blocksize} frames "
+          f"at tempo {args.tempo}, buffer period {period_us:.0f} us")
+
+    for name in ("mean", "p99", "max"):
+        duration_us = result[f"{name}_us"]
+        print(f"{name:>5}: {duration_us:8.0f} us  {duration_us / period_us:6.1%} of period")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import numpy
+from audio_source import AudioSource
+
+LOOP_CROSSFADE_MS = 10
+
+
+class Crossfade:
+    """Equal-power crossfade hiding the seam of a jump during playback.
+
+    When playback jumps, such as from the end of a loop back to its start,
+    the audio that would have followed the jump origin is faded out over the
+    first frames played from the jump target, which are faded in. The fades
+    are applied to whole blocks at once, and a crossfade can span any amount
+    of blocks. All buffers are preallocated, so it can run in the audio
+    callback.
+
+    Attributes:
+        length: Length of the crossfade in frames.
+    """
+
+    def __init__(self, samplerate: int, channels: int, dtype: str,
+                 length_ms: int = LOOP_CROSSFADE_MS):
+        """Preallocate the fades and buffers.
+
+        Args:
+            samplerate: Sample rate of the audio.
+            channels: Amount of channels of the output blocks.
+            dtype: Sample type of the output blocks.
+            length_ms: Length of the crossfade in milliseconds.
+        """
+        self.length = max(round(samplerate * length_ms / 1000), 1)
+        self._clip = numpy.iinfo(dtype) if numpy.issubdtype(dtype, numpy.integer) else None
+
+        # Sine and cosine fades keep the power constant over the crossfade.
+        phase = (numpy.arange(self.length) + 0.5) / self.length * numpy.pi / 2
+        self._fade_in = numpy.sin(phase).astype(numpy.float32)[:, None]
+        self._fade_out = numpy.cos(phase).astype(numpy.float32)[:, None]
+
+        self._tail = numpy.zeros((self.length, channels), dtype=numpy.float32)
+        self._mixed = numpy.zeros((self.length, channels), dtype=numpy.float32)
+        self._faded = numpy.zeros((self.length, channels), dtype=numpy.float32)
+        self._index = self.length
+
+    @property
+    def active(self) -> bool:
+        """Whether a crossfade is in progress."""
+        return self._index < self.length
+
+    def start(self, source: AudioSource, sample: int):
+        """Begin fading out the audio of source following sample.
+
+        Args:
+            source: Source played before the jump.
+            sample: Frame the jump was made from.
+        """
+        read = source.read_into(self._tail, sample)
+        self._tail[read:] = 0
+        self._index = 0
+
+    def cancel(self):
+        """Stop a crossfade in progress, such as after a seek."""
+        self._index = self.length
+
+    def apply(self, block: numpy.ndarray):
+        """Mix the next frames of a crossfade in progress into block in place.
+
+        Args:
+            block: Audio played from the jump target, with shape
+                (frames, channels).
+        """
+        amount = min(len(block), self.length - self._index)
+
+        if amount <= 0:
+            return
+
+        fades = slice(self._index, self._index + amount)
+        mixed = self._mixed[:amount]
+        faded = self._faded[:amount]
+        numpy.multiply(block[:amount], self._fade_in[fades], out=mixed)
+        numpy.multiply(self._tail[fades], self._fade_out[fades], out=faded)
+        mixed += faded
+
+        if self._clip is not None:
+            numpy.clip(mixed, self._clip.min, self._clip.max, out=mixed)
+            numpy.rint(mixed, out=mixed)
+
+        block[:amount] = mixed
+        self._index += amount
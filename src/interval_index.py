@@ -0,0 +1,115 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from heapq import merge
+from itertools import islice
+
+
+class IntervalIndex:
+    """Immutable index of closed intervals for finding the ones covering a point.
+
+    A centered interval tree: each node holds the intervals containing its
+    center, sorted by start and by end, and the intervals entirely left or
+    right of the center are in its subtrees. A query visits one node per
+    level and stops scanning a node at its first interval not covering the
+    point, so it takes O(log n + k) time for k covering intervals.
+
+    Built once in O(n log n): the intervals are sorted once by start and
+    by end, and each level of the tree splits the sorted lists in linear
+    time, keeping their order. It can be shared with other threads and
+    replaced when the intervals change.
+    """
+
+    def __init__(self, intervals=()):
+        """Builds the index.
+
+        Args:
+            intervals: Iterable of (start, end, value) tuples where
+                start <= end.
+        """
+        intervals = list(intervals)
+        self._length = len(intervals)
+        self._root = self._build(sorted(intervals, key=lambda interval: interval[0]),
+                                 sorted(intervals, key=lambda interval: interval[1]))
+
+    def __len__(self):
+        return self._length
+
+    @classmethod
+    def _build(cls, sorted_by_start: list, sorted_by_end: list):
+        """Build a subtree.
+
+        Args:
+            sorted_by_start: Intervals of the subtree sorted by start.
+            sorted_by_end: The same intervals sorted by end.
+        """
+        if len(sorted_by_start) == 0:
+            return None
+
+        # The median endpoint, merged from the two sorted lists.
+        endpoints = merge((start for start, _, _ in sorted_by_start),
+                          (end for _, end, _ in sorted_by_end))
+        center = next(islice(endpoints, len(sorted_by_start), None))
+
+        by_start = []
+        left_by_start = []
+        right_by_start = []
+
+        for interval in sorted_by_start:
+            if interval[1] < center:
+                left_by_start.append(interval)
+            elif interval[0] > center:
+                right_by_start.append(interval)
+            else:
+                by_start.append((interval[0], interval[2]))
+
+        by_end = []
+        left_by_end = []
+        right_by_end = []
+
+        for interval in reversed(sorted_by_end):
+            if interval[1] < center:
+                left_by_end.append(interval)
+            elif interval[0] > center:
+                right_by_end.append(interval)
+            else:
+                by_end.append((interval[1], interval[2]))
+
+        left_by_end.reverse()
+        right_by_end.reverse()
+
+        return (center, by_start, by_end,
+                cls._build(left_by_start, left_by_end),
+                cls._build(right_by_start, right_by_end))
+
+    def covering(self, point) -> list:
+        """Values of the intervals covering point, in no particular order.
+
+        Args:
+            point: Point to query.
+        """
+        found = []
+        node = self._root
+
+        while node is not None:
+            center, by_start, by_end, left, right = node
+
+            if point < center:
+                for start, value in by_start:
+                    if start > point:
+                        break
+
+                    found.append(value)
+
+                node = left
+            elif point > center:
+                for end, value in by_end:
+                    if end < point:
+                        break
+
+                    found.append(value)
+
+                node = right
+            else:
+                found.extend(value for _, value in by_start)
+                break
+
+        return found
@@ -1,11 +1,24 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import threading
 from os import getcwd
-from PySide6.QtCore import Slot, Qt
+import numpy
+from PySide6.QtCore import QModelIndex, QPointF, QSettings, QTimer, Signal, Slot, Qt
 from PySide6 import QtWidgets, QtGui
 from soundfile import LibsndfileError
-from audio_player import AudioPlayer
+from audio_player import AudioPlayer, LATENCY_CLASSES
+from audio_output import OutputUnavailableError
+from audio_cache import AudioCache
 from project import Project
+from marker_model import MarkerListModel
 from project_persistence import ProjectPersistence
+from waveform import PeakPyramid
+from analysis_cache import AnalysisCache
+from analysis import SilenceDetector, BeatTracker
+from time_stretch import MIN_TEMPO, MAX_TEMPO
+from triggers import TriggerRouter, TriggerBackendUnavailableError, INPUT_BACKENDS
+
+FRAME_INTERVAL_MS = 16
+DEFAULT_MAGNET_RADIUS_MS = 1000
 
 
 class PlaybackBar(QtWidgets.QWidget):
@@ -17,18 +30,483 @@ class PlaybackBar(QtWidgets.QWidget):
         self.vlayout = QtWidgets.QVBoxLayout(self)
         self.vlayout.addWidget(self.slider)
 
-        self.marker_text = QtWidgets.QLabel()
+        self.setLayout(self.vlayout)
 
-        self.vlayout.addWidget(self.marker_text)
-        self.vlayout.addStretch()
 
-        self.setLayout(self.vlayout)
+class WaveformView(QtWidgets.QWidget):
+    """Painted, zoomable waveform timeline with markers and a playhead.
+
+    Scrolling moves the view, scrolling with Ctrl held zooms around the mouse
+    and clicking seeks. Painting reads peaks for the visible pixels only.
+
+    Signals:
+        seek_requested(int time_ms): When the user clicks on the timeline.
+    """
+    seek_requested = Signal(int)
+
+    ZOOM_STEP = 1.25
+    MIN_FRAMES_PER_PIXEL = 0.125
+
+    def __init__(self):
+        super().__init__()
+        self.setMinimumHeight(80)
+        self.setSizePolicy(QtWidgets.QSizePolicy.Policy.Expanding,
+                           QtWidgets.QSizePolicy.Policy.Expanding)
+
+        self._pyramid: PeakPyramid = None
+        self._samplerate = 1
+        self._markers_ms = numpy.empty(0, dtype=numpy.int64)
+        self._capture_ranges_ms = numpy.empty((0, 2), dtype=numpy.int64)
+        self._position_ms = 0
+
+        self._start = 0.0
+        self._frames_per_pixel = 1.0
+
+    def set_waveform(self, pyramid: PeakPyramid | None, samplerate: int):
+        """Show a waveform zoomed out to the whole file.
+
+        Args:
+            pyramid: Peaks of the audio, or None to clear the waveform.
+            samplerate: Sample rate of the audio.
+        """
+        self._pyramid = pyramid
+        self._samplerate = samplerate or 1
+        self._start = 0.0
+        self._frames_per_pixel = self._max_frames_per_pixel()
+        self.update()
+
+    def set_markers(self, times_ms):
+        """Set markers to draw.
+
+        Args:
+            times_ms: Sorted marker times in milliseconds.
+        """
+        self._markers_ms = numpy.asarray(times_ms, dtype=numpy.int64)
+        self.update()
+
+    def set_capture_ranges(self, ranges_ms):
+        """Set capture ranges of magnetic markers to shade.
+
+        Args:
+            ranges_ms: Array with shape (ranges, 2) of start and end times in
+                milliseconds.
+        """
+        self._capture_ranges_ms = numpy.asarray(ranges_ms, dtype=numpy.int64).reshape(-1, 2)
+        self.update()
+
+    def set_position_ms(self, time_ms: int):
+        """Move the playhead, scrolling it into view if needed.
+
+        Args:
+            time_ms: Playhead time in milliseconds.
+        """
+        self._position_ms = time_ms
+        x = self._frame_to_x(time_ms * self._samplerate / 1000)
+
+        if not 0 <= x < self.width():
+            self._start = time_ms * self._samplerate / 1000 - \
+                self.width() * self._frames_per_pixel / 10
+            self._clamp_view()
+
+        self.update()
+
+    def _max_frames_per_pixel(self) -> float:
+        if self._pyramid is None:
+            return 1.0
+
+        return max(self._pyramid.frames / max(self.width(), 1),
+                   self.MIN_FRAMES_PER_PIXEL)
+
+    def _clamp_view(self):
+        self._frames_per_pixel = min(max(self._frames_per_pixel,
+                                         self.MIN_FRAMES_PER_PIXEL),
+                                     self._max_frames_per_pixel())
+        frames = 0 if self._pyramid is None else self._pyramid.frames
+        visible = self.width() * self._frames_per_pixel
+        self._start = min(max(self._start, 0.0), max(frames - visible, 0.0))
+
+    def _frame_to_x(self, frame: float) -> float:
+        return (frame - self._start) / self._frames_per_pixel
+
+    def _x_to_ms(self, x: float) -> int:
+        frame = self._start + x * self._frames_per_pixel
+        return max(int(frame * 1000 / self._samplerate), 0)
 
-    def add_marker_widget(self, time_ms: int):
-        seconds, milliseconds = divmod(time_ms, 1000)
-        new_marker_text = f"{seconds}.{milliseconds} s"
-        self.marker_text.setText(
-            f"{self.marker_text.text()} {new_marker_text}")
+    def paintEvent(self, _event):
+        painter = QtGui.QPainter(self)
+        width = self.width()
+        height = self.height()
+        middle = height / 2
+        palette = self.palette()
+
+        painter.fillRect(self.rect(), palette.base())
+
+        if self._pyramid is None:
+            return
+
+        end = self._start + width * self._frames_per_pixel
+        mins, maxs = self._pyramid.get_peaks(int(self._start), int(end), width)
+        tops = middle - maxs * middle
+        bottoms = middle - mins * middle
+
+        # The waveform is drawn as one polygon going right along the maximums
+        # and back left along the minimums.
+        xs = numpy.arange(width, dtype=numpy.float64)
+        points = [QPointF(x, y) for x, y in zip(xs, tops)]
+        points += [QPointF(x, y + 1) for x, y in zip(xs[::-1], bottoms[::-1])]
+
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(palette.highlight())
+        painter.drawPolygon(QtGui.QPolygonF(points))
+
+        start_ms = self._x_to_ms(0)
+        end_ms = self._x_to_ms(width)
+
+        ranges = self._capture_ranges_ms
+        ranges = ranges[(ranges[:, 0] <= end_ms) & (ranges[:, 1] >= start_ms)]
+        range_xs = self._frame_to_x(ranges * self._samplerate / 1000)
+        capture_color = palette.text().color()
+        capture_color.setAlpha(40)
+
+        for left, right in range_xs.astype(numpy.int64).tolist():
+            painter.fillRect(left, 0, max(right - left, 1), height, capture_color)
+
+        first, last = numpy.searchsorted(self._markers_ms, (start_ms, end_ms + 1))
+        visible = self._markers_ms[first:last] * self._samplerate / 1000
+        marker_xs = numpy.unique(self._frame_to_x(visible).astype(numpy.int64))
+
+        painter.setPen(palette.text().color())
+
+        for x in marker_xs.tolist():
+            painter.drawLine(x, 0, x, height)
+
+        playhead_x = int(self._frame_to_x(
+            self._position_ms * self._samplerate / 1000))
+        painter.setPen(Qt.GlobalColor.red)
+        painter.drawLine(playhead_x, 0, playhead_x, height)
+
+    def wheelEvent(self, event: QtGui.QWheelEvent):
+        steps = event.angleDelta().y() / 120
+
+        if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+            x = event.position().x()
+            anchor = self._start + x * self._frames_per_pixel
+            self._frames_per_pixel /= self.ZOOM_STEP ** steps
+            self._clamp_view()
+            self._start = anchor - x * self._frames_per_pixel
+        else:
+            self._start -= steps * self.width() * self._frames_per_pixel / 10
+
+        self._clamp_view()
+        self.update()
+        event.accept()
+
+    def mousePressEvent(self, event: QtGui.QMouseEvent):
+        if self._pyramid is not None and event.button() == Qt.MouseButton.LeftButton:
+            self.seek_requested.emit(self._x_to_ms(event.position().x()))
+
+    def resizeEvent(self, _event):
+        self._clamp_view()
+
+
+class SilenceDetectionDialog(QtWidgets.QDialog):
+    """Dialog for setting the threshold and length of silences to detect."""
+
+    def __init__(self, detector: SilenceDetector, parent: QtWidgets.QWidget = None):
+        super().__init__(parent)
+        self.detector = detector
+        self.setWindowTitle("Detect silences")
+
+        self.threshold_box = QtWidgets.QDoubleSpinBox()
+        self.threshold_box.setRange(-120.0, 0.0)
+        self.threshold_box.setSuffix(" dB")
+        self.threshold_box.setValue(detector.threshold_db)
+
+        self.length_box = QtWidgets.QDoubleSpinBox()
+        self.length_box.setRange(0.1, 60.0)
+        self.length_box.setSingleStep(0.1)
+        self.length_box.setSuffix(" s")
+        self.length_box.setValue(detector.min_length_ms / 1000)
+
+        buttons = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.StandardButton.Ok |
+            QtWidgets.QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QtWidgets.QFormLayout(self)
+        layout.addRow("Threshold", self.threshold_box)
+        layout.addRow("Minimum length", self.length_box)
+        layout.addRow(buttons)
+
+    def accept(self):
+        self.detector.threshold_db = self.threshold_box.value()
+        self.detector.min_length_ms = int(self.length_box.value() * 1000)
+        super().accept()
+
+
+class LoopDialog(QtWidgets.QDialog):
+    """Dialog for setting how many times a loop is played and how it speeds up.
+
+    Attributes:
+        passes: Amount of passes, 0 for looping until stopped.
+        speed_up_percent: Tempo added on each pass in percent.
+    """
+
+    def __init__(self,
+                 start_ms: int,
+                 end_ms: int,
+                 passes: int,
+                 speed_up_percent: int,
+                 parent: QtWidgets.QWidget = None):
+        super().__init__(parent)
+        self.setWindowTitle("Loop")
+        self.passes = passes
+        self.speed_up_percent = speed_up_percent
+
+        self.passes_box = QtWidgets.QSpinBox()
+        self.passes_box.setRange(0, 99)
+        self.passes_box.setSpecialValueText("Until stopped")
+        self.passes_box.setValue(passes)
+
+        self.speed_up_box = QtWidgets.QSpinBox()
+        self.speed_up_box.setRange(0, 25)
+        self.speed_up_box.setSuffix(" % per pass")
+        self.speed_up_box.setValue(speed_up_percent)
+
+        buttons = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.StandardButton.Ok |
+            QtWidgets.QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QtWidgets.QFormLayout(self)
+        layout.addRow("Region", QtWidgets.QLabel(
+            f"{start_ms / 1000:.2f} s - {end_ms / 1000:.2f} s"))
+        layout.addRow("Passes", self.passes_box)
+        layout.addRow("Speed up", self.speed_up_box)
+        layout.addRow(buttons)
+
+    def accept(self):
+        self.passes = self.passes_box.value()
+        self.speed_up_percent = self.speed_up_box.value()
+        super().accept()
+
+
+class AudioSettingsDialog(QtWidgets.QDialog):
+    """Dialog for choosing the output device, block size and latency class.
+
+    Shows the output latency measured from the stream after applying.
+
+    Signals:
+        applied: When the chosen settings are taken into use.
+    """
+    BLOCKSIZES = (0, 32, 64, 128, 256, 512, 1024, 2048)
+
+    applied = Signal()
+
+    def __init__(self, audio: AudioPlayer, parent: QtWidgets.QWidget = None):
+        super().__init__(parent)
+        self.audio = audio
+        self.setWindowTitle("Audio output")
+
+        self.device_box = QtWidgets.QComboBox()
+        self.device_box.addItem("Default", None)
+
+        for index, name in AudioPlayer.get_output_devices():
+            self.device_box.addItem(name, index)
+
+        self.blocksize_box = QtWidgets.QComboBox()
+
+        for blocksize in self.BLOCKSIZES:
+            self.blocksize_box.addItem(
+                str(blocksize) if blocksize else "Automatic", blocksize)
+
+        self.latency_box = QtWidgets.QComboBox()
+
+        for latency in LATENCY_CLASSES:
+            self.latency_box.addItem(latency.capitalize(), latency)
+
+        self.device_box.setCurrentIndex(
+            max(self.device_box.findData(audio.device), 0))
+        self.blocksize_box.setCurrentIndex(
+            max(self.blocksize_box.findData(audio.blocksize), 0))
+        self.latency_box.setCurrentIndex(
+            max(self.latency_box.findData(audio.latency), 0))
+
+        self.latency_text = QtWidgets.QLabel()
+        self.resume_latency_text = QtWidgets.QLabel()
+        self.stream_opens_text = QtWidgets.QLabel()
+        self._update_latency_text()
+
+        buttons = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.StandardButton.Ok |
+            QtWidgets.QDialogButtonBox.StandardButton.Apply |
+            QtWidgets.QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        buttons.button(QtWidgets.QDialogButtonBox.StandardButton.Apply).clicked.connect(
+            self.apply)
+
+        layout = QtWidgets.QFormLayout(self)
+        layout.addRow("Device", self.device_box)
+        layout.addRow("Block size", self.blocksize_box)
+        layout.addRow("Latency", self.latency_box)
+        layout.addRow("Measured latency", self.latency_text)
+        layout.addRow("Trigger to sound", self.resume_latency_text)
+        layout.addRow("Streams opened", self.stream_opens_text)
+        layout.addRow(buttons)
+
+    def _update_latency_text(self):
+        latency_ms = self.audio.get_output_latency_ms()
+
+        if latency_ms == 0:
+            self.latency_text.setText("No audio file loaded")
+        else:
+            self.latency_text.setText(f"{latency_ms:.1f} ms")
+
+        resume_latency = self.audio.resume_latency
+
+        if resume_latency.count == 0:
+            self.resume_latency_text.setText("Not measured yet")
+        else:
+            self.resume_latency_text.setText(
+                f"{resume_latency.last_us / 1000:.1f} ms, "
+                f"mean {resume_latency.mean_us / 1000:.1f} ms")
+
+        self.stream_opens_text.setText(str(self.audio.stream_opens))
+
+    @Slot()
+    def apply(self):
+        """Reopen the output stream with the chosen settings."""
+        try:
+            self.audio.configure_stream(self.device_box.currentData(),
+                                        self.blocksize_box.currentData(),
+                                        self.latency_box.currentData(),
+                                        background=True)
+        except OutputUnavailableError as e:
+            # The file was unloaded, and settings which don't work aren't
+            # saved.
+            QtWidgets.QMessageBox.critical(self, "soittokone", f"Audio output: {e}")
+            self._update_latency_text()
+            return
+
+        self._update_latency_text()
+        self.applied.emit()
+
+    def accept(self):
+        self.apply()
+        super().accept()
+
+
+class TriggersDialog(QtWidgets.QDialog):
+    """Dialog for choosing trigger inputs and the triggers resuming playback.
+
+    Shows the latency from each bound trigger until sound, so pedals and
+    other inputs can be compared.
+    """
+
+    def __init__(self, triggers: TriggerRouter, parent: QtWidgets.QWidget = None):
+        super().__init__(parent)
+        self.triggers = triggers
+        self.setWindowTitle("Triggers")
+
+        layout = QtWidgets.QVBoxLayout(self)
+        self.backend_boxes = []
+
+        for backend_class in INPUT_BACKENDS:
+            box = QtWidgets.QCheckBox(backend_class.name)
+            box.setEnabled(backend_class.is_available())
+            box.setChecked(any(isinstance(backend, backend_class)
+                               for backend in triggers.get_backends()))
+            box.toggled.connect(
+                lambda checked, backend_class=backend_class:
+                    self.backend_toggled(backend_class, checked))
+            self.backend_boxes.append(box)
+            layout.addWidget(box)
+
+        self.binding_list = QtWidgets.QListWidget()
+        self.learn_button = QtWidgets.QPushButton("Learn")
+        self.learn_button.clicked.connect(self.learn_started)
+        self.remove_button = QtWidgets.QPushButton("Remove")
+        self.remove_button.clicked.connect(self.binding_removed)
+
+        buttons = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.StandardButton.Close)
+        buttons.rejected.connect(self.reject)
+
+        binding_buttons = QtWidgets.QHBoxLayout()
+        binding_buttons.addWidget(self.learn_button)
+        binding_buttons.addWidget(self.remove_button)
+
+        layout.addWidget(QtWidgets.QLabel("Triggers resuming playback"))
+        layout.addWidget(self.binding_list)
+        layout.addLayout(binding_buttons)
+        layout.addWidget(buttons)
+
+        triggers.triggered.connect(self.triggered)
+        self._update_bindings()
+
+    def _update_bindings(self):
+        self.binding_list.clear()
+
+        for trigger_name in sorted(self.triggers.bindings):
+            latency = self.triggers.latencies[trigger_name]
+            text = trigger_name
+
+            if latency.count > 0:
+                text += (f" - {latency.last_us / 1000:.1f} ms,"
+                         f" mean {latency.mean_us / 1000:.1f} ms")
+
+            item = QtWidgets.QListWidgetItem(text)
+            item.setData(Qt.ItemDataRole.UserRole, trigger_name)
+            self.binding_list.addItem(item)
+
+    def backend_toggled(self, backend_class: type, checked: bool):
+        """Start or stop a trigger input.
+
+        Args:
+            backend_class: Class of the backend.
+            checked: Whether the input is wanted.
+        """
+        running = [backend for backend in self.triggers.get_backends()
+                   if isinstance(backend, backend_class)]
+
+        if not checked:
+            for backend in running:
+                self.triggers.remove_backend(backend)
+        elif len(running) == 0:
+            try:
+                self.triggers.add_backend(backend_class())
+            except TriggerBackendUnavailableError as e:
+                QtWidgets.QMessageBox.critical(
+                    self, "soittokone", f"{backend_class.name}: {e}")
+
+    @Slot()
+    def learn_started(self):
+        """Bind the next trigger."""
+        self.triggers.learning = True
+        self.learn_button.setText("Press a key, pedal or note...")
+
+    @Slot()
+    def binding_removed(self):
+        """Unbind the selected trigger."""
+        item = self.binding_list.currentItem()
+
+        if item is not None:
+            self.triggers.unbind(item.data(Qt.ItemDataRole.UserRole))
+            self._update_bindings()
+
+    @Slot(str, bool)
+    def triggered(self, _trigger_name: str, _resumed: bool):
+        """Show new bindings and latencies."""
+        self.learn_button.setText("Learn")
+        self._update_bindings()
+
+    def done(self, result: int):
+        self.triggers.learning = False
+        self.triggers.triggered.disconnect(self.triggered)
+        super().done(result)
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -42,21 +520,52 @@ class MainWindow(QtWidgets.QMainWindow):
         length: Lenght of currently loaded audio file in seconds.
     """
 
+    # Delivers waveform peaks built in a worker thread to the GUI thread.
+    _waveform_built = Signal(object, object)
+
+    # Delivers markers suggested by analysis in a worker thread.
+    _markers_suggested = Signal(object, object)
+
+    # Delivers the tempo and beat grid found in a worker thread.
+    _beats_detected = Signal(object, float, object)
+
+    # Delivers the error of beat detection which failed in a worker thread.
+    _beat_detection_failed = Signal(object, str)
+
     def __init__(self):
         super().__init__()
-        self.audio = AudioPlayer()
+        self.audio = AudioPlayer(cache=AudioCache(), park_at_stops=True)
+        self.triggers = TriggerRouter(self.audio)
+        self._load_settings()
         self.project = Project()
 
         self.project_path: str = None
+        self._loading_path: str = None
+        self._cached_waveform: tuple[str, PeakPyramid] = None
+        self.silence_detector = SilenceDetector()
+        self._markers_suggested.connect(self.markers_suggested)
+        self.beat_tracker = BeatTracker()
+        self._beats_detected.connect(self.beats_detected)
+        self._beat_detection_failed.connect(self.beat_detection_failed)
 
         self.playing = False
         self.length = 0
+        self.loop_passes = 0
+        self.loop_speed_up_percent = 0
+
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setInterval(FRAME_INTERVAL_MS)
+        self._frame_timer.timeout.connect(self.frame_tick)
 
         self.audio.played.connect(self.played)
         self.audio.paused.connect(self.paused)
         self.audio.file_loaded.connect(self.file_loaded)
+        self.audio.load_progress.connect(self.load_progress)
+        self.audio.load_failed.connect(self.load_failed)
         self.audio.time_changed.connect(self.time_changed)
+        self.audio.seeked.connect(self.seeked)
         self.project.marker_added.connect(self.marker_added)
+        self.project.markers_changed.connect(self.markers_changed)
 
         self.menubar = QtWidgets.QMenuBar()
 
@@ -75,6 +584,59 @@ class MainWindow(QtWidgets.QMainWindow):
         self.file_menu.addAction(self.save_project)
         self.file_menu.addAction(self.save_project_as)
 
+        self.markers_menu = self.menubar.addMenu("Markers")
+
+        self.detect_silences = QtGui.QAction("Detect silences...")
+        self.detect_silences.setEnabled(False)
+        self.detect_silences.triggered.connect(self.detect_silences_opened)
+        self.markers_menu.addAction(self.detect_silences)
+
+        self.detect_beats = QtGui.QAction("Detect beats")
+        self.detect_beats.setEnabled(False)
+        self.detect_beats.triggered.connect(self.detect_beats_started)
+        self.markers_menu.addAction(self.detect_beats)
+
+        self.snap_to_beats = QtGui.QAction("Snap markers to beats")
+        self.snap_to_beats.setCheckable(True)
+        self.snap_to_beats.setEnabled(False)
+        self.markers_menu.addAction(self.snap_to_beats)
+
+        self.delete_markers = QtGui.QAction("Delete selected markers")
+        self.delete_markers.setShortcut(QtGui.QKeySequence.StandardKey.Delete)
+        self.delete_markers.triggered.connect(self.selected_markers_deleted)
+        self.markers_menu.addAction(self.delete_markers)
+
+        self.loop_markers = QtGui.QAction("Loop between selected markers...")
+        self.loop_markers.setShortcut(QtGui.QKeySequence("Ctrl+L"))
+        self.loop_markers.triggered.connect(self.loop_opened)
+        self.markers_menu.addAction(self.loop_markers)
+
+        self.stop_looping = QtGui.QAction("Stop looping")
+        self.stop_looping.setEnabled(False)
+        self.stop_looping.triggered.connect(self.loop_cleared)
+        self.markers_menu.addAction(self.stop_looping)
+
+        self.markers_menu.addSeparator()
+
+        self.magnetic_markers = QtGui.QAction("Set magnetic markers")
+        self.magnetic_markers.setCheckable(True)
+        self.markers_menu.addAction(self.magnetic_markers)
+
+        self.magnet_radius = QtGui.QAction()
+        self.magnet_radius.triggered.connect(self.magnet_radius_opened)
+        self.markers_menu.addAction(self.magnet_radius)
+        self._set_magnet_radius_ms(self.magnet_radius_ms)
+
+        self.settings_menu = self.menubar.addMenu("Settings")
+
+        self.audio_settings = QtGui.QAction("Audio output...")
+        self.audio_settings.triggered.connect(self.audio_settings_opened)
+        self.settings_menu.addAction(self.audio_settings)
+
+        self.trigger_settings = QtGui.QAction("Triggers...")
+        self.trigger_settings.triggered.connect(self.trigger_settings_opened)
+        self.settings_menu.addAction(self.trigger_settings)
+
         self.setMenuBar(self.menubar)
 
         self.toolbar = QtWidgets.QToolBar()
@@ -98,8 +660,28 @@ class MainWindow(QtWidgets.QMainWindow):
         self.jump_button.clicked.connect(self.jump_to_next)
         self.toolbar.addWidget(self.jump_button)
 
+        self.toolbar.addSeparator()
+
+        self.tempo_box = QtWidgets.QSpinBox()
+        self.tempo_box.setRange(round(MIN_TEMPO * 100), round(MAX_TEMPO * 100))
+        self.tempo_box.setSingleStep(5)
+        self.tempo_box.setPrefix("Tempo ")
+        self.tempo_box.setSuffix(" %")
+        self.tempo_box.setValue(round(self.audio.get_tempo() * 100))
+        self.tempo_box.valueChanged.connect(self.tempo_changed)
+        self.toolbar.addWidget(self.tempo_box)
+
+        self.toolbar.addSeparator()
+
+        self.loop_text = QtWidgets.QLabel()
+        self.toolbar.addWidget(self.loop_text)
+
         self.addToolBar(Qt.ToolBarArea.TopToolBarArea, self.toolbar)
 
+        self.waveform_view = WaveformView()
+        self.waveform_view.seek_requested.connect(self.audio.goto_ms)
+        self._waveform_built.connect(self.waveform_built)
+
         self.playback_bar = PlaybackBar()
         self.playback_bar.setEnabled(False)
         self.playback_bar.slider.sliderReleased.connect(
@@ -109,6 +691,18 @@ class MainWindow(QtWidgets.QMainWindow):
         self.playback_bar.slider.valueChanged.connect(
             self.playback_bar_changed)
 
+        self.marker_model = MarkerListModel(self.project)
+        self.marker_list = QtWidgets.QListView()
+        self.marker_list.setModel(self.marker_model)
+        # Uniform sizes let the view lay out only the visible rows.
+        self.marker_list.setUniformItemSizes(True)
+        self.marker_list.setSelectionMode(
+            QtWidgets.QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.marker_list.setEditTriggers(
+            QtWidgets.QAbstractItemView.EditTrigger.DoubleClicked |
+            QtWidgets.QAbstractItemView.EditTrigger.EditKeyPressed)
+        self.marker_list.clicked.connect(self.marker_clicked)
+
         self.time_text = QtWidgets.QLabel("0:00/0:00",
                                           alignment=Qt.AlignmentFlag.AlignCenter)
         self.filename_text = QtWidgets.QLabel("No audio file loaded",
@@ -121,9 +715,10 @@ class MainWindow(QtWidgets.QMainWindow):
         self.setCentralWidget(central_widget)
 
         central_layout = QtWidgets.QVBoxLayout(self)
+        central_layout.addWidget(self.waveform_view)
         central_layout.addWidget(self.playback_bar)
         central_layout.addWidget(self.time_text)
-        central_layout.addStretch()
+        central_layout.addWidget(self.marker_list)
         central_layout.addWidget(self.filename_text)
         central_layout.addWidget(self.load_button)
         central_widget.setLayout(central_layout)
@@ -148,22 +743,15 @@ class MainWindow(QtWidgets.QMainWindow):
         if path == "":
             return
 
-        opened_project = ProjectPersistence.load_project(path)
-
-        try:
-            self.audio.load_file(opened_project.audio_path)
-        except LibsndfileError as e:
-            self._error_message(str(e))
-            return
-
-        self.project = opened_project
+        self.project = ProjectPersistence.load_project(path)
         self.project.marker_added.connect(self.marker_added)
+        self.project.markers_changed.connect(self.markers_changed)
+        self.marker_model.set_project(self.project)
         self._set_project_path(path)
 
-        self.playback_bar.marker_text.setText("")
+        self.markers_changed(0, 0)
 
-        for marker in self.project.get_markers():
-            self.playback_bar.add_marker_widget(marker.time_ms)
+        self._load_audio(self.project.audio_path)
 
     @Slot()
     def project_saved(self):
@@ -177,6 +765,8 @@ class MainWindow(QtWidgets.QMainWindow):
             except OSError as e:
                 self._error_message(
                     f"Error saving '{e.filename}': {e.strerror}")
+            except ValueError as e:
+                self._error_message(f"Error saving '{self.project_path}': {e}")
 
     @Slot()
     def project_saved_as(self):
@@ -193,26 +783,64 @@ class MainWindow(QtWidgets.QMainWindow):
                 self._error_message(
                     f"Error saving '{e.filename}': {e.strerror}")
                 return
+            except ValueError as e:
+                self._error_message(f"Error saving '{path}': {e}")
+                return
 
             self._set_project_path(path)
+            self._save_analysis()
 
     @Slot()
     def played(self):
         """Set the window to playing mode."""
         self.playing = True
         self.play_button.setText("Pause")
+        self._frame_timer.start()
 
     @Slot()
     def paused(self):
         """Set the window to paused mode."""
         self.playing = False
         self.play_button.setText("Play")
+        self._frame_timer.stop()
+        self.frame_tick()
 
     @Slot()
     def set_marker(self):
-        """Add a new marker on the current playback time."""
+        """Add a new marker on the current playback time.
+
+        The marker is snapped to the nearest beat if snapping is enabled, and
+        is magnetic if magnetic markers are enabled.
+        """
         time_ms = self.audio.get_time_ms()
-        self.project.add_marker(time_ms)
+        snap = self.snap_to_beats.isChecked()
+
+        if self.magnetic_markers.isChecked():
+            self.project.add_magnetic_marker(time_ms, self.magnet_radius_ms, snap=snap)
+        else:
+            self.project.add_marker(time_ms, snap=snap)
+
+    def _set_magnet_radius_ms(self, radius_ms: int):
+        self.magnet_radius_ms = radius_ms
+        self.magnet_radius.setText(
+            f"Magnetic radius ({radius_ms / 1000:.2f} s)...")
+
+    @Slot()
+    def magnet_radius_opened(self):
+        """Ask for the capture radius of new magnetic markers."""
+        radius_s, accepted = QtWidgets.QInputDialog.getDouble(
+            self, "Magnetic radius", "Capture radius of new magnetic markers (s)",
+            self.magnet_radius_ms / 1000, 0.0, 60.0, 2)
+
+        if accepted:
+            self._set_magnet_radius_ms(int(round(radius_s * 1000)))
+            self._save_settings()
+
+    @Slot(int)
+    def tempo_changed(self, tempo_percent: int):
+        """Change the playback tempo, keeping the pitch."""
+        self.audio.set_tempo(tempo_percent / 100)
+        self._save_settings()
 
     @Slot()
     def jump_to_next(self):
@@ -221,14 +849,94 @@ class MainWindow(QtWidgets.QMainWindow):
         next_time_ms = self.project.get_next_marker_time_ms(time_ms)
         self.audio.play_from_ms(next_time_ms)
 
+    @Slot(QModelIndex)
+    def marker_clicked(self, index: QModelIndex):
+        """Move the playback position to a marker clicked in the marker list.
+
+        Args:
+            index: Model index of the marker.
+        """
+        if self.length > 0:
+            self.audio.goto_ms(index.data(MarkerListModel.TIME_ROLE))
+
+    @Slot()
+    def selected_markers_deleted(self):
+        """Delete the markers selected in the marker list."""
+        selected = self.marker_list.selectionModel().selectedIndexes()
+        self.project.remove_markers(self.marker_model.get_times_ms(selected))
+
+    @Slot()
+    def loop_opened(self):
+        """Loop playback between the first and last selected markers."""
+        selected = self.marker_list.selectionModel().selectedIndexes()
+        times_ms = self.marker_model.get_times_ms(selected)
+
+        if len(times_ms) < 2:
+            self._error_message("Select the markers to loop between")
+            return
+
+        start_ms, end_ms = min(times_ms), max(times_ms)
+        dialog = LoopDialog(start_ms, end_ms, self.loop_passes,
+                            self.loop_speed_up_percent, self)
+
+        if dialog.exec() != QtWidgets.QDialog.DialogCode.Accepted:
+            return
+
+        self.loop_passes = dialog.passes
+        self.loop_speed_up_percent = dialog.speed_up_percent
+        self.audio.set_loop_ms(start_ms, end_ms, self.loop_passes,
+                               self.loop_speed_up_percent / 100)
+        self.stop_looping.setEnabled(True)
+        self._update_loop_text()
+
+    @Slot()
+    def loop_cleared(self):
+        """Stop looping, letting playback continue past the loop."""
+        self.audio.clear_loop()
+        self.stop_looping.setEnabled(False)
+        self._update_loop_text()
+
+    def _update_loop_text(self):
+        """Show the loop and its completed passes in the toolbar."""
+        loop_ms = self.audio.get_loop_ms()
+
+        if loop_ms is None:
+            self.loop_text.setText("")
+            return
+
+        start_ms, end_ms = loop_ms
+        passes = self.audio.get_loop_passes()
+        total = "" if self.loop_passes == 0 else f"/{self.loop_passes}"
+        self.loop_text.setText(
+            f"Loop {self._to_timestamp(start_ms // 1000)}-"
+            f"{self._to_timestamp(end_ms // 1000)}, {passes}{total} passes")
+
     @Slot(int)
-    def marker_added(self, time_ms: int):
-        """Add a GUI-element for a newly added marker
+    def marker_added(self, _time_ms: int):
+        """Update stop points and the waveform for a newly added marker.
 
         Args:
-            time_ms: Marker timestamp in milliseconds.
+            _time_ms: Marker timestamp in milliseconds.
         """
-        self.playback_bar.add_marker_widget(time_ms)
+        marker_times = self.project.get_marker_times()
+        self.waveform_view.set_markers(marker_times)
+        self.audio.set_stop_times_ms(marker_times)
+
+    @Slot(int, int)
+    def markers_changed(self, _start_ms: int, _end_ms: int):
+        """Rebuild marker GUI-elements after a batch of markers changed.
+
+        Args:
+            _start_ms: Start of the changed range in milliseconds.
+            _end_ms: End of the changed range in milliseconds.
+        """
+        marker_times = self.project.get_marker_times()
+        self.waveform_view.set_markers(marker_times)
+        self.audio.set_stop_times_ms(marker_times)
+        self.audio.set_magnets(self.project.get_magnet_index())
+        self.waveform_view.set_capture_ranges(
+            [(marker.time_ms - marker.radius_ms, marker.time_ms + marker.radius_ms)
+             for marker in self.project.get_magnetic_markers()])
 
     @Slot(str, int)
     def file_loaded(self, path: str, length_s: int):
@@ -245,12 +953,128 @@ class MainWindow(QtWidgets.QMainWindow):
         self.length = length_s
         self.project.audio_path = path
         self.filename_text.setText(path)
+        decode_ms, convert_ms = self.audio.get_load_times_ms()
+        samplerate, channels = self.audio.get_output_format()
+        tooltip = (f"Decoded audio: {self.audio.get_memory_bytes() / 2**20:.1f} MiB\n"
+                   f"Decoding: {decode_ms:.0f} ms")
+
+        if convert_ms > 0:
+            tooltip += f"\nConverting to {samplerate} Hz, {channels} channels: {convert_ms:.0f} ms"
+
+        self.filename_text.setToolTip(tooltip)
         self.play_button.setEnabled(True)
         self.set_button.setEnabled(True)
         self.jump_button.setEnabled(True)
         self.playback_bar.slider.setMaximum(length_s)
         self.playback_bar.setEnabled(True)
+        self.detect_silences.setEnabled(
+            self.audio.get_decoded_audio() is not None)
+        self.detect_beats.setEnabled(
+            self.audio.get_decoded_audio() is not None)
         self.time_changed(length_s)
+        self._build_waveform()
+
+    def _build_waveform(self):
+        """Show waveform peaks of the loaded file.
+
+        Peaks loaded from the project's analysis sidecar are reused. Otherwise
+        they are built in the background and saved to the sidecar.
+        """
+        data = self.audio.get_decoded_audio()
+        samplerate = self.audio.get_samplerate()
+        cached = self._cached_waveform
+
+        if cached is not None and cached[0] == self.project.audio_path:
+            cached[1].data = data
+            self.waveform_view.set_waveform(cached[1], samplerate)
+            return
+
+        self._cached_waveform = None
+        self.waveform_view.set_waveform(None, samplerate)
+
+        if data is None:
+            return
+
+        def build():
+            self._waveform_built.emit(data, PeakPyramid.from_data(data))
+
+        threading.Thread(target=build, daemon=True).start()
+
+    def _save_analysis(self):
+        """Write waveform peaks and the beat grid to the project's analysis sidecar.
+
+        Only written from the GUI thread with the current beat grid, so that
+        writes don't overlap or save a grid which has since been replaced.
+        Nothing is written without a saved project or built peaks. The sidecar
+        only speeds up opening the project, so failing to write it is ignored.
+        """
+        if self.project_path is None or self._cached_waveform is None:
+            return
+
+        audio_path, pyramid = self._cached_waveform
+        arrays = pyramid.to_arrays()
+        beats_ms = self.project.get_beat_grid()
+
+        if len(beats_ms) > 0:
+            arrays["beats_ms"] = numpy.asarray(beats_ms, dtype=numpy.int64)
+
+        try:
+            AnalysisCache.save(AnalysisCache.sidecar_path(self.project_path),
+                               audio_path, arrays,
+                               {"samplerate": self.audio.get_samplerate()})
+        except OSError:
+            pass
+
+    def _show_cached_waveform(self, audio_path: str):
+        """Show waveform peaks from the analysis sidecar of the open project.
+
+        Doesn't need the audio file to be decoded, so the overview is shown
+        while the audio is still loading.
+
+        Args:
+            audio_path: Audio file being loaded.
+        """
+        self._cached_waveform = None
+
+        if self.project_path is None:
+            return
+
+        loaded = AnalysisCache.load(AnalysisCache.sidecar_path(self.project_path),
+                                    audio_path)
+
+        if loaded is None:
+            return
+
+        metadata, arrays = loaded
+
+        try:
+            pyramid = PeakPyramid.from_arrays(arrays)
+            samplerate = metadata["samplerate"]
+        except KeyError:
+            return
+
+        self._cached_waveform = (audio_path, pyramid)
+        self.waveform_view.set_waveform(pyramid, samplerate)
+
+        if "beats_ms" in arrays:
+            self.project.set_beat_grid(arrays["beats_ms"].tolist())
+            self.snap_to_beats.setEnabled(True)
+        self.waveform_view.set_markers(self.project.get_marker_times())
+
+    @Slot(object, object)
+    def waveform_built(self, data: numpy.ndarray, pyramid: PeakPyramid):
+        """Show waveform peaks built in the background and save them to the sidecar.
+
+        Args:
+            data: Decoded audio the peaks were built from.
+            pyramid: Built peaks.
+        """
+        if data is self.audio.get_decoded_audio():
+            self._cached_waveform = (self.project.audio_path, pyramid)
+            self.waveform_view.set_waveform(pyramid,
+                                            self.audio.get_samplerate())
+            self.waveform_view.set_markers(self.project.get_marker_times())
+            self._save_analysis()
 
     @Slot()
     def file_unloaded(self):
@@ -260,11 +1084,15 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         self.length = 0
         self.filename_text.setText("No audio file loaded")
+        self.filename_text.setToolTip("")
         self.play_button.setEnabled(False)
         self.set_button.setEnabled(False)
         self.jump_button.setEnabled(False)
         self.playback_bar.setEnabled(False)
         self.playback_bar.slider.setValue(0)
+        self.detect_silences.setEnabled(False)
+        self.detect_beats.setEnabled(False)
+        self.waveform_view.set_waveform(None, None)
 
     @Slot(int)
     def playback_bar_moved(self, action: int):
@@ -300,18 +1128,29 @@ class MainWindow(QtWidgets.QMainWindow):
     def time_changed(self, new_time_s: int):
         """Update playback bar location.
 
-        Also checks if sending a new stop time for the AudioPlayer is necessary
-        based on the new time.
-
         Args:
             new_time_s: New time in seconds.
         """
         if self.playback_bar.slider.isSliderDown() is False:
             self.playback_bar.slider.setValue(new_time_s)
 
-        next_marker_time_ms = self.project.get_next_marker_time_ms(
-            new_time_s * 1000)
-        self.audio.stop_at_time_ms(next_marker_time_ms)
+    @Slot(int)
+    def seeked(self, time_ms: int):
+        """Move the playhead to a position which was set.
+
+        Args:
+            time_ms: New position in milliseconds.
+        """
+        self.waveform_view.set_position_ms(time_ms)
+
+    @Slot()
+    def frame_tick(self):
+        """Follow the playback position at the screen refresh rate."""
+        if self.audio.get_samplerate() is None:
+            return
+
+        self.waveform_view.set_position_ms(self.audio.get_position_ms())
+        self._update_loop_text()
 
     @Slot()
     def toggle_playback(self):
@@ -331,10 +1170,225 @@ class MainWindow(QtWidgets.QMainWindow):
         if path == "":
             return
 
+        self._load_audio(path)
+
+    def _load_audio(self, path: str):
+        """Start loading an audio file in the background.
+
+        Args:
+            path: Path of the audio file, or empty to unload.
+        """
+        self._loading_path = path
+
+        # A loop is between markers of the previous file.
+        self.loop_cleared()
+        self.project.set_beat_grid(())
+        self.snap_to_beats.setEnabled(False)
+        self.snap_to_beats.setText("Snap markers to beats")
+
+        # A cached file may be loaded at once, emitting file_loaded, so the
+        # loading state is shown before starting to load.
+        if path != "":
+            self.file_unloaded()
+            self.filename_text.setText(f"Loading {path}...")
+            self._show_cached_waveform(path)
+
+        try:
+            self.audio.load_file(path, background=True)
+        except (LibsndfileError, OutputUnavailableError) as e:
+            self.load_failed(path, str(e))
+
+    @Slot(float)
+    def load_progress(self, fraction: float):
+        """Show progress of the audio file being loaded.
+
+        Args:
+            fraction: Decoded fraction of the file.
+        """
+        self.filename_text.setText(
+            f"Loading {self._loading_path}... {fraction:.0%}")
+
+    @Slot(str, str)
+    def load_failed(self, path: str, error: str):
+        """Show an error for an audio file which couldn't be decoded.
+
+        Args:
+            path: Path of the audio file.
+            error: Error message.
+        """
+        self.file_unloaded()
+        self._error_message(f"Error loading '{path}': {error}")
+
+    @Slot()
+    def detect_silences_opened(self):
+        """Suggest markers at the ends of silences in the loaded file."""
+        dialog = SilenceDetectionDialog(self.silence_detector, self)
+
+        if dialog.exec() != QtWidgets.QDialog.DialogCode.Accepted:
+            return
+
+        data = self.audio.get_decoded_audio()
+        samplerate = self.audio.get_samplerate()
+        detector = SilenceDetector(self.silence_detector.threshold_db,
+                                   self.silence_detector.min_length_ms)
+
+        def detect():
+            self._markers_suggested.emit(
+                data, detector.suggest_markers_ms(data, samplerate))
+
+        threading.Thread(target=detect, daemon=True).start()
+
+    @Slot(object, object)
+    def markers_suggested(self, data: numpy.ndarray, times_ms: numpy.ndarray):
+        """Add markers suggested by analysis to the project.
+
+        Args:
+            data: Decoded audio which was analyzed.
+            times_ms: Suggested marker times in milliseconds.
+        """
+        if data is self.audio.get_decoded_audio():
+            self.project.add_markers(times_ms.tolist())
+
+    @Slot()
+    def detect_beats_started(self):
+        """Find the beat grid of the loaded file in the background."""
+        data = self.audio.get_decoded_audio()
+        samplerate = self.audio.get_samplerate()
+        tracker = self.beat_tracker
+        self.detect_beats.setEnabled(False)
+
+        def detect():
+            try:
+                bpm, beats_ms = tracker.detect(data, samplerate)
+            except (ValueError, numpy.linalg.LinAlgError) as e:
+                self._beat_detection_failed.emit(data, str(e))
+                return
+
+            self._beats_detected.emit(data, bpm, beats_ms)
+
+        threading.Thread(target=detect, daemon=True).start()
+
+    @Slot(object, float, object)
+    def beats_detected(self, data: numpy.ndarray, bpm: float, beats_ms: numpy.ndarray):
+        """Set the beat grid found by analysis to the project.
+
+        The grid is also saved to the analysis sidecar, if the project has one.
+
+        Args:
+            data: Decoded audio which was analyzed.
+            bpm: Tempo in beats per minute, 0.0 if none was found.
+            beats_ms: Beat times in milliseconds.
+        """
+        if data is not self.audio.get_decoded_audio():
+            return
+
+        self.detect_beats.setEnabled(True)
+        self.project.set_beat_grid(beats_ms.tolist())
+        self.snap_to_beats.setEnabled(len(beats_ms) > 0)
+        self.snap_to_beats.setText(f"Snap markers to beats ({bpm:.1f} BPM)")
+
+        self._save_analysis()
+
+    @Slot(object, str)
+    def beat_detection_failed(self, data: numpy.ndarray, error: str):
+        """Show an error for beat detection which failed.
+
+        Args:
+            data: Decoded audio which was analyzed.
+            error: Error message.
+        """
+        if data is not self.audio.get_decoded_audio():
+            return
+
+        self.detect_beats.setEnabled(True)
+        self._error_message(f"Error detecting beats: {error}")
+
+    def _load_settings(self):
+        """Apply output stream, trigger, marker and tempo settings saved on this machine."""
+        settings = QSettings("soittokone", "soittokone")
+        device_name = settings.value("audio/device_name")
+        # Device indices change when devices are plugged in or the machine
+        # is restarted, so the device is saved by name. It may also have been
+        # unplugged since, and then the default device is used.
+        device = next((index for index, name in AudioPlayer.get_output_devices()
+                       if name == device_name), None)
+
+        self.audio.configure_stream(
+            device,
+            int(settings.value("audio/blocksize", 0)),
+            settings.value("audio/latency", "high"))
+
+        for trigger_name in settings.value("triggers/bindings", [], type=list):
+            self.triggers.bind(trigger_name)
+
+        enabled_backends = settings.value("triggers/backends", [], type=list)
+
+        for backend_class in INPUT_BACKENDS:
+            if backend_class.__name__ in enabled_backends:
+                # A missing library or device only leaves the input off.
+                try:
+                    self.triggers.add_backend(backend_class())
+                except TriggerBackendUnavailableError:
+                    pass
+
+        self.magnet_radius_ms = int(settings.value("markers/magnet_radius_ms",
+                                                   DEFAULT_MAGNET_RADIUS_MS))
+
+        # A tempo which isn't a number in range, such as from an edited or
+        # older settings file, falls back to the original tempo.
         try:
-            self.audio.load_file(path)
-        except LibsndfileError as e:
-            self._error_message(str(e))
+            tempo = float(settings.value("playback/tempo", 1.0))
+        except (TypeError, ValueError):
+            tempo = 1.0
+
+        if not MIN_TEMPO <= tempo <= MAX_TEMPO:
+            tempo = 1.0
+
+        self.audio.set_tempo(tempo)
+
+    def _save_settings(self):
+        """Save output stream, trigger, marker and tempo settings for this machine."""
+        settings = QSettings("soittokone", "soittokone")
+
+        device_name = next((name for index, name in AudioPlayer.get_output_devices()
+                            if index == self.audio.device), None)
+
+        if device_name is None:
+            settings.remove("audio/device_name")
+        else:
+            settings.setValue("audio/device_name", device_name)
+
+        settings.setValue("audio/blocksize", self.audio.blocksize)
+        settings.setValue("audio/latency", self.audio.latency)
+        settings.setValue("triggers/bindings", sorted(self.triggers.bindings))
+        settings.setValue("triggers/backends",
+                          [type(backend).__name__
+                           for backend in self.triggers.get_backends()])
+        settings.setValue("markers/magnet_radius_ms", self.magnet_radius_ms)
+        settings.setValue("playback/tempo", self.audio.get_tempo())
+
+    @Slot()
+    def audio_settings_opened(self):
+        """Open the audio output settings dialog."""
+        dialog = AudioSettingsDialog(self.audio, self)
+        # Settings applied before cancelling stay in use, so they're saved
+        # whenever they are applied.
+        dialog.applied.connect(self._save_settings)
+        dialog.applied.connect(self.audio_settings_applied)
+        dialog.exec()
+
+    @Slot()
+    def audio_settings_applied(self):
+        """Show the loaded file as loading while it's converted for a new output."""
+        if self.audio.is_loading():
+            self.file_unloaded()
+            self.filename_text.setText(f"Loading {self._loading_path}...")
+
+    @Slot()
+    def trigger_settings_opened(self):
+        """Open the trigger settings dialog."""
+        TriggersDialog(self.triggers, self).exec()
+        self._save_settings()
 
     def _error_message(self, error: str):
         QtWidgets.QMessageBox.critical(self, "soittokone", error)
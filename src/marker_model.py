@@ -0,0 +1,118 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QPersistentModelIndex, Qt, Slot
+from project import Project
+
+
+def format_marker_time(time_ms: int) -> str:
+    """Marker time as seconds with milliseconds, such as "12.050 s"."""
+    seconds, milliseconds = divmod(time_ms, 1000)
+    return f"{seconds}.{milliseconds:03} s"
+
+
+class MarkerListModel(QAbstractListModel):
+    """List model of the markers of a project, one row per marker in time order.
+
+    Rows are read from the project only when a view asks for them, so a view
+    with uniform item sizes only touches the visible rows however many
+    markers there are. Names can be edited through the model.
+
+    Attributes:
+        TIME_ROLE: Role for the time of the marker in milliseconds.
+    """
+    TIME_ROLE = Qt.ItemDataRole.UserRole
+
+    def __init__(self, project: Project = None):
+        super().__init__()
+        self._project: Project = None
+
+        if project is not None:
+            self.set_project(project)
+
+    def set_project(self, project: Project):
+        """Show the markers of another project.
+
+        Args:
+            project: Project to show.
+        """
+        self.beginResetModel()
+
+        if self._project is not None:
+            self._project.marker_added.disconnect(self._marker_added)
+            self._project.markers_changed.disconnect(self._markers_changed)
+            self._project.marker_renamed.disconnect(self._marker_renamed)
+
+        self._project = project
+        project.marker_added.connect(self._marker_added)
+        project.markers_changed.connect(self._markers_changed)
+        project.marker_renamed.connect(self._marker_renamed)
+
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()) -> int:
+        if parent.isValid() or self._project is None:
+            return 0
+
+        return self._project.marker_count()
+
+    def data(self, index: QModelIndex | QPersistentModelIndex,
+             role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self.rowCount():
+            return None
+
+        time_ms = self._project.get_marker_time_ms(index.row())
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            name = self._project.get_marker_name(time_ms)
+            time_text = format_marker_time(time_ms)
+            return f"{time_text}  {name}" if name else time_text
+
+        if role == Qt.ItemDataRole.EditRole:
+            return self._project.get_marker_name(time_ms)
+
+        if role == self.TIME_ROLE:
+            return time_ms
+
+        return None
+
+    def setData(self, index: QModelIndex | QPersistentModelIndex, value,
+                role: int = Qt.ItemDataRole.EditRole) -> bool:
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+
+        time_ms = self._project.get_marker_time_ms(index.row())
+        self._project.set_marker_name(time_ms, str(value).strip())
+
+        return True
+
+    def flags(self, index: QModelIndex | QPersistentModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+
+        return super().flags(index) | Qt.ItemFlag.ItemIsEditable
+
+    def get_times_ms(self, indexes) -> list[int]:
+        """Times in milliseconds of the markers on the rows of indexes.
+
+        Args:
+            indexes: Iterable of model indexes, such as a selection.
+        """
+        return [self._project.get_marker_time_ms(index.row())
+                for index in indexes if index.isValid()]
+
+    # The project changes before signaling, so rows are inserted and reset
+    # right after the change, before views can read the new rows.
+    @Slot(int)
+    def _marker_added(self, time_ms: int):
+        row = self._project.get_marker_index(time_ms)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.endInsertRows()
+
+    @Slot(int, int)
+    def _markers_changed(self, _start_ms: int, _end_ms: int):
+        self.beginResetModel()
+        self.endResetModel()
+
+    @Slot(int)
+    def _marker_renamed(self, time_ms: int):
+        index = self.index(self._project.get_marker_index(time_ms))
+        self.dataChanged.emit(index, index)
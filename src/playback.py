@@ -0,0 +1,372 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from time import perf_counter_ns
+import numpy
+from audio_source import AudioSource
+from time_stretch import TimeStretcher, MIN_TEMPO, MAX_TEMPO
+from crossfade import Crossfade
+
+CALLBACKS = 0
+XRUNS = 1
+MAX_DURATION_NS = 2
+TOTAL_DURATION_NS = 3
+
+HISTOGRAM_BINS = 24
+
+LATENCY_LOG_SIZE = 256
+
+
+class CallbackStats:
+    """Statistics of audio callbacks.
+
+    Updated in place from the audio thread, so reading them doesn't need any
+    synchronization with playback.
+
+    Attributes:
+        counters: Amount of callbacks, amount of callbacks where an underflow
+            or overflow was reported, and the longest and total callback
+            duration in nanoseconds, indexed with CALLBACKS, XRUNS,
+            MAX_DURATION_NS and TOTAL_DURATION_NS.
+        histogram: Callback durations. Bin 0 counts callbacks shorter than
+            a microsecond, and bin i > 0 counts callbacks taking from
+            2**(i-1) to 2**i microseconds. The last bin counts everything
+            longer.
+    """
+
+    def __init__(self):
+        self.counters = numpy.zeros(4, dtype=numpy.int64)
+        self.histogram = numpy.zeros(HISTOGRAM_BINS, dtype=numpy.int64)
+
+    @property
+    def callbacks(self) -> int:
+        """Amount of callbacks run."""
+        return int(self.counters[CALLBACKS])
+
+    @property
+    def xruns(self) -> int:
+        """Amount of callbacks where an underflow or overflow was reported."""
+        return int(self.counters[XRUNS])
+
+    @property
+    def max_duration_us(self) -> float:
+        """Duration of the longest callback in microseconds."""
+        return self.counters[MAX_DURATION_NS] / 1000
+
+    @property
+    def mean_duration_us(self) -> float:
+        """Mean callback duration in microseconds, or 0.0 without callbacks."""
+        return self.counters[TOTAL_DURATION_NS] / 1000 / max(self.callbacks, 1)
+
+    def percentile_us(self, percentile: float) -> int:
+        """Upper bound in microseconds of a callback duration percentile.
+
+        Args:
+            percentile: Percentile from 0 to 100.
+        """
+        total = self.histogram.sum()
+
+        if total == 0:
+            return 0
+
+        cumulative = numpy.cumsum(self.histogram)
+        index = int(numpy.searchsorted(cumulative, total * percentile / 100))
+
+        return 1 << min(index, HISTOGRAM_BINS - 1)
+
+    def reset(self):
+        """Zero all statistics."""
+        self.counters[:] = 0
+        self.histogram[:] = 0
+
+
+class LatencyLog:
+    """Latest measured latencies.
+
+    Written from the audio thread into a preallocated ring.
+
+    Attributes:
+        values_us: Ring of latencies in microseconds.
+        count: Amount of latencies recorded in total.
+    """
+
+    def __init__(self, size: int = LATENCY_LOG_SIZE):
+        self.values_us = numpy.zeros(size)
+        self.count = 0
+
+    def record(self, latency_us: float):
+        """Add a measured latency.
+
+        Args:
+            latency_us: Latency in microseconds.
+        """
+        self.values_us[self.count % len(self.values_us)] = latency_us
+        self.count += 1
+
+    def latest_us(self) -> numpy.ndarray:
+        """Recorded latencies still in the ring, oldest first."""
+        if self.count <= len(self.values_us):
+            return self.values_us[:self.count].copy()
+
+        return numpy.roll(self.values_us, -(self.count % len(self.values_us)))
+
+    @property
+    def last_us(self) -> float:
+        """Latest latency in microseconds, 0.0 if none is recorded."""
+        if self.count == 0:
+            return 0.0
+
+        return float(self.values_us[(self.count - 1) % len(self.values_us)])
+
+    @property
+    def mean_us(self) -> float:
+        """Mean of the latencies in the ring, 0.0 if none is recorded."""
+        latest = self.latest_us()
+
+        if len(latest) == 0:
+            return 0.0
+
+        return float(latest.mean())
+
+
+class Playback:
+    """Playback state shared with the audio thread, and the stream callback advancing it.
+
+    The callback runs on the real-time audio thread. It only reads and
+    writes plain attributes and preallocated arrays, and never emits Qt
+    signals, so the thread of the player follows it by polling. The player
+    replaces the attributes the callback reads as whole references, so the
+    callback always sees consistent values, and the callback publishes its
+    results the same way.
+
+    Attributes:
+        source: Source played from, or None.
+        sample: Next sample of the source to play.
+        parked: Whether the callback plays silence. A stream is parked
+            whenever nothing is playing, and only the callback unparks, when
+            it takes a resume request.
+        request: Sample to resume from, or None to pause, perf_counter_ns
+            time of the action and the LatencyLog to record to, as one tuple.
+            A new tuple is a new request, and requests are handled in order.
+        taken_request: Latest request taken by the callback.
+        stop_samples: Sorted read-only array of stop points in samples.
+        loop_samples: Start and end of the loop in samples, the amount of
+            passes (0 for looping until cleared) and the tempo added per
+            pass, or None without a loop.
+        loop_passes: Passes of the loop completed, written by the callback.
+        tempo: Source frames per output frame outside of loops.
+        stretcher: Time-stretcher used for tempos other than 1.0, made for
+            each source.
+        crossfade: Crossfade hiding the wraps of the loop, made for each
+            source.
+        output_anchor: First sample of the latest block, the stream time it
+            reaches the output and the tempo it is played at, written by the
+            callback.
+        stats: Duration and xrun statistics of the callbacks.
+    """
+
+    def __init__(self):
+        self.source: AudioSource = None
+        self.sample = 0
+        self.parked = True
+        self.request: tuple[int | None, int, LatencyLog] = None
+        self.taken_request: tuple[int | None, int, LatencyLog] = None
+        self.stop_samples = numpy.empty(0, dtype=numpy.int64)
+        self.loop_samples: tuple[int, int, int, float] = None
+        self.loop_passes = 0
+        self.tempo = 1.0
+        self.stretcher: TimeStretcher = None
+        self.crossfade: Crossfade = None
+        self.output_anchor: tuple[int, float, float] = None
+        self.stats = CallbackStats()
+
+        # Index of the next stop point in the stop points searched, valid
+        # while playback continues from the sample after the latest block.
+        self._cursor = (0, None, -1)
+        # Time-stretcher continuing from that sample towards a boundary, or
+        # None if it needs to be restarted.
+        self._stretching: tuple[TimeStretcher, int] = (None, -1)
+        # Loop whose passes are counted, and the amount of them completed.
+        self._looped = (None, 0)
+
+    def pending_request(self) -> tuple[int | None, int, LatencyLog] | None:
+        """Return the latest request not yet taken by the callback, or None.
+
+        The callback updates parked before publishing the request it took,
+        so parked can be read after this returns None.
+        """
+        request = self.request
+
+        return request if request is not self.taken_request else None
+
+    def park(self):
+        """Park playback, dropping requests not yet taken.
+
+        Only called while the callback isn't running, such as after stopping
+        the stream.
+        """
+        self.parked = True
+        self.taken_request = self.request
+
+    def loop_tempo(self, loop: tuple[int, int, int, float], passes: int) -> float:
+        """Tempo of a pass of the loop, the set tempo outside of loops."""
+        if loop is None or passes in (0, loop[2]):
+            return self.tempo
+
+        return min(max(self.tempo + passes * loop[3], MIN_TEMPO), MAX_TEMPO)
+
+    def callback(self,
+                 outdata: numpy.ndarray,
+                 frames: int,
+                 time_info,
+                 status):
+        """Fill a block of the output stream, stopping on stop points.
+
+        The callback state is read into locals for the block and stored
+        back after it.
+        """
+        start_ns = perf_counter_ns()
+
+        request = self.request
+
+        if request is not self.taken_request:
+            sample, trigger_ns, latency_log = request
+
+            if sample is None:
+                self.parked = True
+            else:
+                self.sample = sample
+                self.parked = False
+                output_delay = time_info.outputBufferDacTime - time_info.currentTime
+                latency_log.record(
+                    (start_ns - trigger_ns) / 1000 + output_delay * 1000000)
+
+            self.taken_request = request
+
+        reached_boundary = False
+
+        if self.parked:
+            outdata[:] = 0
+        else:
+            source = self.source
+            frame_count = source.frames
+            stops = self.stop_samples
+            loop = self.loop_samples
+            crossfade = self.crossfade
+            written = 0
+            cursor, cursor_stops, next_sample = self._cursor
+            stretching, stretch_boundary = self._stretching
+            looped, passes = self._looped
+
+            if loop is not looped or self.sample != next_sample:
+                looped = loop
+                passes = 0
+                self.loop_passes = 0
+                crossfade.cancel()
+
+            self.output_anchor = (self.sample, time_info.outputBufferDacTime,
+                                  self.loop_tempo(loop, passes))
+
+            # A block is filled in segments, as playback can wrap from the
+            # end of the loop back to its start in the middle of it.
+            while True:
+                sample = self.sample
+                tempo = self.loop_tempo(loop, passes)
+
+                # The cursor only moves forward during playback, and is
+                # searched for again after a seek or a wrap or when the
+                # stop points are replaced.
+                if stops is not cursor_stops or sample != next_sample:
+                    cursor = int(stops.searchsorted(sample, side="right"))
+                    cursor_stops = stops
+                else:
+                    while cursor < len(stops) and stops[cursor] <= sample:
+                        cursor += 1
+
+                boundary = frame_count
+
+                if cursor < len(stops) and stops[cursor] < frame_count:
+                    boundary = int(stops[cursor])
+
+                # Stop points from the start of the loop on are passed
+                # while looping, and the end of the loop is the next
+                # boundary instead.
+                loop_end = -1
+
+                if loop is not None and (loop[2] == 0 or passes < loop[2]) \
+                        and sample < min(loop[1], frame_count) and boundary >= loop[0]:
+                    loop_end = boundary = min(loop[1], frame_count)
+
+                out = outdata[written:]
+
+                if tempo == 1.0:
+                    chunksize = min(boundary - sample, len(out))
+                    read = source.read_into(out[:chunksize], sample)
+                    next_sample = sample + read
+                    stretching = None
+
+                    # A short read means a streaming source is still
+                    # buffering, so playback continues with silence
+                    # instead of stopping.
+                    reached_boundary = read == chunksize and next_sample == boundary
+                else:
+                    stretcher = self.stretcher
+
+                    if stretcher is not stretching or sample != next_sample \
+                            or boundary != stretch_boundary:
+                        stretcher.reset(sample, boundary)
+                        stretching = stretcher
+                        stretch_boundary = boundary
+
+                    read = stretcher.process(out, source, tempo, boundary)
+                    reached_boundary = stretcher.position >= boundary
+                    next_sample = boundary if reached_boundary else int(stretcher.position)
+
+                crossfade.apply(out[:read])
+                written += read
+                self.sample = next_sample
+
+                if not reached_boundary or boundary != loop_end:
+                    break
+
+                passes += 1
+                self.loop_passes = passes
+
+                if passes == loop[2]:
+                    break
+
+                # The audio after the end of the loop fades out over the
+                # start of the next pass.
+                crossfade.start(source, loop_end)
+                self.sample = next_sample = loop[0]
+                cursor_stops = None
+                stretching = None
+                reached_boundary = False
+
+                if written == frames:
+                    break
+
+            if written < frames:
+                outdata[written:] = 0
+
+            self._cursor = (cursor, cursor_stops, next_sample)
+            self._stretching = (stretching, stretch_boundary)
+            self._looped = (looped, passes)
+
+        counters = self.stats.counters
+        histogram = self.stats.histogram
+
+        if status:
+            counters[XRUNS] += 1
+
+        duration_ns = perf_counter_ns() - start_ns
+        counters[CALLBACKS] += 1
+        counters[TOTAL_DURATION_NS] += duration_ns
+
+        if duration_ns > counters[MAX_DURATION_NS]:
+            counters[MAX_DURATION_NS] = duration_ns
+
+        histogram[min((duration_ns // 1000).bit_length(), HISTOGRAM_BINS - 1)] += 1
+
+        # Without parking at stops, the thread of the player stops the
+        # stream once it sees playback parked.
+        if reached_boundary:
+            self.parked = True
@@ -1,5 +1,10 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+from array import array
+from bisect import bisect_left, bisect_right
 from PySide6.QtCore import QObject, Signal
+from interval_index import IntervalIndex
+
+MARKER_TYPECODE = "q"
 
 
 class Marker:
@@ -7,77 +12,184 @@ class Marker:
 
     Attributes:
         time_ms: Time in milliseconds of this marker.
-        prev: Previous marker in the doubly linked list.
-        next: Next marker in the doubly linked list.
+        name: Name given by the user, or an empty string.
     """
 
-    def __init__(self, time_ms: int):
+    def __init__(self, time_ms: int, name: str = ""):
         self.time_ms = time_ms
-        self.prev: Marker = None
-        self.next: Marker = None
+        self.name = name
 
     def __repr__(self):
-        p = self.prev and self.prev.time_ms or None
-        n = self.next and self.next.time_ms or None
-        return f"<Marker {p}-{self.time_ms}-{n}>"
+        return f"<Marker {self.time_ms}>"
+
+
+class MagneticMarker(Marker):
+    """Marker capturing resumes from within a radius around it.
+
+    Attributes:
+        time_ms: Time in milliseconds of this marker.
+        radius_ms: Capture radius in milliseconds on both sides of the marker.
+        name: Name given by the user, or an empty string.
+    """
+
+    def __init__(self, time_ms: int, radius_ms: int, name: str = ""):
+        super().__init__(time_ms, name)
+        self.radius_ms = radius_ms
+
+    def __repr__(self):
+        return f"<MagneticMarker {self.time_ms} ±{self.radius_ms}>"
 
 
 class Project(QObject):
     """Class to hold a marker project.
 
-    Stores markers and audio path. Markers are stored in a doubly linked list.
+    Stores markers and audio path. Marker times are stored in a sorted array,
+    so lookups and finding the insertion point are binary searches.
+
+    A beat grid of the audio can be set for snapping added markers to the
+    nearest beat. The grid is analysis data and isn't saved with the project.
+
+    Markers can be named. Names are kept in a dictionary by time, as most
+    markers have none.
+
+    Magnetic markers are markers with a capture radius. Their capture ranges
+    are kept in an IntervalIndex, rebuilt when they change, so finding the
+    magnetic markers covering a time doesn't scan all of them.
 
     Attributes:
         audio_path: Audio path of this project.
     Signals:
         marker_added(int time_ms): When a marker is added.
+        markers_changed(int start_ms, int end_ms): When markers between
+            start_ms and end_ms (inclusive) are changed in one batch.
+        marker_renamed(int time_ms): When the name of a marker is changed.
     """
     marker_added = Signal(int)
+    markers_changed = Signal(int, int)
+    marker_renamed = Signal(int)
 
     def __init__(self):
         super().__init__()
-        self._first_marker: Marker = None
-        self._maybe_next: Marker = None
+        self._markers = array(MARKER_TYPECODE)
+        self._beats = array(MARKER_TYPECODE)
+        self._names: dict[int, str] = {}
+        self._radii: dict[int, int] = {}
+        self._magnet_index = IntervalIndex()
         self.audio_path: str = None
 
     def get_markers(self):
-        """Returns a generator of the markers."""
-        marker = self._first_marker
+        """Returns a generator of the markers.
 
-        while marker is not None:
-            yield marker
-            marker = marker.next
+        Magnetic markers are returned as MagneticMarker.
+        """
+        for time_ms in self._markers:
+            radius_ms = self._radii.get(time_ms)
+            name = self._names.get(time_ms, "")
 
-    def _get_last_marker(self) -> Marker | None:
-        last = None
-        marker = self._first_marker
+            if radius_ms is None:
+                yield Marker(time_ms, name)
+            else:
+                yield MagneticMarker(time_ms, radius_ms, name)
+
+    def get_marker_times(self) -> array:
+        """Returns a sorted copy of the marker times in milliseconds."""
+        return array(MARKER_TYPECODE, self._markers)
+
+    def marker_count(self) -> int:
+        """Amount of markers in the project."""
+        return len(self._markers)
+
+    def get_marker_time_ms(self, index: int) -> int:
+        """Time in milliseconds of the marker at index in time order.
+
+        Args:
+            index: Index of the marker.
+        """
+        return self._markers[index]
+
+    def get_marker_index(self, time_ms: int) -> int:
+        """Index in time order of the first marker at or after time_ms.
+
+        Args:
+            time_ms: Time in milliseconds.
+        """
+        return bisect_left(self._markers, time_ms)
 
-        while True:
-            if marker is None:
-                return last
+    def get_marker_name(self, time_ms: int) -> str:
+        """Name of the marker on time_ms, or an empty string if it has none.
 
-            last = marker
-            marker = marker.next
+        Args:
+            time_ms: Time in milliseconds of the marker.
+        """
+        return self._names.get(time_ms, "")
+
+    def get_marker_names(self) -> dict[int, str]:
+        """Returns a copy of the names of named markers by time."""
+        return dict(self._names)
+
+    def set_marker_name(self, time_ms: int, name: str):
+        """Name a marker.
+
+        Does nothing if there is no marker on time_ms.
+
+        Args:
+            time_ms: Time in milliseconds of the marker.
+            name: New name, or an empty string to remove the name.
+        """
+        index = bisect_left(self._markers, time_ms)
+
+        if index == len(self._markers) or self._markers[index] != time_ms:
+            return
+
+        if name == "":
+            self._names.pop(time_ms, None)
+        else:
+            self._names[time_ms] = name
+
+        self.marker_renamed.emit(time_ms)
+
+    def remove_markers(self, times_ms):
+        """Remove markers along with their names and capture radii.
 
-    def _get_next_marker(self, time_ms: int, start_marker: Marker = None) -> Marker | None:
-        marker = start_marker or self._first_marker
+        Emits a single markers_changed signal covering the removed markers.
 
-        while True:
-            if marker is None:
-                return None
+        Args:
+            times_ms: Iterable of times in milliseconds of markers to remove.
+                Times without a marker are ignored.
+        """
+        removed = set(times_ms).intersection(self._markers)
+
+        if len(removed) == 0:
+            return
+
+        self._markers = array(MARKER_TYPECODE,
+                              (time_ms for time_ms in self._markers
+                               if time_ms not in removed))
 
-            prev_time_ms = -1
+        for time_ms in removed:
+            self._names.pop(time_ms, None)
 
-            if marker.prev is not None:
-                prev_time_ms = marker.prev.time_ms
+        if not removed.isdisjoint(self._radii):
+            for time_ms in removed:
+                self._radii.pop(time_ms, None)
 
-            if prev_time_ms >= time_ms:
-                return None
+            self._rebuild_magnet_index()
 
-            if prev_time_ms < time_ms <= marker.time_ms:
-                return marker
+        self.markers_changed.emit(min(removed), max(removed))
 
-            marker = marker.next
+    def remove_marker(self, time_ms: int):
+        """Remove a marker.
+
+        Args:
+            time_ms: Time in milliseconds of the marker.
+        """
+        self.remove_markers((time_ms,))
+
+    def _get_last_marker(self) -> Marker | None:
+        if len(self._markers) == 0:
+            return None
+
+        return Marker(self._markers[-1])
 
     def get_next_marker_time_ms(self, time_ms: int) -> int:
         """Get the next marker time where time_ms<=next_marker_time_ms.
@@ -87,53 +199,165 @@ class Project(QObject):
         Args:
             time_ms: Time in milliseconds from where the search is started.
         """
-        maybe_next = self._get_next_marker(time_ms, self._maybe_next)
+        index = bisect_left(self._markers, time_ms)
+
+        if index == len(self._markers):
+            return 0
+
+        return self._markers[index]
 
-        if maybe_next is not None:
-            self._maybe_next = maybe_next.next
-            return maybe_next.time_ms
+    def get_previous_marker_time_ms(self, time_ms: int) -> int:
+        """Get the previous marker time where previous_marker_time_ms<time_ms.
 
-        next_marker = self._get_next_marker(time_ms)
+        If no previous marker is found, return 0.
 
-        if next_marker is None:
+        Args:
+            time_ms: Time in milliseconds from where the search is started.
+        """
+        index = bisect_left(self._markers, time_ms)
+
+        if index == 0:
             return 0
 
-        return next_marker.time_ms
+        return self._markers[index - 1]
+
+    def set_beat_grid(self, times_ms):
+        """Set the beat grid markers can be snapped to.
+
+        Args:
+            times_ms: Iterable of beat times in milliseconds.
+        """
+        self._beats = array(MARKER_TYPECODE, sorted(times_ms))
+
+    def get_beat_grid(self) -> array:
+        """Returns a sorted copy of the beat times in milliseconds."""
+        return array(MARKER_TYPECODE, self._beats)
+
+    def get_nearest_beat_ms(self, time_ms: int) -> int:
+        """Get the beat time nearest to time_ms.
+
+        If there is no beat grid, return time_ms. A time halfway between two
+        beats goes to the earlier one.
+
+        Args:
+            time_ms: Time in milliseconds to find the nearest beat to.
+        """
+        index = bisect_left(self._beats, time_ms)
+
+        if index == len(self._beats):
+            return self._beats[-1] if index > 0 else time_ms
 
-    def _link_markers(self, marker1: Marker | None, marker2: Marker | None):
-        if marker1 is not None:
-            marker1.next = marker2
-        if marker2 is not None:
-            marker2.prev = marker1
+        if index > 0 and time_ms - self._beats[index - 1] <= self._beats[index] - time_ms:
+            return self._beats[index - 1]
 
-    def add_marker(self, time_ms: int):
+        return self._beats[index]
+
+    def add_marker(self, time_ms: int, snap: bool = False):
         """Add a marker.
 
         Doesn't add duplicate markers on the same time_ms.
 
         Args:
             time_ms: Time in milliseconds to add the marker to.
+            snap: Move the marker to the nearest beat of the beat grid.
         """
-        marker = Marker(time_ms)
+        if snap:
+            time_ms = self.get_nearest_beat_ms(time_ms)
 
-        if self._first_marker is None:
-            self._first_marker = marker
-        else:
-            next_marker = self._get_next_marker(time_ms)
-            prev_marker = None
+        index = bisect_right(self._markers, time_ms)
 
-            if next_marker is None:
-                prev_marker = self._get_last_marker()
-            else:
-                if next_marker.time_ms == time_ms:
-                    return
+        if index > 0 and self._markers[index - 1] == time_ms:
+            return
 
-                prev_marker = next_marker.prev
+        self._markers.insert(index, time_ms)
+        self.marker_added.emit(time_ms)
 
-            self._link_markers(prev_marker, marker)
-            self._link_markers(marker, next_marker)
+    def add_markers(self, times_ms):
+        """Add many markers at once.
 
-            if time_ms < self._first_marker.time_ms:
-                self._first_marker = marker
+        The batch is sorted and deduplicated in one pass and merged with the
+        existing markers. Emits a single markers_changed signal covering the
+        inserted markers instead of a marker_added signal for each marker.
 
-        self.marker_added.emit(time_ms)
+        Args:
+            times_ms: Iterable of times in milliseconds to add markers to.
+        """
+        new_times = set(times_ms).difference(self._markers)
+
+        if len(new_times) == 0:
+            return
+
+        start_ms = min(new_times)
+        end_ms = max(new_times)
+
+        new_times.update(self._markers)
+        self._markers = array(MARKER_TYPECODE, sorted(new_times))
+
+        self.markers_changed.emit(start_ms, end_ms)
+
+    def add_magnetic_markers(self, markers):
+        """Add magnetic markers, or make existing markers magnetic.
+
+        Emits a single markers_changed signal covering the changed markers.
+
+        Args:
+            markers: Iterable of pairs of time and capture radius in
+                milliseconds. A later radius for the same time replaces an
+                earlier one.
+        """
+        radii = {time_ms: max(radius_ms, 0) for time_ms, radius_ms in markers}
+
+        if len(radii) == 0:
+            return
+
+        new_times = set(radii).difference(self._markers)
+
+        if len(new_times) > 0:
+            new_times.update(self._markers)
+            self._markers = array(MARKER_TYPECODE, sorted(new_times))
+
+        self._radii.update(radii)
+        self._rebuild_magnet_index()
+
+        self.markers_changed.emit(min(radii), max(radii))
+
+    def _rebuild_magnet_index(self):
+        self._magnet_index = IntervalIndex(
+            (time_ms - radius_ms, time_ms + radius_ms, time_ms)
+            for time_ms, radius_ms in self._radii.items())
+
+    def add_magnetic_marker(self, time_ms: int, radius_ms: int, snap: bool = False):
+        """Add a magnetic marker, or make an existing marker magnetic.
+
+        Args:
+            time_ms: Time in milliseconds to add the marker to.
+            radius_ms: Capture radius in milliseconds on both sides.
+            snap: Move the marker to the nearest beat of the beat grid.
+        """
+        if snap:
+            time_ms = self.get_nearest_beat_ms(time_ms)
+
+        self.add_magnetic_markers(((time_ms, radius_ms),))
+
+    def get_magnetic_markers(self) -> list[MagneticMarker]:
+        """Returns the magnetic markers sorted by time."""
+        return [MagneticMarker(time_ms, self._radii[time_ms], self._names.get(time_ms, ""))
+                for time_ms in sorted(self._radii)]
+
+    def get_magnet_index(self) -> IntervalIndex:
+        """Returns the index of capture ranges of the magnetic markers.
+
+        The values of the intervals are the marker times. The index isn't
+        changed after it's returned, so it can be used from other threads.
+        """
+        return self._magnet_index
+
+    def get_magnetic_markers_covering(self, time_ms: int) -> list[int]:
+        """Get the times of magnetic markers whose capture range covers time_ms.
+
+        Args:
+            time_ms: Time in milliseconds.
+
+        Returns a sorted list of marker times in milliseconds.
+        """
+        return sorted(self._magnet_index.covering(time_ms))
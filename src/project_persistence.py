@@ -1,9 +1,44 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import mmap
+import struct
+import numpy
 from project import Project
 
 FILE_SIGNATURE = b'\xbb\x5d\xc6\x89\x7e\x06\x4b\xd5'
 
-FILE_FORMAT_VERSION = 1
+FILE_FORMAT_VERSION = 2
+
+MARKER_DTYPE = numpy.dtype(">u4")
+
+# Times and radii are stored as unsigned 32-bit milliseconds.
+MARKER_MAX_MS = 2**32 - 1
+
+MAGNETIC_MARKER_DTYPE = numpy.dtype([("time_ms", ">u4"), ("radius_ms", ">u4")])
+
+# Version 2 header after the signature and version: header size, section
+# count, reserved, marker count, audio path offset, audio path length, reserved.
+HEADER_V2 = struct.Struct(">HHHIIII")
+
+# Version 2 section table entry: section type, entry size, entry count, offset.
+SECTION_V2 = struct.Struct(">HHIQ")
+
+SECTION_ALIGNMENT = 8
+
+SECTION_MARKERS = 1
+
+# Capture radii of magnetic markers. Their times are also in SECTION_MARKERS,
+# so versions without magnetic markers open them as plain markers.
+SECTION_MAGNETIC_MARKERS = 2
+
+# Names of markers as bytes, each a MARKER_NAME record followed by the name.
+SECTION_MARKER_NAMES = 3
+
+# Marker name record: marker time, length of the utf-8 name in bytes.
+MARKER_NAME = struct.Struct(">II")
+
+_SECTION_ENTRY_SIZES = {SECTION_MARKERS: MARKER_DTYPE.itemsize,
+                        SECTION_MAGNETIC_MARKERS: MAGNETIC_MARKER_DTYPE.itemsize,
+                        SECTION_MARKER_NAMES: 1}
 
 
 class InvalidProjectFileError(Exception):
@@ -14,71 +49,285 @@ class UnsupportedProjectFileVersionError(Exception):
     pass
 
 
-class ProjectPersistence:
-    """Class to handle saving and loading projects."""
-    @staticmethod
-    def save_project(path: str, project: Project):
-        """Saves project to file.
+class ProjectFile:
+    """Read-only, memory-mapped view of a project file.
+
+    Only the header is parsed when the file is opened. Marker arrays returned
+    by get_markers are views into the mapping, so pages are read from disk
+    only when they are accessed. The mapping can't be closed while views
+    into it exist, so close raises BufferError until they are released.
+    Copy the arrays to keep them after closing.
+
+    Attributes:
+        version: File format version of the opened file.
+        audio_path: Audio path stored in the file.
+        marker_count: Amount of markers stored in the file.
+    """
+
+    def __init__(self, path: str):
+        """Opens and maps a project file.
 
         Args:
-            path: File path to save to.
-            project: Project to save.
+            path: File path to open.
         """
-        with open(path, "wb") as f:
-            f.write(FILE_SIGNATURE)
-            f.write(FILE_FORMAT_VERSION.to_bytes(2, "big"))
+        self.version: int = None
+        self.audio_path = ""
+        self.marker_count = 0
+        # Offset and entry count of each known section by section type.
+        self._sections: dict[int, tuple[int, int]] = {}
 
-            audio_path = ""
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise InvalidProjectFileError from e
 
-            if project.audio_path is not None:
-                audio_path = project.audio_path
+        try:
+            self._parse_header()
+        except UnicodeDecodeError as e:
+            self._map.close()
+            raise InvalidProjectFileError from e
+        except BaseException:
+            self._map.close()
+            raise
 
-            f.write(f"{audio_path}\0".encode("utf-8"))
+    def __enter__(self):
+        return self
 
-            for marker in project.get_markers():
-                marker_bytes = marker.time_ms.to_bytes(4, "big")
-                f.write(marker_bytes)
+    def __exit__(self, *_args):
+        self.close()
 
-    @staticmethod
-    def load_project(path: str) -> Project:
-        """Loads project from file.
+    def close(self):
+        """Unmaps the file.
+
+        Raises BufferError if arrays returned by the getters still exist.
+        """
+        self._map.close()
+
+    def _parse_header(self):
+        position = len(FILE_SIGNATURE)
+
+        if len(self._map) < position + 2 or self._map[:position] != FILE_SIGNATURE:
+            raise InvalidProjectFileError
+
+        self.version = int.from_bytes(self._map[position:position + 2], "big")
+        position += 2
+
+        if self.version == 1:
+            self._parse_header_v1(position)
+        elif self.version == 2:
+            self._parse_header_v2(position)
+        else:
+            raise UnsupportedProjectFileVersionError
+
+    def _parse_header_v1(self, position: int):
+        path_end = self._map.find(b'\x00', position)
+
+        if path_end == -1:
+            raise InvalidProjectFileError
+
+        self.audio_path = self._map[position:path_end].decode("utf-8")
+
+        markers_start = path_end + 1
+        self.marker_count = (len(self._map) - markers_start) // \
+            MARKER_DTYPE.itemsize
+        self._sections = {SECTION_MARKERS: (markers_start, self.marker_count)}
+
+    def _parse_header_v2(self, position: int):
+        if len(self._map) < position + HEADER_V2.size:
+            raise InvalidProjectFileError
+
+        (header_size, section_count, _reserved, self.marker_count,
+         path_offset, path_length, _reserved2) = HEADER_V2.unpack_from(
+             self._map, position)
+
+        table_start = len(FILE_SIGNATURE) + 2 + header_size
+        table_end = table_start + section_count * SECTION_V2.size
+
+        if path_offset + path_length > len(self._map) or table_end > len(self._map):
+            raise InvalidProjectFileError
+
+        self.audio_path = self._map[path_offset:path_offset +
+                                    path_length].decode("utf-8")
+
+        self._sections = {}
+
+        for entry_offset in range(table_start, table_end, SECTION_V2.size):
+            section_type, entry_size, count, offset = SECTION_V2.unpack_from(
+                self._map, entry_offset)
+
+            if offset + entry_size * count > len(self._map):
+                raise InvalidProjectFileError
+
+            # Unknown section types are skipped, so older versions of the
+            # program can open files with newer marker types.
+            if _SECTION_ENTRY_SIZES.get(section_type) == entry_size:
+                self._sections[section_type] = (offset, count)
+
+    def get_markers(self, start: int = 0, stop: int = None) -> numpy.ndarray:
+        """Returns marker times in milliseconds as a view into the file.
 
         Args:
-            path: File path to load from.
+            start: Index of the first marker to return.
+            stop: Index after the last marker to return. Defaults to all.
         """
-        with open(path, "rb") as f:
-            beginning = f.read(8)
+        offset, count = self._sections.get(SECTION_MARKERS, (0, 0))
+
+        if stop is None or stop > count:
+            stop = count
+
+        start = min(max(start, 0), stop)
+
+        return numpy.frombuffer(self._map,
+                                dtype=MARKER_DTYPE,
+                                count=stop - start,
+                                offset=offset + start * MARKER_DTYPE.itemsize)
+
+    def get_magnetic_markers(self) -> numpy.ndarray:
+        """Returns magnetic markers as a view into the file.
 
-            if beginning != FILE_SIGNATURE:
+        The array has the fields time_ms and radius_ms.
+        """
+        offset, count = self._sections.get(SECTION_MAGNETIC_MARKERS, (0, 0))
+
+        return numpy.frombuffer(self._map,
+                                dtype=MAGNETIC_MARKER_DTYPE,
+                                count=count,
+                                offset=offset)
+
+    def get_marker_names(self) -> dict[int, str]:
+        """Returns the names of named markers by time."""
+        offset, count = self._sections.get(SECTION_MARKER_NAMES, (0, 0))
+        end = offset + count
+        names = {}
+
+        while offset + MARKER_NAME.size <= end:
+            time_ms, length = MARKER_NAME.unpack_from(self._map, offset)
+            offset += MARKER_NAME.size
+
+            if offset + length > end:
                 raise InvalidProjectFileError
 
-            loaded_file_format_version = int.from_bytes(f.read(2), "big")
+            try:
+                names[time_ms] = self._map[offset:offset + length].decode("utf-8")
+            except UnicodeDecodeError as e:
+                raise InvalidProjectFileError from e
 
-            if loaded_file_format_version == 1:
-                project = Project()
+            offset += length
 
-                audio_path_bytes = bytes()
+        return names
 
-                while True:
-                    char = f.read(1)
+    def to_project(self) -> Project:
+        """Copies the file contents into a new Project."""
+        # Names are read before any views of the file exist, so an invalid
+        # name doesn't keep the file from being closed.
+        names = self.get_marker_names()
+        project = Project()
+        project.audio_path = self.audio_path
+        project.add_markers(self.get_markers().tolist())
+        magnets = self.get_magnetic_markers()
+        project.add_magnetic_markers(zip(magnets["time_ms"].tolist(),
+                                         magnets["radius_ms"].tolist()))
 
-                    if char == b'\x00':
-                        break
+        for time_ms, name in names.items():
+            project.set_marker_name(time_ms, name)
 
-                    audio_path_bytes += char
+        return project
 
-                project.audio_path = audio_path_bytes.decode("utf-8")
 
-                while True:
-                    marker_bytes = f.read(4)
+def _align(position: int) -> int:
+    return -(-position // SECTION_ALIGNMENT) * SECTION_ALIGNMENT
 
-                    if marker_bytes == b'':
-                        break
 
-                    new_marker_ms = int.from_bytes(marker_bytes, "big")
+def _check_u4(values, name: str):
+    """Raise ValueError if values don't fit the unsigned 32-bit fields of the file."""
+    values = numpy.asarray(values, dtype=numpy.int64)
 
-                    project.add_marker(new_marker_ms)
+    if len(values) > 0 and (values.min() < 0 or values.max() > MARKER_MAX_MS):
+        raise ValueError(f"{name} must be from 0 to {MARKER_MAX_MS} ms")
 
-                return project
 
-            raise UnsupportedProjectFileVersionError
+class ProjectPersistence:
+    """Class to handle saving and loading projects."""
+    @staticmethod
+    def save_project(path: str, project: Project):
+        """Saves project to file.
+
+        Files are always saved in the newest format version, so loaded files
+        of older versions are upgraded on save.
+
+        Args:
+            path: File path to save to.
+            project: Project to save.
+
+        Raises ValueError if a marker time or capture radius is negative or
+        doesn't fit in the file, in which case nothing is written.
+        """
+        audio_path = ""
+
+        if project.audio_path is not None:
+            audio_path = project.audio_path
+
+        audio_path_bytes = audio_path.encode("utf-8")
+        marker_times = project.get_marker_times()
+        _check_u4(marker_times, "Marker times")
+        marker_bytes = numpy.asarray(marker_times).astype(MARKER_DTYPE).tobytes()
+        marker_count = len(marker_bytes) // MARKER_DTYPE.itemsize
+
+        sections = [(SECTION_MARKERS, MARKER_DTYPE.itemsize,
+                     marker_count, marker_bytes)]
+
+        magnets = project.get_magnetic_markers()
+
+        if len(magnets) > 0:
+            _check_u4([marker.radius_ms for marker in magnets], "Capture radii")
+            magnet_array = numpy.array(
+                [(marker.time_ms, marker.radius_ms) for marker in magnets],
+                dtype=MAGNETIC_MARKER_DTYPE)
+            sections.append((SECTION_MAGNETIC_MARKERS,
+                             MAGNETIC_MARKER_DTYPE.itemsize,
+                             len(magnet_array), magnet_array.tobytes()))
+
+        names = project.get_marker_names()
+
+        if len(names) > 0:
+            name_bytes = bytearray()
+
+            for time_ms, name in sorted(names.items()):
+                encoded = name.encode("utf-8")
+                name_bytes += MARKER_NAME.pack(time_ms, len(encoded)) + encoded
+
+            sections.append((SECTION_MARKER_NAMES, 1, len(name_bytes), bytes(name_bytes)))
+
+        path_offset = len(FILE_SIGNATURE) + 2 + HEADER_V2.size + \
+            len(sections) * SECTION_V2.size
+
+        section_table = []
+        body = bytearray(audio_path_bytes)
+
+        for section_type, entry_size, count, section_bytes in sections:
+            position = path_offset + len(body)
+            body += bytes(_align(position) - position)
+            section_table.append(SECTION_V2.pack(
+                section_type, entry_size, count, path_offset + len(body)))
+            body += section_bytes
+
+        header = HEADER_V2.pack(HEADER_V2.size, len(sections), 0, marker_count,
+                                path_offset, len(audio_path_bytes), 0)
+
+        with open(path, "wb") as f:
+            f.write(b"".join((FILE_SIGNATURE,
+                              FILE_FORMAT_VERSION.to_bytes(2, "big"),
+                              header,
+                              *section_table,
+                              body)))
+
+    @staticmethod
+    def load_project(path: str) -> Project:
+        """Loads project from file.
+
+        Args:
+            path: File path to load from.
+        """
+        with ProjectFile(path) as project_file:
+            return project_file.to_project()
@@ -1,8 +1,8 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import unittest
-import time
 from project import Project
 from audio_player import AudioPlayer
+from audio_output import NullOutput
 
 TEST_FILE = "src/tests/test_data/test.wav"
 
@@ -10,7 +10,8 @@ TEST_FILE = "src/tests/test_data/test.wav"
 class TestProjectAndAudio(unittest.TestCase):
     def setUp(self):
         self.project = Project()
-        self.audio = AudioPlayer()
+        self.output = NullOutput()
+        self.audio = AudioPlayer(output=self.output)
         self.audio.load_file(TEST_FILE)
         self.project.add_marker(1000)
 
@@ -32,7 +33,7 @@ class TestProjectAndAudio(unittest.TestCase):
         next_time_ms = self.project.get_next_marker_time_ms(time_ms)
 
         self.audio.play_from_ms(next_time_ms)
-        time.sleep(0.1)
+        self.output.run(0.1)
         self.audio.pause()
 
         time_ms = self.audio.get_time_ms()
@@ -0,0 +1,111 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import unittest
+import numpy
+from analysis import SilenceDetector, BeatTracker
+
+SAMPLERATE = 48000
+
+
+def make_track(sections):
+    """Build a stereo track from (length_s, amplitude) sections of noise."""
+    rng = numpy.random.default_rng(1)
+    parts = [rng.uniform(-amplitude, amplitude, (int(length * SAMPLERATE), 2))
+             for length, amplitude in sections]
+    return numpy.concatenate(parts).astype(numpy.float32)
+
+
+class TestSilenceDetector(unittest.TestCase):
+    def setUp(self):
+        self.detector = SilenceDetector(threshold_db=-50, min_length_ms=1000)
+        self.track = make_track([(2, 0.5), (1.5, 0), (1, 0.5), (0.5, 0),
+                                 (1, 0.5), (3, 0.0001), (1, 0.5), (2, 0)])
+
+    def test_silences_are_found(self):
+        regions = self.detector.detect(self.track, SAMPLERATE)
+
+        self.assertEqual(len(regions), 3)
+        numpy.testing.assert_allclose(regions[0], [2000, 3500], atol=30)
+        numpy.testing.assert_allclose(regions[1], [6000, 9000], atol=30)
+        numpy.testing.assert_allclose(regions[2], [10000, 12000], atol=30)
+
+    def test_markers_are_suggested_where_music_resumes(self):
+        markers = self.detector.suggest_markers_ms(self.track, SAMPLERATE)
+
+        numpy.testing.assert_allclose(markers, [3450, 8950], atol=30)
+
+    def test_threshold_is_configurable(self):
+        self.detector.threshold_db = -100
+
+        regions = self.detector.detect(self.track, SAMPLERATE)
+
+        self.assertEqual(len(regions), 2)
+
+    def test_int16_audio_works(self):
+        track = (self.track * 32767).astype(numpy.int16)
+
+        regions = self.detector.detect(track, SAMPLERATE)
+
+        self.assertEqual(len(regions), 3)
+
+    def test_empty_audio_has_no_silences(self):
+        regions = self.detector.detect(numpy.zeros((0, 2)), SAMPLERATE)
+
+        self.assertEqual(regions.shape, (0, 2))
+
+
+def make_click_track(bpm, offset_s, length_s):
+    """Build a stereo track of short decaying noise bursts on each beat."""
+    rng = numpy.random.default_rng(2)
+    track = rng.uniform(-0.001, 0.001, (int(length_s * SAMPLERATE), 2))
+    click = rng.uniform(-1, 1, (2000, 2)) * \
+        numpy.exp(-numpy.arange(2000) / 300)[:, None]
+
+    for beat_s in numpy.arange(offset_s, length_s - 0.1, 60 / bpm):
+        start = int(beat_s * SAMPLERATE)
+        track[start:start + 2000] += click
+
+    return track.astype(numpy.float32)
+
+
+class TestBeatTracker(unittest.TestCase):
+    def setUp(self):
+        self.tracker = BeatTracker()
+
+    def test_tempo_and_grid_are_found(self):
+        track = make_click_track(120, 0.25, 30)
+
+        bpm, beats_ms = self.tracker.detect(track, SAMPLERATE)
+
+        self.assertAlmostEqual(bpm, 120, delta=1)
+        expected = numpy.arange(250, 30000, 500)
+        self.assertLessEqual(abs(len(beats_ms) - len(expected)), 1)
+        numpy.testing.assert_allclose(beats_ms[:len(expected)][5:-5],
+                                      expected[:len(beats_ms)][5:-5], atol=15)
+
+    def test_other_tempo_is_found(self):
+        track = make_click_track(95, 0.1, 30)
+
+        bpm, _ = self.tracker.detect(track, SAMPLERATE)
+
+        self.assertAlmostEqual(bpm, 95, delta=1)
+
+    def test_tempo_near_slowest_is_found(self):
+        track = make_click_track(62, 0.1, 20)
+
+        bpm, beats_ms = self.tracker.detect(track, SAMPLERATE)
+
+        self.assertAlmostEqual(bpm, 62, delta=1)
+        self.assertGreater(len(beats_ms), 0)
+
+    def test_silence_has_no_grid(self):
+        bpm, beats_ms = self.tracker.detect(numpy.zeros((20 * SAMPLERATE, 2)),
+                                            SAMPLERATE)
+
+        self.assertEqual(bpm, 0.0)
+        self.assertEqual(len(beats_ms), 0)
+
+    def test_short_audio_has_no_grid(self):
+        bpm, beats_ms = self.tracker.detect(numpy.zeros((100, 2)), SAMPLERATE)
+
+        self.assertEqual(bpm, 0.0)
+        self.assertEqual(len(beats_ms), 0)
@@ -0,0 +1,58 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import unittest
+import os
+import shutil
+import tempfile
+import numpy
+from analysis_cache import AnalysisCache
+
+TEST_FILE = "src/tests/test_data/test.wav"
+
+
+class TestAnalysisCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.audio_path = os.path.join(self.directory, "audio.wav")
+        shutil.copyfile(TEST_FILE, self.audio_path)
+        self.sidecar = AnalysisCache.sidecar_path(
+            os.path.join(self.directory, "test.skproj"))
+        self.arrays = {
+            "floats": numpy.linspace(-1, 1, 1001, dtype=numpy.float32),
+            "ints": numpy.arange(7, dtype=numpy.int64),
+            "empty": numpy.empty(0, dtype=numpy.int64)
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_saving_and_loading_works(self):
+        AnalysisCache.save(self.sidecar, self.audio_path,
+                           self.arrays, {"samplerate": 44100})
+        metadata, arrays = AnalysisCache.load(self.sidecar, self.audio_path)
+
+        self.assertEqual(metadata, {"samplerate": 44100})
+        self.assertIsInstance(arrays["floats"], numpy.memmap)
+
+        for name, array in self.arrays.items():
+            numpy.testing.assert_array_equal(arrays[name], array)
+            self.assertEqual(arrays[name].dtype, array.dtype)
+
+    def test_missing_file_loads_as_none(self):
+        self.assertIsNone(AnalysisCache.load(self.sidecar, self.audio_path))
+
+    def test_changed_audio_is_stale(self):
+        AnalysisCache.save(self.sidecar, self.audio_path, self.arrays)
+
+        with open(self.audio_path, "ab") as f:
+            f.write(b"\0")
+
+        self.assertIsNone(AnalysisCache.load(self.sidecar, self.audio_path))
+
+    def test_other_version_loads_as_none(self):
+        AnalysisCache.save(self.sidecar, self.audio_path, self.arrays)
+
+        with open(self.sidecar, "r+b") as f:
+            f.seek(8)
+            f.write((999).to_bytes(2, "big"))
+
+        self.assertIsNone(AnalysisCache.load(self.sidecar, self.audio_path))
@@ -0,0 +1,99 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import unittest
+import os
+import shutil
+import tempfile
+import numpy
+from audio_cache import AudioCache
+from audio_source import MemorySource
+
+TEST_FILE = "src/tests/test_data/test.wav"
+
+
+class TestAudioCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = MemorySource.from_file(TEST_FILE)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _copy_test_file(self, name):
+        path = os.path.join(self.directory, name)
+        shutil.copyfile(TEST_FILE, path)
+        return path
+
+    def test_miss_and_hit_are_counted(self):
+        cache = AudioCache()
+
+        self.assertIsNone(cache.get(TEST_FILE, "float32"))
+        cache.put(TEST_FILE, self.source)
+
+        self.assertIs(cache.get(TEST_FILE, "float32"), self.source)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_different_dtype_misses(self):
+        cache = AudioCache()
+        cache.put(TEST_FILE, self.source)
+
+        self.assertIsNone(cache.get(TEST_FILE, "int16"))
+
+    def test_changed_file_misses(self):
+        path = self._copy_test_file("changed.wav")
+        cache = AudioCache()
+        cache.put(path, self.source)
+
+        with open(path, "ab") as f:
+            f.write(b"\0")
+
+        self.assertIsNone(cache.get(path, "float32"))
+
+    def test_missing_file_misses(self):
+        cache = AudioCache()
+
+        self.assertIsNone(cache.get("/nonexistent/missing.wav", "float32"))
+        self.assertEqual(cache.misses, 1)
+
+    def test_least_recently_used_is_evicted(self):
+        first = self._copy_test_file("first.wav")
+        second = self._copy_test_file("second.wav")
+        third = self._copy_test_file("third.wav")
+        cache = AudioCache(max_bytes=self.source.nbytes * 2)
+
+        cache.put(first, self.source)
+        cache.put(second, self.source)
+        cache.get(first, "float32")
+        cache.put(third, self.source)
+
+        self.assertIsNotNone(cache.get(first, "float32"))
+        self.assertIsNone(cache.get(second, "float32"))
+        self.assertIsNotNone(cache.get(third, "float32"))
+        self.assertEqual(cache.used_bytes, self.source.nbytes * 2)
+
+    def test_disk_cache_is_memory_mapped(self):
+        cache = AudioCache(directory=self.directory)
+        cache.put(TEST_FILE, self.source)
+
+        cache = AudioCache(directory=self.directory)
+        cached = cache.get(TEST_FILE, "float32")
+
+        self.assertEqual(cache.disk_hits, 1)
+        self.assertIsInstance(cached.data, numpy.memmap)
+        self.assertEqual(cached.samplerate, self.source.samplerate)
+        numpy.testing.assert_array_equal(cached.data, self.source.data)
+
+    def test_disk_cache_is_evicted_over_budget(self):
+        cache = AudioCache(directory=self.directory,
+                           max_disk_bytes=self.source.nbytes * 3 // 2)
+        first = self._copy_test_file("first.wav")
+        second = self._copy_test_file("second.wav")
+
+        cache.put(first, self.source)
+        os.utime(cache._disk_prefix(cache._key(first, "float32")) +
+                 f"_{self.source.samplerate}.npy", (0, 0))
+        cache.put(second, self.source)
+        cache.clear()
+
+        self.assertIsNone(cache.get(first, "float32"))
+        self.assertIsNotNone(cache.get(second, "float32"))
@@ -0,0 +1,86 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import unittest
+import numpy
+from audio_convert import FormatConverter, Resampler, mix_matrix
+
+
+def sine(frequency, samplerate, frames):
+    return numpy.sin(2 * numpy.pi * frequency * numpy.arange(frames) / samplerate)
+
+
+def resample(resampler, data, block):
+    parts = [resampler.process(data[start:start + block])
+             for start in range(0, len(data), block)]
+    parts.append(resampler.flush())
+    return numpy.concatenate(parts)
+
+
+class TestMixMatrix(unittest.TestCase):
+    def test_mono_is_played_on_both_sides(self):
+        numpy.testing.assert_array_equal(mix_matrix(1, 2), [[1.0, 1.0]])
+
+    def test_stereo_is_averaged_to_mono(self):
+        numpy.testing.assert_array_equal(mix_matrix(2, 1), [[0.5], [0.5]])
+
+    def test_surround_downmix_does_not_clip(self):
+        matrix = mix_matrix(6, 2)
+
+        self.assertAlmostEqual(float(numpy.abs(matrix).sum(axis=0).max()), 1.0, places=6)
+        self.assertFalse(matrix[3].any())
+        self.assertEqual(matrix[0, 1], 0.0)
+
+
+class TestResampler(unittest.TestCase):
+    def test_tone_keeps_its_frequency(self):
+        for samplerate, out_samplerate in ((44100, 48000), (48000, 44100), (96000, 48000)):
+            resampler = Resampler(samplerate, out_samplerate, 1)
+            data = sine(1000, samplerate, samplerate)[:, None]
+
+            out = resample(resampler, data, 4096)
+            expected = sine(1000, out_samplerate, len(out))
+
+            self.assertEqual(len(out), out_samplerate)
+            numpy.testing.assert_allclose(out[200:-200, 0], expected[200:-200], atol=1e-3)
+
+    def test_frequencies_above_output_nyquist_are_removed(self):
+        resampler = Resampler(96000, 48000, 1)
+        out = resample(resampler, sine(30000, 96000, 96000)[:, None], 4096)
+
+        self.assertLess(numpy.abs(out[200:-200]).max(), 0.01)
+
+    def test_output_does_not_depend_on_block_size(self):
+        data = numpy.random.default_rng(0).standard_normal((20000, 2))
+
+        whole = resample(Resampler(44100, 48000, 2), data, len(data))
+        blocks = resample(Resampler(44100, 48000, 2), data, 333)
+
+        numpy.testing.assert_array_equal(blocks, whole)
+
+    def test_reset_continues_from_output_frame(self):
+        data = numpy.random.default_rng(0).standard_normal((20000, 2))
+        whole = resample(Resampler(44100, 48000, 2), data, 4096)
+        resampler = Resampler(44100, 48000, 2)
+
+        start = resampler.reset(10000)
+        out = resample(resampler, data[start:], 4096)
+
+        numpy.testing.assert_array_equal(out, whole[10000:])
+
+
+class TestFormatConverter(unittest.TestCase):
+    def test_int16_is_converted_and_clipped(self):
+        converter = FormatConverter(44100, 1, 48000, 2, "int16")
+        data = numpy.full((4410, 1), 32767, dtype=numpy.int16)
+
+        out = numpy.concatenate((converter.process(data), converter.flush()))
+
+        self.assertEqual(out.dtype, numpy.int16)
+        self.assertEqual(out.shape, (4800, 2))
+        self.assertTrue((numpy.abs(out[100:-100].astype(int) - 32767) < 64).all())
+
+    def test_channels_without_resampling(self):
+        converter = FormatConverter(44100, 2, 44100, 1, "float32")
+        data = numpy.array([[1.0, 0.0], [0.5, 0.5]], dtype=numpy.float32)
+
+        numpy.testing.assert_array_equal(converter.process(data), [[0.5], [0.5]])
+        self.assertEqual(len(converter.flush()), 0)
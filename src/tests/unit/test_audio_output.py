@@ -0,0 +1,96 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import os
+import tempfile
+import unittest
+import numpy
+import soundfile as sf
+from audio_player import AudioPlayer
+from audio_output import NullOutput, FileOutput, render_performance
+
+TEST_FILE = "src/tests/test_data/test.wav"
+
+
+class TestNullOutput(unittest.TestCase):
+    def setUp(self):
+        self.output = NullOutput(blocksize=512)
+        self.player = AudioPlayer(output=self.output)
+
+    def test_clock_does_not_run_without_stream(self):
+        self.assertEqual(self.output.run(1.0), 0)
+        self.assertEqual(self.output.time, 0.0)
+
+    def test_clock_advances_in_whole_blocks(self):
+        self.player.load_file(TEST_FILE)
+
+        self.assertEqual(self.output.run(0.1), 4608)
+        self.assertAlmostEqual(self.output.time, 4608 / 44100)
+
+    def test_playback_stops_on_stop_points_exactly(self):
+        self.player.load_file(TEST_FILE)
+        self.player.set_stop_times_ms([500, 1000])
+        stops = []
+
+        self.player.play()
+        self.output.run(1.0)
+        stops.append(self.player._playback.sample)
+        self.player.play()
+        self.output.run(1.0)
+        stops.append(self.player._playback.sample)
+
+        self.assertEqual(stops, [22050, 44100])
+
+    def test_stream_is_stopped_after_stop_point(self):
+        self.player.load_file(TEST_FILE)
+        self.player.set_stop_times_ms([500])
+        paused = []
+        self.player.paused.connect(lambda: paused.append(self.player._playback.sample))
+
+        self.player.play()
+        self.output.run(1.0)
+        # Without an event loop, the poll timer of the player doesn't run.
+        self.player._poll()
+
+        self.assertEqual(paused, [22050])
+        self.assertFalse(self.player._stream.active)
+        self.assertEqual(self.player.stream_opens, 1)
+
+    def test_position_follows_clock(self):
+        self.player.load_file(TEST_FILE)
+        self.player.play()
+        self.output.run(0.5)
+
+        # Blocks reach the output as soon as they're filled.
+        self.assertEqual(self.player.get_position_samples(), 44 * 512)
+        self.assertEqual(self.player.get_position_samples(), self.player._playback.sample)
+
+
+class TestFileOutput(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "performance.wav")
+        self.output = FileOutput(self.path, subtype="FLOAT", blocksize=512)
+        self.player = AudioPlayer(park_at_stops=True, output=self.output)
+        self.player.load_file(TEST_FILE)
+        self.player.set_stop_times_ms([500, 1000])
+
+    def tearDown(self):
+        self.output.close()
+        self.directory.cleanup()
+
+    def test_performance_is_rendered_with_scripted_resumes(self):
+        render_performance(self.player, self.output, [1.0], 2.0)
+        self.output.close()
+
+        rendered, samplerate = sf.read(self.path, dtype="float32")
+        data = self.player.get_decoded_audio()
+        # The resume is taken on the first block at or after 1.0 s.
+        resumed = 87 * 512
+
+        self.assertEqual(samplerate, 44100)
+        self.assertEqual(len(rendered), self.output.frames)
+        numpy.testing.assert_array_equal(rendered[:22050], data[:22050])
+        self.assertFalse(rendered[22050:resumed].any())
+        numpy.testing.assert_array_equal(rendered[resumed:resumed + 22050],
+                                         data[22050:44100])
+        self.assertFalse(rendered[resumed + 22050:].any())
+        self.assertEqual(self.player.resume_latency.count, 2)
@@ -1,7 +1,16 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import os
+import tempfile
 import unittest
 import time
+import numpy
+import soundfile as sf
+from PySide6.QtCore import QCoreApplication
 from audio_player import AudioPlayer
+from playback import LatencyLog
+from audio_cache import AudioCache
+from audio_output import NullOutput, FileOutput, OutputUnavailableError, SoundDeviceOutput
+from interval_index import IntervalIndex
 
 TEST_FILE = "src/tests/test_data/test.wav"
 TEST_FILE_SAMPLES = 160195
@@ -9,7 +18,8 @@ TEST_FILE_SAMPLES = 160195
 
 class TestAudioPlayer(unittest.TestCase):
     def setUp(self):
-        self.player = AudioPlayer()
+        self.output = NullOutput()
+        self.player = AudioPlayer(output=self.output)
         self.player.load_file(TEST_FILE)
 
     def test_load_works(self):
@@ -18,7 +28,627 @@ class TestAudioPlayer(unittest.TestCase):
 
     def test_playing_works(self):
         self.player.play()
-        time.sleep(0.1)
+        self.output.run(0.1)
+        self.player.pause()
+
+        self.assertGreater(self.player._playback.sample, 0)
+
+    def test_callbacks_are_measured(self):
+        self.player.play()
+        self.output.run(0.1)
+        self.player.pause()
+
+        stats = self.player.callback_stats
+        self.assertGreater(stats.callbacks, 0)
+        self.assertEqual(stats.histogram.sum(), stats.callbacks)
+        self.assertGreater(stats.percentile_us(99), 0)
+        self.assertGreater(stats.mean_duration_us, 0)
+        self.assertLessEqual(stats.mean_duration_us, stats.max_duration_us)
+
+    def test_position_is_not_ahead_of_read_samples(self):
+        self.player.play()
+        self.output.run(0.1)
+        position = self.player.get_position_samples()
+        self.player.pause()
+
+        self.assertGreater(position, 0)
+        self.assertLessEqual(position, self.player._playback.sample)
+
+    def test_position_when_paused_is_next_sample(self):
+        self.player.goto_ms(1500)
+
+        self.assertEqual(self.player.get_position_samples(), self.player._playback.sample)
+        self.assertEqual(self.player.get_position_ms(), 1500)
+
+    def test_playback_stops_on_stop_point(self):
+        self.player.set_stop_times_ms([500, 1000])
+        self.player.play()
+        self.output.run(1.5)
+
+        self.assertEqual(self.player._playback.sample, 22050)
+
+        self.player.play()
+        self.output.run(1.5)
+
+        self.assertEqual(self.player._playback.sample, 44100)
+
+    def test_stop_points_are_converted_to_samples(self):
+        self.player.set_stop_times_ms([1, 1000])
+
+        self.assertEqual(list(self.player.get_stop_samples()), [45, 44100])
+        self.assertFalse(self.player.get_stop_samples().flags.writeable)
+
+    def test_stop_point_on_buffer_boundary_stops_playback(self):
+        # 22050 frames are exactly 50 buffers of 441 frames.
+        self.player.configure_stream(None, 441, "high")
+        self.player.set_stop_times_ms([500])
+        self.player.play()
+        self.output.run(1.5)
+
+        self.assertEqual(self.player._playback.sample, 22050)
+
+    def test_goto_emits_seeked(self):
+        seeked = []
+        self.player.seeked.connect(seeked.append)
+
+        self.player.goto_ms(1234)
+
+        self.assertEqual(seeked, [1234])
+
+
+class TestStreamingAudioPlayer(unittest.TestCase):
+    def setUp(self):
+        self.output = NullOutput()
+        self.player = AudioPlayer(streaming=True, output=self.output)
+        self.player.load_file(TEST_FILE)
+
+    def tearDown(self):
+        self.player.load_file("")
+
+    def test_load_does_not_decode_file(self):
+        self.assertIsNone(self.player._data)
+        self.assertEqual(self.player._playback.source.frames, TEST_FILE_SAMPLES)
+
+    def test_playing_works(self):
+        self.player.play()
+        deadline = time.monotonic() + 5
+
+        # The clock runs faster than the decoding thread fills the buffer.
+        while self.player._playback.sample == 0 and time.monotonic() < deadline:
+            self.output.run(0.1)
+            time.sleep(0.01)
+
+        self.player.pause()
+
+        self.assertGreater(self.player._playback.sample, 0)
+
+
+class TestAudioPlayerSampleType(unittest.TestCase):
+    def test_int16_playback_uses_less_memory(self):
+        float_player = AudioPlayer(dtype="float32", output=NullOutput())
+        float_player.load_file(TEST_FILE)
+        int_player = AudioPlayer(dtype="int16", output=NullOutput())
+        int_player.load_file(TEST_FILE)
+
+        self.assertEqual(int_player._stream.dtype, "int16")
+        self.assertEqual(int_player.get_memory_bytes() * 2,
+                         float_player.get_memory_bytes())
+
+
+class TestBackgroundLoading(unittest.TestCase):
+    def setUp(self):
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+        self.player = AudioPlayer(output=NullOutput())
+
+    def _wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+
+        while not condition() and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.01)
+
+    def test_background_loading_works(self):
+        loaded = []
+        progress = []
+        self.player.file_loaded.connect(
+            lambda path, length: loaded.append(path))
+        self.player.load_progress.connect(progress.append)
+
+        self.player.load_file(TEST_FILE, background=True)
+        self._wait_for(lambda: loaded)
+
+        self.assertEqual(loaded, [TEST_FILE])
+        self.assertEqual(progress[-1], 1.0)
+        self.assertEqual(len(self.player._data), TEST_FILE_SAMPLES)
+
+    def test_new_load_cancels_previous(self):
+        loaded = []
+        self.player.file_loaded.connect(
+            lambda path, length: loaded.append(path))
+
+        self.player.load_file(TEST_FILE, background=True)
+        self.player.load_file("")
+        self._wait_for(lambda: False, 0.5)
+
+        self.assertEqual(loaded, [""])
+        self.assertIsNone(self.player._data)
+
+    def test_unavailable_output_fails_loading(self):
+        player = AudioPlayer(output=FileOutput("/nonexistent/output.wav"))
+        failed = []
+        player.load_failed.connect(lambda path, error: failed.append(path))
+
+        player.load_file(TEST_FILE, background=True)
+        self._wait_for(lambda: failed)
+
+        self.assertEqual(failed, [TEST_FILE])
+        self.assertIsNone(player.get_output_format())
+
+
+class TestAudioPlayerCache(unittest.TestCase):
+    def test_reloading_uses_cache(self):
+        cache = AudioCache()
+        player = AudioPlayer(cache=cache, output=NullOutput())
+
+        player.load_file(TEST_FILE)
+        data = player._data
+        player.load_file(TEST_FILE)
+
+        self.assertIs(player._data, data)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hits, 1)
+
+    def test_missing_file_raises_decoding_error(self):
+        player = AudioPlayer(cache=AudioCache(), output=NullOutput())
+
+        with self.assertRaises(sf.LibsndfileError):
+            player.load_file("/nonexistent/missing.wav")
+
+
+@unittest.skipUnless(SoundDeviceOutput.is_available(), "PortAudio is not installed")
+class TestStreamConfiguration(unittest.TestCase):
+    def setUp(self):
+        self.player = AudioPlayer()
+        self.player.load_file(TEST_FILE)
+
+    def test_configuring_reopens_stream(self):
+        self.player.configure_stream(blocksize=256, latency="low")
+
+        self.assertEqual(self.player._stream.blocksize, 256)
+        self.assertGreater(self.player.get_output_latency_ms(), 0)
+
+    def test_output_latency_without_file_is_zero(self):
+        self.player.load_file("")
+
+        self.assertEqual(self.player.get_output_latency_ms(), 0.0)
+
+
+class TestParkedPlayback(unittest.TestCase):
+    def setUp(self):
+        self.output = NullOutput()
+        self.player = AudioPlayer(park_at_stops=True, output=self.output)
+        self.player.load_file(TEST_FILE)
+        self.player.set_stop_times_ms([500])
+
+    def test_stream_stays_open_at_stop(self):
+        self.assertTrue(self.player._stream.active)
+
+        self.player.play()
+        self.output.run(1.5)
+
+        self.assertEqual(self.player._playback.sample, 22050)
+        self.assertTrue(self.player._playback.parked)
+        self.assertTrue(self.player._stream.active)
+
+    def test_resume_latency_is_measured(self):
+        self.player.play()
+        self.output.run(1.5)
+        self.player.play_from_ms(500)
+        self.output.run(0.2)
+
+        self.assertEqual(self.player.resume_latency.count, 2)
+        self.assertGreater(self.player.resume_latency.last_us, 0)
+        self.assertGreater(self.player._playback.sample, 22050)
+
+    def test_pause_keeps_stream_open(self):
+        self.player.play()
+        self.output.run(0.1)
+        self.player.pause()
+        self.output.run(0.1)
+        sample = self.player._playback.sample
+        self.output.run(0.1)
+
+        self.assertEqual(self.player._playback.sample, sample)
+        self.assertTrue(self.player._stream.active)
+
+    def test_pause_drops_resume_not_yet_taken(self):
+        self.player.play()
+        self.output.run(0.1)
+        self.player.pause()
+        self.output.run(0.1)
+        sample = self.player._playback.sample
+
+        self.player.resume_at_next_stop(time.perf_counter_ns(), LatencyLog())
+        self.player.pause()
+        self.output.run(0.2)
+
+        self.assertTrue(self.player._playback.parked)
+        self.assertEqual(self.player._playback.sample, sample)
+
+    def test_play_is_taken_by_audio_thread(self):
+        self.player.play()
+
+        self.assertTrue(self.player._playback.parked)
+        self.assertTrue(self.player._is_playing())
+
+        self.output.run(0.1)
+
+        self.assertFalse(self.player._playback.parked)
+
+    def test_pause_is_signaled_once_taken(self):
+        paused = []
+        self.player.paused.connect(lambda: paused.append(True))
+        self.player.play()
+        self.output.run(0.1)
+        self.player.pause()
+        self.player._poll()
+
+        self.assertEqual(paused, [])
+
+        self.output.run(0.1)
+        self.player._poll()
+
+        self.assertEqual(paused, [True])
+
+    def test_magnetic_marker_captures_resume(self):
+        self.player.set_magnets(IntervalIndex([(100, 300, 200)]))
+
+        self.assertEqual(self.player._resume_target(4410), 8820)
+        self.assertEqual(self.player._resume_target(13230), 8820)
+        self.assertEqual(self.player._resume_target(17640), 22050)
+        self.assertEqual(self.player._resume_target(22050), 22050)
+
+    def test_resume_jumps_back_to_magnetic_marker(self):
+        self.player.set_magnets(IntervalIndex([(0, 450, 0)]))
+        self.player.play()
+        self.output.run(0.1)
+        self.player.pause()
+        self.output.run(0.1)
+        log = LatencyLog()
+
+        self.assertTrue(self.player.resume_at_next_stop(time.perf_counter_ns(), log))
+        self.assertEqual(self.player._playback.request[0], 0)
+
+
+class TestStreamLifecycle(unittest.TestCase):
+    def setUp(self):
+        self.output = NullOutput()
+        self.player = AudioPlayer(output=self.output)
+        self.player.load_file(TEST_FILE)
+        self.player.set_stop_times_ms([500])
+
+    def test_stream_is_opened_once_per_session(self):
+        self.player.play()
+        self.output.run(1.0)
+        self.player._poll()
+        self.player.play()
+        self.output.run(0.1)
         self.player.pause()
+        self.player.load_file(TEST_FILE)
+        self.player.play()
+        self.output.run(0.1)
+
+        self.assertEqual(self.player.stream_opens, 1)
+        self.assertGreater(self.player._playback.sample, 0)
+
+    def test_parked_stream_is_opened_once_per_session(self):
+        player = AudioPlayer(park_at_stops=True, output=self.output)
+        player.load_file(TEST_FILE)
+        player.play()
+        self.output.run(0.1)
+        player.pause()
+        player.load_file(TEST_FILE)
+
+        self.assertEqual(player.stream_opens, 1)
+        self.assertTrue(player._stream.active)
+        self.assertTrue(player._playback.parked)
+
+    def test_loading_while_playing_pauses(self):
+        paused = []
+        self.player.paused.connect(lambda: paused.append(True))
+        self.player.play()
+        self.output.run(0.1)
+        self.player.load_file(TEST_FILE)
+        self.output.run(0.1)
+
+        self.assertEqual(paused, [True])
+        self.assertEqual(self.player._playback.sample, 0)
+
+    def test_other_sample_type_opens_new_stream(self):
+        self.player.dtype = "int16"
+        self.player.load_file(TEST_FILE)
+
+        self.assertEqual(self.player.stream_opens, 2)
+        self.assertEqual(self.player._stream.dtype, "int16")
+
+    def test_unavailable_output_unloads_file(self):
+        player = AudioPlayer(output=FileOutput("/nonexistent/output.wav"))
+
+        with self.assertRaises(OutputUnavailableError):
+            player.load_file(TEST_FILE)
+
+        self.assertIsNone(player.get_output_format())
+        self.assertIsNone(player.get_samplerate())
+        player.play()
+
+    def test_failed_stream_isnt_reused(self):
+        self.player.output = FileOutput("/nonexistent/output.wav")
+        self.player.dtype = "int16"
+
+        with self.assertRaises(OutputUnavailableError):
+            self.player.load_file(TEST_FILE)
+
+        self.assertIsNone(self.player._stream)
+        self.assertIsNone(self.player._stream_format)
+
+        self.player.output = self.output
+        self.player.load_file(TEST_FILE)
+        self.player.play()
+        self.output.run(0.1)
+
+        self.assertGreater(self.player._playback.sample, 0)
+
+
+class TestOutputFormat(unittest.TestCase):
+    def setUp(self):
+        self.output = NullOutput(samplerate=48000)
+        self.player = AudioPlayer(output=self.output)
+        self.player.load_file(TEST_FILE)
+
+    def test_file_is_converted_to_output_rate(self):
+        self.assertEqual(self.player.get_output_format(), (48000, 2))
+        self.assertEqual(self.player._stream.samplerate, 48000)
+        self.assertEqual(self.player._playback.source.frames, -(-TEST_FILE_SAMPLES * 160 // 147))
+
+    def test_decoded_audio_keeps_file_rate(self):
+        self.assertEqual(self.player.get_samplerate(), 44100)
+        self.assertEqual(len(self.player.get_decoded_audio()), TEST_FILE_SAMPLES)
+        self.assertGreater(self.player.get_memory_bytes(), self.player._playback.source.nbytes)
+
+    def test_stops_are_in_output_samples(self):
+        self.player.set_stop_times_ms([500])
+        self.player.play()
+        self.output.run(1.0)
+
+        self.assertEqual(self.player._playback.sample, 24000)
+        self.assertEqual(self.player.get_time_ms(), 500)
+
+    def test_conversion_is_timed_apart_from_decoding(self):
+        decode_ms, convert_ms = self.player.get_load_times_ms()
+
+        self.assertGreater(decode_ms, 0)
+        self.assertGreater(convert_ms, 0)
+
+    def test_background_loading_converts(self):
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+        player = AudioPlayer(output=self.output)
+        loaded = []
+        player.file_loaded.connect(lambda path, length: loaded.append(path))
+        player.load_file(TEST_FILE, background=True)
+        deadline = time.monotonic() + 5
+
+        while len(loaded) == 0 and time.monotonic() < deadline:
+            QCoreApplication.processEvents()
+            time.sleep(0.01)
+
+        self.assertEqual(player.get_output_format(), (48000, 2))
+
+    def test_streaming_converts(self):
+        player = AudioPlayer(streaming=True, output=self.output)
+        player.load_file(TEST_FILE)
+
+        self.assertEqual(player.get_output_format(), (48000, 2))
+        self.assertEqual(player._playback.source.frames, self.player._playback.source.frames)
+
+    def test_output_change_converts_again(self):
+        self.output.samplerate = None
+        self.player.goto_ms(1000)
+        self.player.configure_stream()
+
+        self.assertEqual(self.player.get_output_format(), (44100, 2))
+        self.assertIs(self.player._playback.source, self.player._decoded_source)
+        self.assertEqual(self.player.get_time_ms(), 1000)
+        self.assertEqual(self.player.stream_opens, 2)
+
+    def _wait_for_loading(self, player: AudioPlayer):
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+        deadline = time.monotonic() + 5
+
+        while player.is_loading() and time.monotonic() < deadline:
+            QCoreApplication.processEvents()
+            time.sleep(0.01)
+
+    def test_cached_file_is_converted_in_background(self):
+        cache = AudioCache()
+        player = AudioPlayer(cache=cache, output=NullOutput())
+        player.load_file(TEST_FILE)
+        player.output = self.output
+
+        player.load_file(TEST_FILE, background=True)
+
+        self.assertTrue(player.is_loading())
+        self.assertIsNone(player.get_output_format())
+
+        self._wait_for_loading(player)
+
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(player.get_output_format(), (48000, 2))
+
+    def test_output_change_converts_in_background(self):
+        self.output.samplerate = 22050
+        self.player.goto_ms(1000)
+        self.player.configure_stream(background=True)
+
+        self.assertTrue(self.player.is_loading())
+        self.assertIsNone(self.player.get_output_format())
+
+        self._wait_for_loading(self.player)
+
+        self.assertEqual(self.player.get_output_format(), (22050, 2))
+        self.assertEqual(self.player.get_time_ms(), 1000)
+
+
+class TestTempo(unittest.TestCase):
+    def setUp(self):
+        self.output = NullOutput(blocksize=128)
+        self.player = AudioPlayer(output=self.output)
+        self.player.load_file(TEST_FILE)
+        self.player.set_tempo(0.8)
+
+    def test_source_advances_at_tempo(self):
+        self.player.play()
+        self.output.run(1.0)
+
+        self.assertAlmostEqual(self.player._playback.sample / 44100, 0.8, delta=0.02)
+        self.assertAlmostEqual(self.player.get_position_samples(), self.player._playback.sample, delta=200)
+
+    def test_stops_stay_sample_exact(self):
+        self.player.set_stop_times_ms([500, 1000])
+        self.player.play()
+        self.output.run(1.0)
+        first = self.player._playback.sample
+        self.player.play()
+        self.output.run(1.0)
+
+        self.assertEqual(first, 22050)
+        self.assertEqual(self.player._playback.sample, 44100)
+
+    def test_tempo_is_checked(self):
+        with self.assertRaises(ValueError):
+            self.player.set_tempo(3.0)
+
+        self.assertEqual(self.player.get_tempo(), 0.8)
+
+    def test_tempo_changes_during_playback(self):
+        self.player.play()
+        self.output.run(0.5)
+        self.player.set_tempo(1.0)
+        sample = self.player._playback.sample
+        self.output.run(0.5)
+
+        self.assertAlmostEqual(self.player._playback.sample - sample, 22050, delta=128)
+
+
+class TestLoop(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "loop.wav")
+        self.output = FileOutput(self.path, subtype="FLOAT", blocksize=128)
+        self.player = AudioPlayer(park_at_stops=True, output=self.output)
+        self.player.load_file(TEST_FILE)
+        self.player.set_stop_times_ms([250, 500, 750, 1000])
+
+    def tearDown(self):
+        self.output.close()
+        self.directory.cleanup()
+
+    def test_loop_wraps_with_crossfade_and_stops_after_passes(self):
+        self.player.set_loop_ms(500, 1000, passes=2)
+        self.player.play_from_ms(500)
+        self.output.run(2.0)
+        self.output.close()
+
+        rendered, _ = sf.read(self.path, dtype="float32")
+        data = self.player.get_decoded_audio()
+        fade = self.player._playback.crossfade.length
+        seam = data[22050:22050 + fade] * self.player._playback.crossfade._fade_in \
+            + data[44100:44100 + fade] * self.player._playback.crossfade._fade_out
+
+        self.assertEqual(self.player.get_loop_passes(), 2)
+        self.assertEqual(self.player._playback.sample, 44100)
+        numpy.testing.assert_array_equal(rendered[:22050], data[22050:44100])
+        numpy.testing.assert_allclose(rendered[22050:22050 + fade], seam, atol=1e-6)
+        numpy.testing.assert_array_equal(rendered[22050 + fade:44100], data[22050 + fade:44100])
+        self.assertFalse(rendered[44100:].any())
+
+    def test_stretched_loop_stops_sample_exact(self):
+        self.player.set_tempo(0.8)
+        self.player.set_loop_ms(500, 1000, passes=3)
+        self.player.play_from_ms(500)
+        self.output.run(2.5)
+
+        self.assertEqual(self.player.get_loop_passes(), 3)
+        self.assertEqual(self.player._playback.sample, 44100)
+
+    def test_stops_before_loop_are_kept(self):
+        self.player.set_loop_ms(500, 1000)
+        self.player.play()
+        self.output.run(0.5)
+
+        self.assertEqual(self.player._playback.sample, 11025)
+
+        self.player.play()
+        self.output.run(1.5)
+
+        self.assertGreater(self.player.get_loop_passes(), 1)
+        self.assertGreaterEqual(self.player._playback.sample, 22050)
+        self.assertLess(self.player._playback.sample, 44100)
+
+    def test_passes_speed_up(self):
+        self.player.set_loop_ms(500, 1000, speed_up=0.25)
+        self.player.play_from_ms(500)
+        self.output.run(0.5 + 0.4 + 0.1)
+
+        self.assertEqual(self.player.get_loop_passes(), 2)
+        self.assertEqual(self.player._playback.output_anchor[2], 1.5)
+        self.assertEqual(self.player.get_tempo(), 1.0)
+
+    def test_seeking_restarts_passes(self):
+        self.player.set_loop_ms(500, 1000)
+        self.player.play_from_ms(500)
+        self.output.run(0.6)
+        self.player.goto_ms(600)
+        self.output.run(0.1)
+
+        self.assertEqual(self.player.get_loop_passes(), 0)
+
+    def test_cleared_loop_stops_on_markers(self):
+        self.player.set_loop_ms(500, 1000)
+        self.player.clear_loop()
+        self.player.play_from_ms(500)
+        self.output.run(1.0)
+
+        self.assertIsNone(self.player.get_loop_ms())
+        self.assertEqual(self.player._playback.sample, 33075)
+
+    def test_loop_cleared_mid_pass_stops_on_markers(self):
+        self.player.set_loop_ms(500, 1000)
+        self.player.play_from_ms(500)
+        self.output.run(0.7)
+        self.player.clear_loop()
+        self.output.run(1.0)
+
+        self.assertIsNone(self.player.get_loop_ms())
+        self.assertEqual(self.player._playback.sample, 33075)
+
+    def test_empty_loop_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.player.set_loop_ms(1000, 1000)
+
+
+class TestLatencyLog(unittest.TestCase):
+    def test_empty_log(self):
+        log = LatencyLog()
+
+        self.assertEqual(log.last_us, 0.0)
+        self.assertEqual(log.mean_us, 0.0)
+
+    def test_ring_keeps_latest(self):
+        log = LatencyLog(size=3)
+
+        for latency_us in (1, 2, 3, 4, 5):
+            log.record(latency_us)
 
-        self.assertGreater(self.player._sample, 0)
+        self.assertEqual(list(log.latest_us()), [3, 4, 5])
+        self.assertEqual(log.last_us, 5)
+        self.assertEqual(log.mean_us, 4)
@@ -0,0 +1,173 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import unittest
+import threading
+import time
+import numpy
+import soundfile as sf
+from audio_source import MemorySource, StreamingSource
+
+TEST_FILE = "src/tests/test_data/test.wav"
+TEST_FILE_SAMPLES = 160195
+
+
+def read_all(source, start, amount, block=512):
+    """Read frames from a source like the audio callback does."""
+    out = numpy.zeros((amount, source.channels))
+    position = start
+    deadline = time.monotonic() + 5
+
+    while position < start + amount and time.monotonic() < deadline:
+        end = min(position + block, start + amount)
+        read = source.read_into(out[position - start:end - start], position)
+
+        if read == 0:
+            time.sleep(0.001)
+
+        position += read
+
+    return out
+
+
+class TestMemorySource(unittest.TestCase):
+    def setUp(self):
+        self.source = MemorySource.from_file(TEST_FILE)
+
+    def test_load_works(self):
+        self.assertEqual(self.source.frames, TEST_FILE_SAMPLES)
+
+    def test_prefetch_does_not_change_reads(self):
+        self.source.prefetch(TEST_FILE_SAMPLES - 10)
+        out = numpy.zeros((100, self.source.channels))
+
+        self.assertEqual(self.source.read_into(out, 0), 100)
+
+    def test_read_stops_at_end(self):
+        out = numpy.zeros((100, self.source.channels))
+        read = self.source.read_into(out, TEST_FILE_SAMPLES - 10)
+
+        self.assertEqual(read, 10)
+
+
+class TestStreamingSource(unittest.TestCase):
+    def setUp(self):
+        self.data, _ = sf.read(TEST_FILE, always_2d=True)
+        self.source = StreamingSource(TEST_FILE, buffer_frames=4096)
+
+    def tearDown(self):
+        self.source.close()
+
+    def test_length_is_known_without_decoding(self):
+        self.assertEqual(self.source.frames, TEST_FILE_SAMPLES)
+
+    def test_streaming_whole_file_works(self):
+        out = read_all(self.source, 0, TEST_FILE_SAMPLES)
+
+        numpy.testing.assert_array_equal(out, self.data)
+
+    def test_seeking_works(self):
+        read_all(self.source, 0, 1000)
+        self.source.seek(100000)
+        out = read_all(self.source, 100000, 5000)
+
+        numpy.testing.assert_array_equal(out, self.data[100000:105000])
+
+    def test_slow_seek_doesnt_block_reading(self):
+        seek_file = self.source._seek_file
+        seeking = threading.Event()
+
+        def slow_seek(sample):
+            seeking.set()
+            time.sleep(0.5)
+            seek_file(sample)
+
+        self.source._seek_file = slow_seek
+        out = numpy.zeros((512, 2))
+        self.source.seek(100000)
+        seeking.wait(1.0)
+
+        start = time.perf_counter()
+        self.source.read_into(out, 100000)
+
+        self.assertLess(time.perf_counter() - start, 0.1)
+        numpy.testing.assert_array_equal(read_all(self.source, 100000, 5000),
+                                         self.data[100000:105000])
+
+    def test_reading_elsewhere_without_seek_works(self):
+        read_all(self.source, 0, 1000)
+        out = read_all(self.source, 50000, 5000)
+
+        numpy.testing.assert_array_equal(out, self.data[50000:55000])
+
+
+class TestSampleTypes(unittest.TestCase):
+    def test_decoding_to_int16_halves_memory(self):
+        float_source = MemorySource.from_file(TEST_FILE, "float32")
+        int_source = MemorySource.from_file(TEST_FILE, "int16")
+
+        self.assertEqual(int_source.dtype, "int16")
+        self.assertEqual(int_source.nbytes * 2, float_source.nbytes)
+
+    def test_streaming_uses_given_type(self):
+        source = StreamingSource(TEST_FILE, buffer_frames=4096, dtype="int16")
+        out = read_all(source, 0, 1000)
+        source.close()
+
+        expected, _ = sf.read(TEST_FILE, frames=1000, dtype="int16", always_2d=True)
+        numpy.testing.assert_array_equal(out.astype("int16"), expected)
+        self.assertEqual(source.nbytes, 4096 * source.channels * 2)
+
+    def test_unsupported_type_raises(self):
+        with self.assertRaises(ValueError):
+            MemorySource.from_file(TEST_FILE, "float64")
+
+
+class TestBlockDecoding(unittest.TestCase):
+    def test_decoding_reports_progress(self):
+        progress = []
+
+        with sf.SoundFile(TEST_FILE) as sound_file:
+            source = MemorySource.from_sound_file(
+                sound_file, progress=progress.append)
+
+        expected, _ = sf.read(TEST_FILE, dtype="float32", always_2d=True)
+        numpy.testing.assert_array_equal(source.data, expected)
+        self.assertEqual(progress, sorted(progress))
+        self.assertEqual(progress[-1], 1.0)
+
+    def test_decoding_can_be_cancelled(self):
+        cancelled = threading.Event()
+        cancelled.set()
+
+        with sf.SoundFile(TEST_FILE) as sound_file:
+            source = MemorySource.from_sound_file(
+                sound_file, cancelled=cancelled)
+
+        self.assertIsNone(source)
+
+
+class TestFormatConversion(unittest.TestCase):
+    def setUp(self):
+        self.memory = MemorySource.from_file(TEST_FILE)
+        self.converted = self.memory.converted(48000, 2)
+
+    def test_converted_length_follows_sample_rate(self):
+        self.assertEqual(self.converted.samplerate, 48000)
+        self.assertEqual(self.converted.frames, -(-TEST_FILE_SAMPLES * 160 // 147))
+
+    def test_conversion_is_timed_apart_from_decoding(self):
+        self.assertGreater(self.memory.decode_ns, 0)
+        self.assertEqual(self.memory.convert_ns, 0)
+        self.assertEqual(self.converted.decode_ns, self.memory.decode_ns)
+        self.assertGreater(self.converted.convert_ns, 0)
+
+    def test_streaming_converts_like_memory(self):
+        source = StreamingSource(TEST_FILE, buffer_frames=4096, samplerate=48000, channels=2)
+        out = read_all(source, 0, 20000)
+        source.seek(100000)
+        seeked = read_all(source, 100000, 5000)
+        source.close()
+
+        self.assertEqual(source.frames, self.converted.frames)
+        self.assertGreater(source.convert_ns, 0)
+        numpy.testing.assert_allclose(out, self.converted.data[:20000], atol=1e-6)
+        numpy.testing.assert_allclose(seeked, self.converted.data[100000:105000], atol=1e-6)
@@ -0,0 +1,71 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import unittest
+import numpy
+from audio_source import MemorySource
+from crossfade import Crossfade
+
+SAMPLERATE = 44100
+
+
+class TestCrossfade(unittest.TestCase):
+    def setUp(self):
+        self.source = MemorySource(numpy.ones((SAMPLERATE, 2), dtype=numpy.float32), SAMPLERATE)
+        self.crossfade = Crossfade(SAMPLERATE, 2, "float32")
+
+    def test_power_is_kept_over_crossfade(self):
+        self.crossfade.start(self.source, 1000)
+        block = numpy.ones((1024, 2), dtype=numpy.float32)
+
+        self.crossfade.apply(block)
+
+        fade = self.crossfade.length
+        self.assertEqual(fade, 441)
+        # Fading between uncorrelated signals keeps the sum of the gains
+        # squared at one.
+        fade_in = self.crossfade._fade_in[:, 0]
+        fade_out = self.crossfade._fade_out[:, 0]
+        numpy.testing.assert_allclose(fade_in ** 2 + fade_out ** 2, 1, rtol=1e-6)
+        numpy.testing.assert_allclose(block[:fade, 0], fade_in + fade_out, rtol=1e-6)
+        self.assertTrue((block[fade:] == 1).all())
+        self.assertFalse(self.crossfade.active)
+
+    def test_crossfade_spans_blocks(self):
+        whole = numpy.zeros((512, 2), dtype=numpy.float32)
+        self.crossfade.start(self.source, 0)
+        self.crossfade.apply(whole)
+
+        self.crossfade.start(self.source, 0)
+        blocks = [numpy.zeros((128, 2), dtype=numpy.float32) for _ in range(4)]
+
+        for block in blocks:
+            self.crossfade.apply(block)
+
+        numpy.testing.assert_array_equal(numpy.concatenate(blocks), whole)
+
+    def test_tail_after_end_of_source_is_silent(self):
+        self.crossfade.start(self.source, SAMPLERATE - 100)
+        block = numpy.zeros((441, 2), dtype=numpy.float32)
+
+        self.crossfade.apply(block)
+
+        self.assertTrue(block[:100].any())
+        self.assertFalse(block[100:].any())
+
+    def test_int16_is_clipped(self):
+        source = MemorySource(numpy.full((1000, 2), 32767, dtype=numpy.int16), SAMPLERATE)
+        crossfade = Crossfade(SAMPLERATE, 2, "int16")
+        crossfade.start(source, 0)
+        block = numpy.full((441, 2), 32767, dtype=numpy.int16)
+
+        crossfade.apply(block)
+
+        self.assertEqual(block.max(), 32767)
+
+    def test_cancel(self):
+        self.crossfade.start(self.source, 0)
+        self.crossfade.cancel()
+        block = numpy.zeros((128, 2), dtype=numpy.float32)
+
+        self.crossfade.apply(block)
+
+        self.assertFalse(block.any())
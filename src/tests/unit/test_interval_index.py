@@ -0,0 +1,36 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import random
+import unittest
+from interval_index import IntervalIndex
+
+
+class TestIntervalIndex(unittest.TestCase):
+    def test_empty_index_covers_nothing(self):
+        index = IntervalIndex()
+
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.covering(0), [])
+
+    def test_interval_ends_are_inclusive(self):
+        index = IntervalIndex([(10, 20, "a")])
+
+        self.assertEqual(index.covering(9), [])
+        self.assertEqual(index.covering(10), ["a"])
+        self.assertEqual(index.covering(20), ["a"])
+        self.assertEqual(index.covering(21), [])
+
+    def test_covering_matches_linear_scan(self):
+        rng = random.Random(1)
+        intervals = []
+
+        for value in range(2000):
+            center = rng.randrange(100_000)
+            radius = rng.randrange(2000)
+            intervals.append((center - radius, center + radius, value))
+
+        index = IntervalIndex(intervals)
+
+        for point in range(-2000, 102_000, 97):
+            expected = [value for start, end, value in intervals
+                        if start <= point <= end]
+            self.assertEqual(sorted(index.covering(point)), expected)
@@ -0,0 +1,52 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import unittest
+from PySide6.QtCore import Qt
+from project import Project
+from marker_model import MarkerListModel, format_marker_time
+
+
+class TestMarkerListModel(unittest.TestCase):
+    def setUp(self):
+        self.project = Project()
+        self.project.add_markers([1000, 2005, 3000])
+        self.model = MarkerListModel(self.project)
+
+    def test_rows_are_markers_in_time_order(self):
+        self.assertEqual(self.model.rowCount(), 3)
+        self.assertEqual(self.model.index(1).data(), "2.005 s")
+        self.assertEqual(self.model.index(2).data(MarkerListModel.TIME_ROLE), 3000)
+
+    def test_added_marker_is_inserted_on_its_row(self):
+        inserted = []
+        self.model.rowsInserted.connect(
+            lambda _parent, first, last: inserted.append((first, last)))
+
+        self.project.add_marker(1500)
+
+        self.assertEqual(inserted, [(1, 1)])
+        self.assertEqual(self.model.index(1).data(MarkerListModel.TIME_ROLE), 1500)
+
+    def test_renaming_through_model_names_marker(self):
+        changed = []
+        self.model.dataChanged.connect(
+            lambda first, _last, _roles: changed.append(first.row()))
+
+        self.model.setData(self.model.index(0), " Chorus ")
+
+        self.assertEqual(self.project.get_marker_name(1000), "Chorus")
+        self.assertEqual(self.model.index(0).data(), "1.000 s  Chorus")
+        self.assertEqual(self.model.index(0).data(Qt.ItemDataRole.EditRole), "Chorus")
+        self.assertEqual(changed, [0])
+
+    def test_removing_markers_resets_rows(self):
+        self.project.remove_markers(
+            self.model.get_times_ms([self.model.index(0), self.model.index(2)]))
+
+        self.assertEqual(self.model.rowCount(), 1)
+        self.assertEqual(self.model.index(0).data(MarkerListModel.TIME_ROLE), 2005)
+
+    def test_many_markers_are_not_copied(self):
+        self.project.add_markers(range(0, 50_000_000, 1000))
+
+        self.assertEqual(self.model.rowCount(), 50_001)
+        self.assertEqual(self.model.index(50_000).data(), format_marker_time(49_999_000))
@@ -1,6 +1,6 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import unittest
-from project import Project
+from project import Project, MagneticMarker
 
 
 class TestProject(unittest.TestCase):
@@ -39,3 +39,135 @@ class TestProject(unittest.TestCase):
 
         last_time_ms = last.time_ms
         self.assertEqual(last_time_ms, 2000)
+
+    def test_markers_are_kept_in_order(self):
+        self.project.add_marker(3000)
+        self.project.add_marker(1000)
+        self.project.add_marker(2000)
+
+        times = [marker.time_ms for marker in self.project.get_markers()]
+        self.assertEqual(times, [1000, 2000, 3000])
+
+    def test_duplicate_marker_is_not_added(self):
+        added = []
+        self.project.marker_added.connect(added.append)
+
+        self.project.add_marker(1000)
+        self.project.add_marker(1000)
+
+        self.assertEqual(self.project.marker_count(), 1)
+        self.assertEqual(added, [1000])
+
+    def test_get_previous_marker_time(self):
+        self.assertEqual(self.project.get_previous_marker_time_ms(500), 0)
+
+        self.project.add_marker(1000)
+        self.project.add_marker(2000)
+
+        self.assertEqual(self.project.get_previous_marker_time_ms(1500), 1000)
+        self.assertEqual(self.project.get_previous_marker_time_ms(2000), 1000)
+        self.assertEqual(self.project.get_previous_marker_time_ms(2500), 2000)
+
+    def test_adding_markers_in_batch_works(self):
+        self.project.add_marker(2000)
+        self.project.add_markers([3000, 1000, 2000, 1000])
+
+        times = list(self.project.get_marker_times())
+        self.assertEqual(times, [1000, 2000, 3000])
+
+    def test_adding_markers_in_batch_emits_one_signal(self):
+        changes = []
+        self.project.markers_changed.connect(
+            lambda start, end: changes.append((start, end)))
+
+        self.project.add_markers([3000, 1000, 2000])
+        self.project.add_markers([1000, 2000])
+
+        self.assertEqual(changes, [(1000, 3000)])
+
+    def test_nearest_beat_without_grid_is_the_time_itself(self):
+        self.assertEqual(self.project.get_nearest_beat_ms(1234), 1234)
+
+    def test_nearest_beat_is_found(self):
+        self.project.set_beat_grid([1500, 500, 1000])
+
+        self.assertEqual(self.project.get_nearest_beat_ms(0), 500)
+        self.assertEqual(self.project.get_nearest_beat_ms(740), 500)
+        self.assertEqual(self.project.get_nearest_beat_ms(750), 500)
+        self.assertEqual(self.project.get_nearest_beat_ms(760), 1000)
+        self.assertEqual(self.project.get_nearest_beat_ms(1000), 1000)
+        self.assertEqual(self.project.get_nearest_beat_ms(9000), 1500)
+
+    def test_adding_marker_with_snap_moves_it_to_nearest_beat(self):
+        added = []
+        self.project.marker_added.connect(added.append)
+        self.project.set_beat_grid([500, 1000, 1500])
+
+        self.project.add_marker(1120, snap=True)
+        self.project.add_marker(1120)
+
+        self.assertEqual(list(self.project.get_marker_times()), [1000, 1120])
+        self.assertEqual(added, [1000, 1120])
+
+    def test_snapped_markers_are_not_duplicated(self):
+        self.project.set_beat_grid([500, 1000])
+
+        self.project.add_marker(980, snap=True)
+        self.project.add_marker(1010, snap=True)
+
+        self.assertEqual(list(self.project.get_marker_times()), [1000])
+
+    def test_magnetic_marker_is_also_a_marker(self):
+        self.project.add_marker(1000)
+        self.project.add_magnetic_marker(3000, 500)
+
+        self.assertEqual(list(self.project.get_marker_times()), [1000, 3000])
+        self.assertEqual([(m.time_ms, m.radius_ms)
+                          for m in self.project.get_magnetic_markers()],
+                         [(3000, 500)])
+        self.assertIsInstance(list(self.project.get_markers())[1], MagneticMarker)
+
+    def test_magnetic_markers_covering_time_are_found(self):
+        self.project.add_magnetic_markers([(1000, 200), (1500, 400), (5000, 100)])
+
+        self.assertEqual(self.project.get_magnetic_markers_covering(750), [])
+        self.assertEqual(self.project.get_magnetic_markers_covering(800), [1000])
+        self.assertEqual(self.project.get_magnetic_markers_covering(1150), [1000, 1500])
+        self.assertEqual(self.project.get_magnetic_markers_covering(1900), [1500])
+        self.assertEqual(self.project.get_magnetic_markers_covering(3000), [])
+
+    def test_making_marker_magnetic_changes_its_radius(self):
+        self.project.add_magnetic_marker(1000, 200)
+        self.project.add_magnetic_marker(1000, 50)
+
+        self.assertEqual(self.project.get_magnetic_markers_covering(1100), [])
+        self.assertEqual(self.project.marker_count(), 1)
+
+    def test_naming_marker(self):
+        renamed = []
+        self.project.marker_renamed.connect(renamed.append)
+        self.project.add_marker(1000)
+
+        self.project.set_marker_name(1000, "Solo")
+        self.project.set_marker_name(2000, "Missing")
+
+        self.assertEqual(self.project.get_marker_name(1000), "Solo")
+        self.assertEqual(self.project.get_marker_names(), {1000: "Solo"})
+        self.assertEqual(list(self.project.get_markers())[0].name, "Solo")
+        self.assertEqual(renamed, [1000])
+
+    def test_removing_markers_removes_names_and_radii(self):
+        changes = []
+        self.project.markers_changed.connect(
+            lambda start, end: changes.append((start, end)))
+        self.project.add_markers([1000, 2000, 3000])
+        self.project.add_magnetic_marker(2000, 500)
+        self.project.set_marker_name(3000, "Outro")
+        changes.clear()
+
+        self.project.remove_markers([2000, 3000, 4000])
+
+        self.assertEqual(list(self.project.get_marker_times()), [1000])
+        self.assertEqual(self.project.get_marker_names(), {})
+        self.assertEqual(self.project.get_magnetic_markers_covering(2000), [])
+        self.assertEqual(changes, [(2000, 3000)])
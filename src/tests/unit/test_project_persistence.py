@@ -1,7 +1,10 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import unittest
 from project import Project
-from project_persistence import ProjectPersistence
+from project_persistence import (ProjectPersistence, ProjectFile, InvalidProjectFileError,
+                                 UnsupportedProjectFileVersionError, FILE_SIGNATURE)
+
+TEST_PROJECT = "src/tests/test.skproj"
 
 
 class TestProjectPersistence(unittest.TestCase):
@@ -11,8 +14,8 @@ class TestProjectPersistence(unittest.TestCase):
         project.add_marker(100)
         project.add_marker(200)
         project.add_marker(500)
-        ProjectPersistence.save_project("src/tests/test.skproj", project)
-        loaded = ProjectPersistence.load_project("src/tests/test.skproj")
+        ProjectPersistence.save_project(TEST_PROJECT, project)
+        loaded = ProjectPersistence.load_project(TEST_PROJECT)
 
         self.assertEqual(loaded.audio_path, "/audio.mp3")
 
@@ -24,3 +27,135 @@ class TestProjectPersistence(unittest.TestCase):
 
         test3 = loaded.get_next_marker_time_ms(500)
         self.assertEqual(test3, 500)
+
+    def test_saving_and_loading_many_markers(self):
+        project = Project()
+        project.audio_path = "/äänitiedosto.wav"
+        project.add_markers(range(0, 5_000_000, 50))
+        ProjectPersistence.save_project(TEST_PROJECT, project)
+        loaded = ProjectPersistence.load_project(TEST_PROJECT)
+
+        self.assertEqual(loaded.audio_path, "/äänitiedosto.wav")
+        self.assertEqual(loaded.get_marker_times(),
+                         project.get_marker_times())
+
+    def test_saving_times_out_of_range_raises(self):
+        project = Project()
+        project.add_marker(100)
+        ProjectPersistence.save_project(TEST_PROJECT, project)
+
+        project.add_marker(-1)
+
+        with self.assertRaises(ValueError):
+            ProjectPersistence.save_project(TEST_PROJECT, project)
+
+        project.remove_markers([-1])
+        project.add_magnetic_marker(200, 2**32)
+
+        with self.assertRaises(ValueError):
+            ProjectPersistence.save_project(TEST_PROJECT, project)
+
+        loaded = ProjectPersistence.load_project(TEST_PROJECT)
+        self.assertEqual(list(loaded.get_marker_times()), [100])
+
+    def test_loading_invalid_file_raises(self):
+        with open(TEST_PROJECT, "wb") as f:
+            f.write(b"not a project file")
+
+        with self.assertRaises(InvalidProjectFileError):
+            ProjectPersistence.load_project(TEST_PROJECT)
+
+    def test_loading_file_with_invalid_audio_path_raises(self):
+        with open(TEST_PROJECT, "wb") as f:
+            f.write(FILE_SIGNATURE + (1).to_bytes(2, "big") + b"/\xff\xfe.mp3\0")
+
+        with self.assertRaises(InvalidProjectFileError):
+            ProjectPersistence.load_project(TEST_PROJECT)
+
+    def test_loading_unsupported_version_raises(self):
+        with open(TEST_PROJECT, "wb") as f:
+            f.write(FILE_SIGNATURE + (999).to_bytes(2, "big"))
+
+        with self.assertRaises(UnsupportedProjectFileVersionError):
+            ProjectPersistence.load_project(TEST_PROJECT)
+
+    def test_loading_version_1_file_works(self):
+        with open(TEST_PROJECT, "wb") as f:
+            f.write(FILE_SIGNATURE + (1).to_bytes(2, "big") + b"/audio.mp3\0")
+            f.write(b"\x00\x00\x00\x64\x00\x00\x01\xf4")
+
+        loaded = ProjectPersistence.load_project(TEST_PROJECT)
+
+        self.assertEqual(loaded.audio_path, "/audio.mp3")
+        self.assertEqual(list(loaded.get_marker_times()), [100, 500])
+
+    def test_version_1_file_is_upgraded_on_save(self):
+        with open(TEST_PROJECT, "wb") as f:
+            f.write(FILE_SIGNATURE + (1).to_bytes(2, "big") + b"/audio.mp3\0")
+            f.write(b"\x00\x00\x00\x64")
+
+        ProjectPersistence.save_project(
+            TEST_PROJECT, ProjectPersistence.load_project(TEST_PROJECT))
+
+        with ProjectFile(TEST_PROJECT) as project_file:
+            self.assertEqual(project_file.version, 2)
+            self.assertEqual(project_file.audio_path, "/audio.mp3")
+            self.assertEqual(project_file.get_markers().tolist(), [100])
+
+    def test_project_file_reads_marker_ranges(self):
+        project = Project()
+        project.add_markers(range(1000, 11000, 1000))
+        ProjectPersistence.save_project(TEST_PROJECT, project)
+
+        with ProjectFile(TEST_PROJECT) as project_file:
+            self.assertEqual(project_file.marker_count, 10)
+            first = project_file.get_markers(0, 2).tolist()
+            self.assertEqual(first, [1000, 2000])
+            last = project_file.get_markers(8).tolist()
+            self.assertEqual(last, [9000, 10000])
+
+    def test_empty_file_raises(self):
+        open(TEST_PROJECT, "wb").close()
+
+        with self.assertRaises(InvalidProjectFileError):
+            ProjectPersistence.load_project(TEST_PROJECT)
+
+    def test_saving_and_loading_magnetic_markers(self):
+        project = Project()
+        project.add_marker(100)
+        project.add_magnetic_markers([(2000, 300), (5000, 1000)])
+        ProjectPersistence.save_project(TEST_PROJECT, project)
+
+        loaded = ProjectPersistence.load_project(TEST_PROJECT)
+
+        self.assertEqual(list(loaded.get_marker_times()), [100, 2000, 5000])
+        self.assertEqual([(m.time_ms, m.radius_ms)
+                          for m in loaded.get_magnetic_markers()],
+                         [(2000, 300), (5000, 1000)])
+        self.assertEqual(loaded.get_magnetic_markers_covering(4500), [5000])
+
+    def test_saving_and_loading_marker_names(self):
+        project = Project()
+        project.add_markers([100, 200])
+        project.set_marker_name(200, "Kertosäe")
+        ProjectPersistence.save_project(TEST_PROJECT, project)
+
+        loaded = ProjectPersistence.load_project(TEST_PROJECT)
+
+        self.assertEqual(list(loaded.get_marker_times()), [100, 200])
+        self.assertEqual(loaded.get_marker_names(), {200: "Kertosäe"})
+
+    def test_loading_invalid_marker_name_raises(self):
+        project = Project()
+        project.add_markers([100, 200])
+        project.set_marker_name(200, "Kertosäe")
+        ProjectPersistence.save_project(TEST_PROJECT, project)
+
+        with open(TEST_PROJECT, "rb") as f:
+            data = f.read()
+
+        with open(TEST_PROJECT, "wb") as f:
+            f.write(data.replace("Kertosäe".encode("utf-8"), b"\xff" * 9))
+
+        with self.assertRaises(InvalidProjectFileError):
+            ProjectPersistence.load_project(TEST_PROJECT)
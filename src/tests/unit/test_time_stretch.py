@@ -0,0 +1,80 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import unittest
+import numpy
+from audio_source import MemorySource
+from time_stretch import TimeStretcher, check_tempo
+
+SAMPLERATE = 44100
+
+
+def tone(frequency, seconds, dtype="float32", amplitude=0.5):
+    t = numpy.arange(int(SAMPLERATE * seconds)) / SAMPLERATE
+    data = amplitude * numpy.sin(2 * numpy.pi * frequency * t)
+    return numpy.stack([data, data], axis=1).astype(dtype)
+
+
+def stretch(stretcher, source, tempo, boundary, block=128):
+    """Run the stretcher like the audio callback does until it stops."""
+    blocks = []
+
+    while True:
+        out = numpy.zeros((block, 2), dtype=source.dtype)
+        written = stretcher.process(out, source, tempo, boundary)
+        blocks.append(out[:written])
+
+        if written < block:
+            return numpy.concatenate(blocks)
+
+
+def frequency(data):
+    crossings = numpy.sum((data[:-1] < 0) & (data[1:] >= 0))
+    return crossings * SAMPLERATE / len(data)
+
+
+class TestTimeStretcher(unittest.TestCase):
+    def setUp(self):
+        self.source = MemorySource(tone(440, 2.0), SAMPLERATE)
+        self.stretcher = TimeStretcher(SAMPLERATE, 2, "float32")
+
+    def test_length_follows_tempo_and_pitch_is_kept(self):
+        for tempo in (0.5, 0.8, 1.25, 1.5):
+            self.stretcher.reset(0, self.source.frames)
+            out = stretch(self.stretcher, self.source, tempo, self.source.frames)
+
+            self.assertEqual(len(out), round(self.source.frames / tempo))
+            self.assertAlmostEqual(frequency(out[4096:-4096, 0]), 440, delta=2)
+            self.assertLess(numpy.abs(out[4096:-4096]).max(), 0.51)
+
+    def test_output_stops_on_boundary(self):
+        self.stretcher.reset(1000, 22050)
+        out = stretch(self.stretcher, self.source, 0.8, 22050)
+
+        self.assertEqual(len(out), 26313)
+        self.assertGreaterEqual(self.stretcher.position, 22050)
+        self.assertLess(self.stretcher.position, 22051)
+
+    def test_audio_after_boundary_is_not_heard(self):
+        data = tone(440, 2.0)
+        data[22050:] = 0
+        self.stretcher.reset(0, 22050)
+        expected = stretch(self.stretcher, MemorySource(data, SAMPLERATE), 0.8, 22050)
+        self.stretcher.reset(0, 22050)
+        out = stretch(self.stretcher, self.source, 0.8, 22050)
+
+        numpy.testing.assert_array_equal(out, expected)
+
+    def test_int16_is_clipped(self):
+        source = MemorySource(tone(440, 1.0, "int16", 32767), SAMPLERATE)
+        stretcher = TimeStretcher(SAMPLERATE, 2, "int16")
+        stretcher.reset(0, source.frames)
+
+        out = stretch(stretcher, source, 0.8, source.frames)
+
+        self.assertEqual(out.dtype, numpy.int16)
+        self.assertAlmostEqual(frequency(out[4096:-4096, 0].astype(float)), 440, delta=2)
+
+    def test_tempo_is_checked(self):
+        check_tempo(0.8)
+
+        with self.assertRaises(ValueError):
+            check_tempo(0.1)
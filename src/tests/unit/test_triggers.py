@@ -0,0 +1,98 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import threading
+import unittest
+from audio_player import AudioPlayer
+from audio_output import NullOutput
+from triggers import LoopbackBackend, TriggerRouter, midi_trigger_name
+
+TEST_FILE = "src/tests/test_data/test.wav"
+
+
+class TestMidiTriggerName(unittest.TestCase):
+    def test_note_on_is_trigger(self):
+        self.assertEqual(midi_trigger_name(bytes([0x90, 60, 100])), "note:60")
+        self.assertEqual(midi_trigger_name(bytes([0x93, 61, 1])), "note:61")
+
+    def test_note_on_without_velocity_is_not_trigger(self):
+        self.assertIsNone(midi_trigger_name(bytes([0x90, 60, 0])))
+
+    def test_pressed_controller_is_trigger(self):
+        self.assertEqual(midi_trigger_name(bytes([0xB0, 64, 127])), "cc:64")
+        self.assertIsNone(midi_trigger_name(bytes([0xB0, 64, 0])))
+
+    def test_other_messages_are_not_triggers(self):
+        self.assertIsNone(midi_trigger_name(bytes([0x80, 60, 64])))
+        self.assertIsNone(midi_trigger_name(bytes([0xF8])))
+
+
+class TestTriggerRouter(unittest.TestCase):
+    def setUp(self):
+        self.output = NullOutput()
+        self.player = AudioPlayer(park_at_stops=True, output=self.output)
+        self.player.load_file(TEST_FILE)
+        self.player.set_stop_times_ms([500, 1000])
+        self.router = TriggerRouter(self.player)
+        self.backend = LoopbackBackend()
+        self.router.add_backend(self.backend)
+        self.triggers = []
+        self.router.triggered.connect(
+            lambda name, resumed: self.triggers.append((name, resumed)))
+
+    def tearDown(self):
+        self.router.remove_backend(self.backend)
+
+    def test_unbound_trigger_does_nothing(self):
+        self.backend.send("note:60")
+        self.output.run(0.2)
+
+        self.assertEqual(self.player._playback.sample, 0)
+        self.assertEqual(self.triggers, [("note:60", False)])
+
+    def test_bound_trigger_resumes_at_next_marker(self):
+        self.router.bind("cc:64")
+        self.player.goto_ms(200)
+
+        self.backend.send("cc:64")
+        self.output.run(1.0)
+
+        self.assertEqual(self.player._playback.sample, 44100)
+        self.assertEqual(self.triggers, [("cc:64", True)])
+        self.assertEqual(self.router.latencies["cc:64"].count, 1)
+        self.assertGreater(self.router.latencies["cc:64"].last_us, 0)
+
+    def test_learning_binds_next_trigger(self):
+        self.router.learning = True
+
+        self.backend.send("note:62")
+
+        self.assertFalse(self.router.learning)
+        self.assertIn("note:62", self.router.bindings)
+
+    def test_learned_trigger_doesnt_resume(self):
+        self.router.learning = True
+
+        self.backend.send("note:62")
+        self.output.run(0.2)
+
+        self.assertEqual(self.player._playback.sample, 0)
+        self.assertEqual(self.triggers, [("note:62", False)])
+        self.assertEqual(self.router.latencies["note:62"].count, 0)
+
+    def test_only_one_of_concurrent_triggers_is_learned(self):
+        self.router.learning = True
+        threads = [threading.Thread(target=self.backend.send, args=(f"note:{note}",))
+                   for note in range(60, 68)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.router.bindings), 1)
+
+    def test_unbinding_works(self):
+        self.router.bind("note:60")
+        self.router.unbind("note:60")
+
+        self.assertNotIn("note:60", self.router.bindings)
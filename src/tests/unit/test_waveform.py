@@ -0,0 +1,72 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import unittest
+import numpy
+from waveform import PeakPyramid, BASE_DECIMATION
+
+
+class TestPeakPyramid(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.default_rng(1)
+        self.data = rng.uniform(-1, 1, (100_000, 2)).astype(numpy.float32)
+        self.pyramid = PeakPyramid.from_data(self.data)
+
+    def _expected(self, start, end, pixels):
+        edges = numpy.linspace(start, end, pixels + 1).astype(int)
+        mins = [self.data[a:b].min() for a, b in zip(edges[:-1], edges[1:])]
+        maxs = [self.data[a:b].max() for a, b in zip(edges[:-1], edges[1:])]
+        return numpy.array(mins), numpy.array(maxs)
+
+    def test_levels_halve_in_size(self):
+        first_mins, _ = self.pyramid.levels[0]
+        self.assertEqual(len(first_mins), -(-100_000 // BASE_DECIMATION))
+
+        for (finer, _), (coarser, _) in zip(self.pyramid.levels, self.pyramid.levels[1:]):
+            self.assertEqual(len(coarser), -(-len(finer) // 2))
+
+        self.assertEqual(len(self.pyramid.levels[-1][0]), 1)
+
+    def test_coarsest_level_is_global_peak(self):
+        mins, maxs = self.pyramid.levels[-1]
+
+        self.assertEqual(mins[0], self.data.min())
+        self.assertEqual(maxs[0], self.data.max())
+
+    def test_whole_range_peaks_cover_data(self):
+        mins, maxs = self.pyramid.get_peaks(0, 100_000, 10)
+        expected_mins, expected_maxs = self._expected(0, 100_000, 10)
+
+        self.assertTrue(numpy.all(mins <= expected_mins))
+        self.assertTrue(numpy.all(maxs >= expected_maxs))
+        self.assertEqual(mins.min(), self.data.min())
+
+    def test_zoomed_in_peaks_are_exact(self):
+        mins, maxs = self.pyramid.get_peaks(1000, 2000, 100)
+        expected_mins, expected_maxs = self._expected(1000, 2000, 100)
+
+        numpy.testing.assert_array_equal(mins, expected_mins)
+        numpy.testing.assert_array_equal(maxs, expected_maxs)
+
+    def test_range_outside_audio_is_zero(self):
+        mins, maxs = self.pyramid.get_peaks(90_000, 110_000, 20)
+
+        self.assertTrue(numpy.all(mins[10:] == 0))
+        self.assertTrue(numpy.all(maxs[10:] == 0))
+        self.assertTrue(numpy.all(maxs[:10] > 0))
+
+    def test_int16_peaks_are_normalized(self):
+        data = (self.data * 32767).astype(numpy.int16)
+        pyramid = PeakPyramid.from_data(data)
+        mins, maxs = pyramid.levels[-1]
+
+        self.assertAlmostEqual(float(maxs[0]), float(self.data.max()), places=3)
+        self.assertAlmostEqual(float(mins[0]), float(self.data.min()), places=3)
+
+    def test_peaks_survive_conversion_to_arrays(self):
+        pyramid = PeakPyramid.from_arrays(self.pyramid.to_arrays())
+
+        self.assertEqual(pyramid.frames, self.pyramid.frames)
+        self.assertEqual(len(pyramid.levels), len(self.pyramid.levels))
+
+        for (mins, maxs), (expected_mins, expected_maxs) in zip(pyramid.levels, self.pyramid.levels):
+            numpy.testing.assert_array_equal(mins, expected_mins)
+            numpy.testing.assert_array_equal(maxs, expected_maxs)
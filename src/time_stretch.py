@@ -0,0 +1,225 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from math import ceil
+import numpy
+from audio_source import AudioSource
+
+MIN_TEMPO = 0.5
+MAX_TEMPO = 1.5
+
+WSOLA_FRAME_MS = 30
+
+
+def check_tempo(tempo: float):
+    if not MIN_TEMPO <= tempo <= MAX_TEMPO:
+        raise ValueError(f"Tempo {tempo} is not between {MIN_TEMPO} and {MAX_TEMPO}")
+
+
+class TimeStretcher:
+    """WSOLA time-stretcher changing the tempo of audio without changing its pitch.
+
+    Output is built from Hann-windowed frames overlapping by half. Each frame
+    is taken from the source near where the tempo puts it, shifted by up to a
+    quarter frame to where it best continues the previous frame, found by
+    cross-correlating the channel sums. One frame gives half a frame of
+    output, so callbacks shorter than that do at most one frame each.
+
+    The source is read in order, each frame once, so streaming sources work
+    too. Positions are in source frames: the output of each frame is mapped
+    linearly to the source frames its tempo advanced over, so position tells
+    the source frame playing at the next output frame, and output stops
+    exactly when position reaches a boundary such as a stop point. Source
+    frames from the boundary on are read as silence, so audio after a stop
+    point doesn't leak into the output before it.
+
+    Samples are processed in the units of the source, so int16 audio is
+    clipped to its range when output.
+
+    Attributes:
+        frame: Frame length in frames.
+        hop: Output frames per frame, half of frame.
+        tolerance: How far in frames a frame may be shifted.
+        channels: Amount of channels of the source.
+    """
+
+    def __init__(self, samplerate: int, channels: int, dtype: str):
+        """Preallocate the buffers.
+
+        Args:
+            samplerate: Sample rate of the source.
+            channels: Amount of channels of the source.
+            dtype: Sample type of the source and the output.
+        """
+        self.frame = 2 * round(samplerate * WSOLA_FRAME_MS / 2000)
+        self.hop = self.frame // 2
+        self.tolerance = self.frame // 4
+        self.channels = channels
+        self._clip = numpy.iinfo(dtype) if numpy.issubdtype(dtype, numpy.integer) else None
+
+        # A periodic Hann window, whose halves sum to one when overlapped.
+        window = 0.5 - 0.5 * numpy.cos(2 * numpy.pi * numpy.arange(self.frame) / self.frame)
+        self._window = window.astype(numpy.float32)[:, None]
+
+        capacity = 2 * self.frame + ceil(self.hop * MAX_TEMPO) + 2 * self.tolerance
+        self._input = numpy.zeros((capacity, channels), dtype=numpy.float32)
+        self._input_start = 0
+        self._input_end = 0
+        self._output = numpy.zeros((self.frame, channels), dtype=numpy.float32)
+        self._ready = numpy.zeros((self.hop, channels), dtype=numpy.float32)
+        self._ready_index = self.hop
+
+        self._limit = 0
+        self._analysis = 0.0
+        self._previous: int = None
+        self._chunk_start = 0.0
+        self._chunk_end = 0.0
+
+    @property
+    def position(self) -> float:
+        """Source frame playing at the next output frame."""
+        step = (self._chunk_end - self._chunk_start) / self.hop
+        return self._chunk_start + self._ready_index * step
+
+    def reset(self, sample: int, limit: int):
+        """Restart stretching from a source frame.
+
+        Args:
+            sample: Source frame the next output starts from.
+            limit: Source frame from which the source is read as silence.
+        """
+        self._limit = limit
+        # The first frame is centered on sample, and its first half, which
+        # fades in from silence, is dropped.
+        self._analysis = float(sample - self.hop)
+        self._previous = None
+        self._input_start = self._input_end = sample - self.hop - self.tolerance
+        self._output[:] = 0
+        self._ready_index = self.hop
+        self._chunk_start = self._chunk_end = float(sample)
+
+    def process(self, out: numpy.ndarray, source: AudioSource, tempo: float, boundary: int) -> int:
+        """Fill out with stretched audio until position reaches boundary.
+
+        Args:
+            out: Array to fill, with shape (frames, channels of the stream).
+                The channels of the source are broadcast to it.
+            source: Source to read from.
+            tempo: Source frames per output frame.
+            boundary: Source frame to stop at.
+
+        Returns the amount of frames written, which is less than len(out)
+        if the boundary was reached or the source had no frames available.
+        """
+        written = 0
+
+        while written < len(out):
+            if self._ready_index == self.hop and not self._step(source, tempo):
+                break
+
+            step = (self._chunk_end - self._chunk_start) / self.hop
+            position = self._chunk_start + self._ready_index * step
+
+            if position >= boundary:
+                break
+
+            amount = min(len(out) - written,
+                         self.hop - self._ready_index,
+                         ceil((boundary - position) / step))
+            out[written:written + amount] = self._ready[self._ready_index:self._ready_index
+                                                        + amount]
+            written += amount
+            self._ready_index += amount
+
+        return written
+
+    def _step(self, source: AudioSource, tempo: float) -> bool:
+        """Add the next frame to the output, making a hop of output ready.
+
+        Returns False if the source didn't have the frames available yet.
+        """
+        first = self._previous is None
+        analysis = self._analysis if first else self._analysis + self.hop * tempo
+        nominal = round(analysis)
+        low = nominal - self.tolerance
+        keep = low
+        end = nominal + self.frame + self.tolerance
+
+        if not first:
+            keep = min(keep, self._previous + self.hop)
+            end = max(end, self._previous + self.hop + self.frame)
+
+        if not self._fill(source, keep, end):
+            return False
+
+        if first:
+            start = nominal
+        else:
+            # The frame continuing the previous one most naturally is the
+            # one following it in the source, so the frame is placed where
+            # it looks most like that.
+            offset = self._previous + self.hop - self._input_start
+            template = self._input[offset:offset + self.frame].sum(axis=1)
+            offset = low - self._input_start
+            candidates = self._input[offset:offset + self.frame + 2 * self.tolerance].sum(axis=1)
+            start = low + int(numpy.argmax(numpy.correlate(candidates, template, "valid")))
+
+        offset = start - self._input_start
+        self._output += self._input[offset:offset + self.frame] * self._window
+        self._ready[:] = self._output[:self.hop]
+        self._output[:self.hop] = self._output[self.hop:]
+        self._output[self.hop:] = 0
+
+        if self._clip is not None:
+            numpy.clip(self._ready, self._clip.min, self._clip.max, out=self._ready)
+            numpy.rint(self._ready, out=self._ready)
+
+        self._previous = start
+        self._analysis = analysis
+
+        if first:
+            # The output of the first frame is only its fade-in.
+            self._ready_index = self.hop
+        else:
+            self._chunk_start = self._chunk_end
+            self._chunk_end = analysis + self.hop
+            self._ready_index = 0
+
+        return not first or self._step(source, tempo)
+
+    def _fill(self, source: AudioSource, keep: int, end: int) -> bool:
+        """Buffer the source frames from keep to end, dropping earlier frames.
+
+        Returns False if the source didn't have the frames available yet.
+        """
+        dropped = keep - self._input_start
+
+        if dropped > 0:
+            length = max(self._input_end - keep, 0)
+            self._input[:length] = self._input[dropped:dropped + length]
+            self._input_start = keep
+            self._input_end = keep + length
+
+        while self._input_end < end:
+            start = self._input_end - self._input_start
+            amount = end - self._input_end
+            block = self._input[start:start + amount]
+
+            if self._input_end < 0:
+                silent = min(-self._input_end, amount)
+            elif self._input_end >= self._limit:
+                silent = amount
+            else:
+                silent = 0
+
+            if silent > 0:
+                block[:silent] = 0
+                self._input_end += silent
+                continue
+
+            amount = min(amount, self._limit - self._input_end)
+            read = source.read_into(block[:amount], self._input_end)
+            self._input_end += read
+
+            if read < amount:
+                return False
+
+        return True
@@ -0,0 +1,305 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+from threading import Lock
+from time import perf_counter_ns
+from PySide6.QtCore import QObject, Signal
+from audio_player import AudioPlayer
+from playback import LatencyLog
+
+try:
+    import mido
+except ImportError:
+    mido = None
+
+try:
+    from pynput import keyboard
+except ImportError:
+    keyboard = None
+
+MIDI_NOTE_ON = 0x90
+MIDI_CONTROL_CHANGE = 0xB0
+
+# Controller values from this up count as pressed, like sustain pedals.
+MIDI_CONTROL_PRESSED = 64
+
+
+class TriggerBackendUnavailableError(Exception):
+    pass
+
+
+def midi_trigger_name(message: bytes) -> str | None:
+    """Trigger name of a MIDI message.
+
+    Note on messages are named "note:<note>" and control changes reaching
+    MIDI_CONTROL_PRESSED "cc:<controller>", on any channel. Other messages,
+    including note on with velocity 0, aren't triggers.
+
+    Args:
+        message: Bytes of the MIDI message.
+
+    Returns the trigger name or None if the message isn't a trigger.
+    """
+    if len(message) < 3:
+        return None
+
+    kind = message[0] & 0xF0
+
+    if kind == MIDI_NOTE_ON and message[2] > 0:
+        return f"note:{message[1]}"
+
+    if kind == MIDI_CONTROL_CHANGE and message[2] >= MIDI_CONTROL_PRESSED:
+        return f"cc:{message[1]}"
+
+    return None
+
+
+class TriggerBackend:
+    """Base class for sources of triggers.
+
+    A backend calls its handler from its own thread, with the name of the
+    trigger and the perf_counter_ns time the input was received.
+
+    Attributes:
+        name: Name of the backend shown to the user.
+    """
+    name = ""
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Whether the libraries the backend needs are installed."""
+        return True
+
+    def start(self, handler):
+        """Start sending triggers.
+
+        Args:
+            handler: Function taking the trigger name and time.
+
+        Raises TriggerBackendUnavailableError if the backend can't be used.
+        """
+        raise NotImplementedError
+
+    def stop(self):
+        """Stop sending triggers."""
+
+
+class LoopbackBackend(TriggerBackend):
+    """Backend sending triggers given with send, for testing triggers."""
+    name = "Loopback"
+
+    def __init__(self):
+        self._handler = None
+
+    def start(self, handler):
+        self._handler = handler
+
+    def stop(self):
+        self._handler = None
+
+    def send(self, trigger_name: str):
+        """Send a trigger from the calling thread.
+
+        Args:
+            trigger_name: Name of the trigger.
+        """
+        handler = self._handler
+
+        if handler is not None:
+            handler(trigger_name, perf_counter_ns())
+
+
+class MidiBackend(TriggerBackend):
+    """Backend for MIDI notes and controllers, such as foot pedals.
+
+    Needs the mido library with a MIDI backend, such as python-rtmidi.
+
+    Attributes:
+        port_name: Input port to open, or None for the default port.
+    """
+    name = "MIDI input"
+
+    def __init__(self, port_name: str = None):
+        self.port_name = port_name
+        self._port = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return mido is not None
+
+    @staticmethod
+    def get_port_names() -> list[str]:
+        """Names of the available MIDI input ports."""
+        if mido is None:
+            return []
+
+        return mido.get_input_names()
+
+    def start(self, handler):
+        if mido is None:
+            raise TriggerBackendUnavailableError("mido is not installed")
+
+        def received(message):
+            received_ns = perf_counter_ns()
+            trigger_name = midi_trigger_name(bytes(message.bytes()))
+
+            if trigger_name is not None:
+                handler(trigger_name, received_ns)
+
+        try:
+            self._port = mido.open_input(self.port_name, callback=received)
+        except (OSError, ImportError) as e:
+            raise TriggerBackendUnavailableError(str(e)) from e
+
+    def stop(self):
+        if self._port is not None:
+            self._port.close()
+            self._port = None
+
+
+class KeyboardBackend(TriggerBackend):
+    """Backend for key presses anywhere on the desktop.
+
+    Triggers are named "key:<key>". Needs the pynput library.
+    """
+    name = "Global keyboard"
+
+    def __init__(self):
+        self._listener = None
+        self._pressed = set()
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return keyboard is not None
+
+    def start(self, handler):
+        if keyboard is None:
+            raise TriggerBackendUnavailableError("pynput is not installed")
+
+        def key_name(key) -> str:
+            if isinstance(key, keyboard.KeyCode):
+                return f"key:{key.char or key.vk}"
+
+            return f"key:{key.name}"
+
+        # Holding a key repeats presses, which shouldn't repeat triggers.
+        def pressed(key):
+            received_ns = perf_counter_ns()
+            trigger_name = key_name(key)
+
+            if trigger_name not in self._pressed:
+                self._pressed.add(trigger_name)
+                handler(trigger_name, received_ns)
+
+        def released(key):
+            self._pressed.discard(key_name(key))
+
+        self._listener = keyboard.Listener(on_press=pressed, on_release=released)
+        self._listener.start()
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            self._pressed.clear()
+
+
+# Backends for real input devices, which can be chosen by the user.
+INPUT_BACKENDS = (KeyboardBackend, MidiBackend)
+
+
+class TriggerRouter(QObject):
+    """Resumes playback from triggers of input backends.
+
+    Bound triggers resume playback at the next marker straight from the
+    thread of the backend, without going through the event loop. The
+    latency from each trigger until sound is recorded per trigger name.
+
+    Attributes:
+        player: Player to resume.
+        bindings: Frozen set of names of the triggers resuming playback.
+            Replaced instead of changed, as backends read it from their
+            threads.
+        latencies: Dictionary of trigger names to their LatencyLog.
+        learning: Whether the next trigger is bound instead of resuming
+            playback.
+
+    Signals:
+        triggered(str name, bool resumed): After each trigger. Emitted from
+            the thread of the backend.
+    """
+    triggered = Signal(str, bool)
+
+    def __init__(self, player: AudioPlayer):
+        super().__init__()
+        self.player = player
+        self.bindings: frozenset[str] = frozenset()
+        self.latencies: dict[str, LatencyLog] = {}
+        self.learning = False
+        # Backends may deliver triggers at the same time, and only one of
+        # them may be learned.
+        self._learning_lock = Lock()
+        self._backends: list[TriggerBackend] = []
+
+    def add_backend(self, backend: TriggerBackend):
+        """Start a backend and handle its triggers.
+
+        Args:
+            backend: Backend to start.
+
+        Raises TriggerBackendUnavailableError if the backend can't be used.
+        """
+        backend.start(self.handle)
+        self._backends.append(backend)
+
+    def remove_backend(self, backend: TriggerBackend):
+        """Stop a backend.
+
+        Args:
+            backend: Backend added with add_backend.
+        """
+        backend.stop()
+        self._backends.remove(backend)
+
+    def get_backends(self) -> list[TriggerBackend]:
+        """Backends currently running."""
+        return list(self._backends)
+
+    def bind(self, trigger_name: str):
+        """Make a trigger resume playback.
+
+        Args:
+            trigger_name: Name of the trigger.
+        """
+        self.latencies.setdefault(trigger_name, LatencyLog())
+        self.bindings = self.bindings | {trigger_name}
+
+    def unbind(self, trigger_name: str):
+        """Stop a trigger from resuming playback.
+
+        Args:
+            trigger_name: Name of the trigger.
+        """
+        self.bindings = self.bindings - {trigger_name}
+
+    def handle(self, trigger_name: str, trigger_ns: int):
+        """Handle a trigger. Called from the threads of the backends.
+
+        Args:
+            trigger_name: Name of the trigger.
+            trigger_ns: perf_counter_ns time the trigger was received.
+        """
+        with self._learning_lock:
+            learned = self.learning
+            self.learning = False
+
+        if learned:
+            self.bind(trigger_name)
+            self.triggered.emit(trigger_name, False)
+            return
+
+        resumed = False
+
+        if trigger_name in self.bindings:
+            resumed = self.player.resume_at_next_stop(
+                trigger_ns, self.latencies[trigger_name])
+
+        self.triggered.emit(trigger_name, resumed)
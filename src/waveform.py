@@ -0,0 +1,169 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import numpy
+
+BASE_DECIMATION = 256
+
+
+def _normalize(data: numpy.ndarray) -> numpy.ndarray:
+    """Convert samples to float32 in the range -1.0 to 1.0."""
+    if data.dtype.kind == "i":
+        return data.astype(numpy.float32) / -numpy.iinfo(data.dtype).min
+
+    return data.astype(numpy.float32, copy=False)
+
+
+def _reduce(mins: numpy.ndarray, maxs: numpy.ndarray, starts: numpy.ndarray):
+    """Reduce ranges starting at starts to their minimums and maximums."""
+    return numpy.minimum.reduceat(mins, starts), numpy.maximum.reduceat(maxs, starts)
+
+
+class PeakPyramid:
+    """Minimum and maximum sample values of audio at many resolutions.
+
+    Level 0 holds the peaks of every BASE_DECIMATION frames, and each level
+    after it halves the resolution of the previous one. Drawing any range at
+    any width only reads the level closest to the needed resolution, so the
+    cost depends on the width in pixels, not the amount of frames.
+
+    Attributes:
+        frames: Length in frames of the audio the peaks were built from.
+        levels: List of (mins, maxs) array pairs, from the finest to the
+            coarsest resolution. The peaks are mixed over all channels.
+        data: Audio the peaks were built from, used for drawing at resolutions
+            finer than level 0, or None if not available.
+    """
+
+    def __init__(self, frames: int, levels: list, data: numpy.ndarray = None):
+        self.frames = frames
+        self.levels = levels
+        self.data = data
+
+    @classmethod
+    def from_data(cls, data: numpy.ndarray) -> "PeakPyramid":
+        """Build peaks from decoded audio.
+
+        Args:
+            data: Decoded audio with shape (frames, channels).
+        """
+        frames = len(data)
+        buckets = -(-frames // BASE_DECIMATION)
+        mins = numpy.empty(buckets, dtype=numpy.float32)
+        maxs = numpy.empty(buckets, dtype=numpy.float32)
+
+        full = frames // BASE_DECIMATION
+
+        # Whole buckets are reduced as rows of a reshaped view, which reduces
+        # over every channel at once without temporary copies.
+        buckets_view = data[:full * BASE_DECIMATION].reshape(full, -1)
+        mins[:full] = _normalize(buckets_view.min(axis=1))
+        maxs[:full] = _normalize(buckets_view.max(axis=1))
+
+        if full < buckets:
+            tail = data[full * BASE_DECIMATION:]
+            mins[full:] = _normalize(tail.min(keepdims=True)).ravel()
+            maxs[full:] = _normalize(tail.max(keepdims=True)).ravel()
+
+        levels = [(mins, maxs)]
+
+        while len(mins) > 1:
+            if len(mins) % 2 == 1:
+                mins = numpy.append(mins, mins[-1])
+                maxs = numpy.append(maxs, maxs[-1])
+
+            mins = numpy.minimum(mins[0::2], mins[1::2])
+            maxs = numpy.maximum(maxs[0::2], maxs[1::2])
+            levels.append((mins, maxs))
+
+        return cls(frames, levels, data)
+
+    def to_arrays(self) -> dict:
+        """Peaks as a dictionary of flat arrays for saving."""
+        lengths = [len(mins) for mins, _ in self.levels]
+
+        return {
+            "peaks_frames": numpy.array([self.frames], dtype=numpy.int64),
+            "peaks_level_lengths": numpy.array(lengths, dtype=numpy.int64),
+            "peaks_mins": numpy.concatenate([mins for mins, _ in self.levels]),
+            "peaks_maxs": numpy.concatenate([maxs for _, maxs in self.levels])
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, data: numpy.ndarray = None) -> "PeakPyramid":
+        """Peaks from a dictionary of arrays made with to_arrays.
+
+        The levels are views into the given arrays, so memory-mapped arrays
+        are not read into memory.
+
+        Args:
+            arrays: Dictionary made with to_arrays.
+            data: Decoded audio the peaks were built from, if available.
+        """
+        bounds = numpy.concatenate(([0], numpy.cumsum(arrays["peaks_level_lengths"])))
+        mins = arrays["peaks_mins"]
+        maxs = arrays["peaks_maxs"]
+        levels = [(mins[start:end], maxs[start:end])
+                  for start, end in zip(bounds[:-1], bounds[1:])]
+
+        return cls(int(arrays["peaks_frames"][0]), levels, data)
+
+    def get_peaks(self, start: int, end: int, pixels: int):
+        """Peaks of a frame range divided into pixel columns.
+
+        Args:
+            start: First frame of the range.
+            end: Frame after the last frame of the range.
+            pixels: Amount of columns to divide the range into.
+
+        Returns a pair of arrays with the minimum and maximum of each column.
+        Columns outside of the audio are zero.
+        """
+        mins = numpy.zeros(pixels, dtype=numpy.float32)
+        maxs = numpy.zeros(pixels, dtype=numpy.float32)
+
+        if pixels <= 0 or end <= start or len(self.levels) == 0:
+            return mins, maxs
+
+        frames_per_pixel = (end - start) / pixels
+        edges = start + numpy.arange(pixels + 1) * frames_per_pixel
+        edges = numpy.clip(edges, 0, self.frames).astype(numpy.int64)
+
+        if frames_per_pixel < BASE_DECIMATION and self.data is not None:
+            source_mins = source_maxs = None
+            decimation = 1
+        else:
+            level = int(numpy.log2(max(frames_per_pixel, BASE_DECIMATION)
+                                   / BASE_DECIMATION))
+            level = min(level, len(self.levels) - 1)
+            source_mins, source_maxs = self.levels[level]
+            decimation = BASE_DECIMATION << level
+
+        columns = edges[:-1] < edges[1:]
+
+        if not columns.any():
+            return mins, maxs
+
+        first = edges[:-1][columns] // decimation
+        last = -(-edges[1:][columns] // decimation)
+
+        if source_mins is None:
+            window = self.data[first[0]:last[-1]]
+            source_mins = _normalize(window.min(axis=1))
+            source_maxs = _normalize(window.max(axis=1))
+            last = last - first[0]
+            first = first - first[0]
+
+        # Each column reduces the buckets from first to last, so buckets on a
+        # column boundary count for both columns. reduceat needs its indices
+        # inside the array, so one padding bucket is added after last[-1].
+        bounds = numpy.column_stack((first, last)).ravel()
+        reduced_mins, reduced_maxs = _reduce(
+            numpy.append(source_mins[:last[-1]], 0),
+            numpy.append(source_maxs[:last[-1]], 0),
+            bounds)
+        reduced_mins = reduced_mins[0::2]
+        reduced_maxs = reduced_maxs[0::2]
+
+        mins[columns] = reduced_mins
+        maxs[columns] = reduced_maxs
+
+        return mins, maxs
@@ -20,3 +20,7 @@ def test(ctx):
 @task
 def coverage_report(ctx):
     ctx.run("coverage run --branch -m pytest src; coverage html", pty=True)
+
+@task
+def benchmark(ctx):
+    ctx.run("python3 src/benchmark.py", pty=True)